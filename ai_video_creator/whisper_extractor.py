@@ -1,7 +1,162 @@
 import whisper
-import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
 from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
 import subprocess
+import tempfile
+import threading
+
+import numpy as np
+
+SAMPLE_RATE = 16000  # Sample rate required by Whisper
+READ_CHUNK_SIZE = 1 << 20
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".flv", ".m4v", ".mp3", ".wav", ".m4a"}
+
+# Silence detection for chunked transcription
+FRAME_SECONDS = 0.03  # Energy is measured per 30 ms frame
+SMOOTH_SECONDS = 0.3  # and averaged over 300 ms so gaps between syllables are ignored
+SILENCE_DB = -40.0  # Anything quieter than this (dBFS) counts as silence
+PAUSE_DEPTH_DB = 10.0  # Over a noisy background, a pause must also be this far below the median level
+MIN_CHUNK_SECONDS = 30.0
+MAX_CHUNK_SECONDS = 300.0
+OVERLAP_SECONDS = 1.0  # Shared audio on each side of a cut that falls inside speech
+
+# Finished transcriptions and chunk checkpoints
+TRANSCRIPT_CACHE_DIR = Path(os.environ.get("WHISPER_CACHE_DIR", Path.home() / ".cache" / "whisper_extractor"))
+CHECKPOINT_SECONDS = 600.0  # With checkpoint=True, longer inputs are transcribed in chunks even on one worker
+
+class ModelCache:
+    """
+    LRU cache of loaded Whisper models keyed by model size
+
+    Loading a model takes seconds, so a process handling many clips keeps the
+    most recently used ones resident and evicts the oldest beyond max_models.
+    """
+
+    def __init__(self, max_models=2):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_size):
+        """
+        Return the model for model_size, loading it on first use
+
+        Args:
+            model_size (str): Whisper model size
+
+        Returns:
+            whisper.Whisper: The loaded model
+        """
+        with self._lock:
+            model = self._models.get(model_size)
+            if model is not None:
+                self._models.move_to_end(model_size)
+                return model
+            print(f"Loading Whisper {model_size} model...")
+            model = whisper.load_model(model_size)
+            self._models[model_size] = model
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+            return model
+
+    def __contains__(self, model_size):
+        return model_size in self._models
+
+    def __len__(self):
+        return len(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+model_cache = ModelCache()
+
+def _write_json(path, data):
+    """Write JSON atomically so an interrupted run never leaves a truncated file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temp file per call: threads of one process may write the same entry
+    f = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, prefix=f"{path.name}.",
+                                    suffix=".tmp", delete=False)
+    try:
+        with f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _stored_result(result):
+    return {"segments": result["segments"], "text": result["text"], "language": result.get("language")}
+
+class ChunkCheckpoints:
+    """Completed chunk transcriptions of one input, stored by sample range"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _path(self, start, end):
+        return self.directory / f"{start}-{end}.json"
+
+    def load(self, start, end):
+        return _read_json(self._path(start, end))
+
+    def save(self, start, end, result):
+        _write_json(self._path(start, end), _stored_result(result))
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class TranscriptCache:
+    """
+    On-disk cache of transcriptions keyed by audio content
+
+    The key hashes the decoded PCM together with model size, language and
+    task, so re-running on the same video, or on a re-encoded copy with
+    identical audio, returns the stored segments and text without loading a
+    model. Entries are never evicted; delete the directory to reclaim space.
+    """
+
+    def __init__(self, directory=TRANSCRIPT_CACHE_DIR):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def key(audio, model_size, language=None, task="transcribe"):
+        """
+        Args:
+            audio (numpy.ndarray): Float32 samples as returned by load_audio()
+
+        Returns:
+            str: Hex digest identifying the transcription
+        """
+        digest = hashlib.sha256(np.ascontiguousarray(audio, dtype=np.float32).data)
+        digest.update(f"|{model_size}|{language or 'auto'}|{task}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        return _read_json(self.directory / f"{key}.json")
+
+    def put(self, key, result):
+        _write_json(self.directory / f"{key}.json", _stored_result(result))
+        self.checkpoints(key).clear()
+
+    def checkpoints(self, key):
+        return ChunkCheckpoints(self.directory / f"{key}.chunks")
+
+transcript_cache = TranscriptCache()
 
 def extract_audio(video_path, audio_path):
     """Extract audio from video using ffmpeg"""
@@ -14,6 +169,252 @@ def extract_audio(video_path, audio_path):
     ]
     subprocess.run(command, check=True)
 
+def load_audio(video_path, sample_rate=SAMPLE_RATE):
+    """
+    Decode the audio track of a video straight into memory
+
+    ffmpeg writes raw mono 16-bit PCM to stdout, which is read in chunks and
+    converted once to the float32 array in [-1, 1] that Whisper expects.
+    Nothing is written to disk.
+
+    Args:
+        video_path (str): Path to the video (or audio) file
+        sample_rate (int, optional): Output sample rate. Defaults to 16000.
+
+    Returns:
+        numpy.ndarray: 1-D float32 array of samples
+    """
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error',
+        '-i', str(video_path),
+        '-ar', str(sample_rate),
+        '-ac', '1',
+        '-f', 's16le',
+        '-'
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Drain stderr on a thread so a chatty ffmpeg cannot block on a full pipe
+    errors = []
+    stderr_reader = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+
+    pcm = bytearray()
+    try:
+        while True:
+            chunk = process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            pcm += chunk
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        stderr_reader.join()
+
+    if returncode != 0:
+        message = b''.join(errors).decode('utf-8', 'replace').strip()
+        raise RuntimeError(f"ffmpeg failed to decode {video_path}: {message}")
+
+    # Drop a trailing odd byte, if any, before viewing the buffer as int16
+    samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+    audio = samples.astype(np.float32)
+    audio *= 1.0 / 32768.0
+    return audio
+
+def split_on_silence(audio, chunk_seconds, sample_rate=SAMPLE_RATE, silence_db=SILENCE_DB,
+                     search_fraction=0.25, overlap_seconds=OVERLAP_SECONDS):
+    """
+    Split audio into chunks of roughly chunk_seconds, cutting at pauses
+
+    Each cut is placed at the quietest point within +/- search_fraction of the
+    target length. If even that point is louder than the silence threshold
+    (continuous speech or music), the neighbouring chunks overlap by
+    overlap_seconds so stitch_segments() can keep each word exactly once.
+
+    Args:
+        audio (numpy.ndarray): Float32 samples
+        chunk_seconds (float): Target chunk length in seconds
+
+    Returns:
+        list: (start, end) sample indices, in order
+    """
+    if chunk_seconds <= 2 * overlap_seconds:
+        raise ValueError(f"chunk_seconds must be longer than twice the overlap ({2 * overlap_seconds}s)")
+    frame = int(sample_rate * FRAME_SECONDS)
+    n_frames = len(audio) // frame
+    target = max(1, int(chunk_seconds / FRAME_SECONDS))
+    search = int(target * search_fraction)
+    if n_frames <= target + search:
+        return [(0, len(audio))]
+
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    power = np.einsum("ij,ij->i", frames, frames) / frame
+    width = max(1, int(round(SMOOTH_SECONDS / FRAME_SECONDS)))
+    power = np.convolve(power, np.ones(width) / width, mode="same")
+    db = 10 * np.log10(power + 1e-10)
+    # Raise the threshold over a noisy background: the quietest 10% of frames
+    # approximate the noise floor. Only do so where the audio has real dips;
+    # steady sound (continuous music, noise) keeps the absolute threshold so
+    # its cuts get an overlap instead of being treated as pauses
+    threshold = max(silence_db, min(np.percentile(db, 10) + 6.0, np.median(db) - PAUSE_DEPTH_DB))
+    overlap = int(overlap_seconds / FRAME_SECONDS)
+
+    chunks = []
+    start = 0
+    while n_frames - start > target + search:
+        low = start + target - search
+        cut = low + int(np.argmin(db[low:start + target + search]))
+        if db[cut] <= threshold:
+            chunks.append((start * frame, cut * frame))
+            start = cut
+        else:
+            chunks.append((start * frame, (cut + overlap) * frame))
+            # Always move forward, even if the overlap reaches back past the search window
+            start = max(cut - overlap, start + 1)
+    chunks.append((start * frame, len(audio)))
+    return chunks
+
+def _shift_words(words, offset):
+    return [dict(w, start=w["start"] + offset, end=w["end"] + offset) for w in words]
+
+def stitch_segments(chunk_results, chunks, sample_rate=SAMPLE_RATE):
+    """
+    Merge per-chunk transcriptions into one timeline
+
+    Times are shifted by the chunk's start. Where two chunks overlap, the
+    midpoint of the shared audio is the boundary, and every word belongs to
+    the chunk that contains the word's midpoint. A segment that straddles
+    the boundary (a sentence spoken across the cut, transcribed by both
+    chunks) is trimmed to its own words, with its text and times rebuilt from
+    them, so nothing is dropped or repeated. Chunk results need word
+    timestamps for this; segments without words fall back to their own midpoint.
+
+    Args:
+        chunk_results (list): model.transcribe(..., word_timestamps=True) results, one per chunk
+        chunks (list): The (start, end) sample ranges that were transcribed
+
+    Returns:
+        dict: "segments" and "text" in the same shape as a transcribe() result
+    """
+    segments = []
+    for i, ((start, end), result) in enumerate(zip(chunks, chunk_results)):
+        offset = start / sample_rate
+        left = (start + chunks[i - 1][1]) / 2 / sample_rate if i > 0 else float("-inf")
+        right = (end + chunks[i + 1][0]) / 2 / sample_rate if i + 1 < len(chunks) else float("inf")
+        for seg in result["segments"]:
+            words = _shift_words(seg.get("words") or [], offset)
+            if words:
+                kept = [w for w in words if left <= (w["start"] + w["end"]) / 2 < right]
+                if not kept:
+                    continue
+                seg = dict(seg, words=kept)
+                if len(kept) == len(words):
+                    seg_start, seg_end = seg["start"] + offset, seg["end"] + offset
+                else:
+                    # Only part of the segment is this chunk's: rebuild it from the kept words
+                    seg_start, seg_end = kept[0]["start"], kept[-1]["end"]
+                    seg["text"] = "".join(w["word"] for w in kept)
+                    seg.pop("tokens", None)
+            else:
+                seg_start, seg_end = seg["start"] + offset, seg["end"] + offset
+                if not left <= (seg_start + seg_end) / 2 < right:
+                    continue
+            if segments:
+                seg_start = max(seg_start, segments[-1]["end"])
+            segments.append(dict(seg, id=len(segments), start=seg_start, end=max(seg_start, seg_end)))
+    return {"segments": segments, "text": "".join(seg["text"] for seg in segments)}
+
+def _detect_language(model, audio):
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio)).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+# Per-process state for transcribe_parallel() workers
+_worker_model_size = None
+
+def _init_chunk_worker(model_size, threads):
+    global _worker_model_size
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model_size = model_size
+
+def _worker_detect_language(audio):
+    return _detect_language(model_cache.get(_worker_model_size), audio)
+
+def _worker_transcribe(audio, language):
+    model = model_cache.get(_worker_model_size)
+    return model.transcribe(audio, language=language, task="transcribe", verbose=None, word_timestamps=True)
+
+def transcribe_parallel(audio, model_size="base", language=None, workers=None, chunk_seconds=None,
+                        checkpoints=None, cache=None):
+    """
+    Transcribe long audio in chunks, on several CPU cores
+
+    The audio is cut at pauses and the chunks are transcribed in a process
+    pool, each process holding its own copy of the model and an equal share
+    of the torch threads. With a single worker the chunks run in this process
+    instead. When the language is not given it is detected once on the first
+    chunk and used for all of them.
+
+    Args:
+        audio (numpy.ndarray): Float32 samples at 16 kHz
+        model_size (str, optional): Whisper model size
+        language (str, optional): Language code. If None, auto-detected.
+        workers (int, optional): Number of processes. Defaults to the CPU count.
+        chunk_seconds (float, optional): Target chunk length. By default about
+            two chunks per worker, between 30 s and 5 min.
+        checkpoints (ChunkCheckpoints, optional): Where finished chunks are saved
+            as they complete and reloaded on the next run, so an interrupted
+            run resumes with the same settings.
+        cache (ModelCache, optional): Model cache for the single-worker case
+
+    Returns:
+        dict: "segments", "text" and "language", like model.transcribe()
+    """
+    workers = workers or os.cpu_count() or 1
+    duration = len(audio) / SAMPLE_RATE
+    if chunk_seconds is None:
+        chunk_seconds = min(max(duration / (2 * workers), MIN_CHUNK_SECONDS), MAX_CHUNK_SECONDS)
+    chunks = split_on_silence(audio, chunk_seconds)
+
+    results = [checkpoints.load(start, end) if checkpoints else None for start, end in chunks]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if len(pending) < len(chunks):
+        print(f"Resuming: {len(chunks) - len(pending)} of {len(chunks)} chunks already done")
+    if language is None and results[0] is not None:
+        language = results[0].get("language")
+
+    def finish(i, result):
+        results[i] = result
+        if checkpoints:
+            checkpoints.save(*chunks[i], result)
+
+    workers = max(1, min(workers, len(pending)))
+    print(f"Transcribing {len(pending)} chunks with {workers} process{'es' if workers > 1 else ''}...")
+    if workers == 1:
+        model = (cache if cache is not None else model_cache).get(model_size)
+        if language is None and pending:
+            start, end = chunks[0]
+            language = _detect_language(model, audio[start:end])
+        for i in pending:
+            start, end = chunks[i]
+            finish(i, model.transcribe(audio[start:end], language=language, task="transcribe", verbose=None,
+                                       word_timestamps=True))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(workers, initializer=_init_chunk_worker, initargs=(model_size, threads)) as pool:
+            if language is None:
+                start, end = chunks[0]
+                language = pool.submit(_worker_detect_language, audio[start:end]).result()
+            futures = {pool.submit(_worker_transcribe, audio[chunks[i][0]:chunks[i][1]], language): i
+                       for i in pending}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+
+    result = stitch_segments(results, chunks)
+    result["language"] = language
+    return result
+
 def format_timestamp(seconds):
     """Convert seconds to SRT timestamp format"""
     hours = int(seconds // 3600)
@@ -31,22 +432,90 @@ def save_srt(segments, output_path):
             text = seg['text'].strip()
             f.write(f"{i}\n{start_time} --> {end_time}\n{text}\n\n")
 
-def extract_subtitles(video_path, output_dir=None, model_size="base", language=None):
+def find_videos(patterns):
     """
-    Extract subtitles from a video file using Whisper
-    
+    Expand files, directories and glob patterns into a list of media files
+
     Args:
-        video_path (str): Path to the video file
-        output_dir (str, optional): Directory to save output files. Defaults to video's directory.
+        patterns (list): Paths, directories (scanned for known media extensions) or glob patterns
+
+    Returns:
+        list: Unique file paths in the order they were found
+    """
+    found = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(p for p in path.iterdir() if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS)
+        elif path.exists():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob(pattern, recursive=True) if Path(p).is_file())
+        found.extend(matches)
+    return list(dict.fromkeys(found))
+
+def transcribe_audio(audio, model_size="base", language=None, cache=None, workers=None, use_cache=True,
+                     checkpoint=False):
+    """
+    Transcribe decoded audio, consulting the transcript cache first
+
+    Args:
+        audio (numpy.ndarray): Float32 samples as returned by load_audio()
         model_size (str, optional): Whisper model size ('tiny', 'base', 'small', 'medium', 'large').
         language (str, optional): Language code (e.g., 'en', 'zh'). If None, auto-detected.
+        cache (ModelCache, optional): Cache to take the model from. Defaults to the process-wide cache.
+        workers (int, optional): If above 1, split the audio at pauses and transcribe the
+            chunks in that many processes (see transcribe_parallel).
+        use_cache (bool, optional): Reuse a stored transcription of identical audio, and
+            checkpoint each transcribed chunk. Defaults to True.
+        checkpoint (bool, optional): Transcribe inputs longer than CHECKPOINT_SECONDS in
+            checkpointed chunks even on one worker, so an interrupted run resumes. Chunking
+            can change the output slightly, so the default is a single pass. Needs use_cache.
+
+    Returns:
+        dict: Transcription result with "segments" and "text"
+    """
+    key = transcript_cache.key(audio, model_size, language) if use_cache else None
+    cached = transcript_cache.get(key) if use_cache else None
+    checkpoints = transcript_cache.checkpoints(key) if use_cache else None
+    
+    if cached is not None:
+        print("Using cached transcription")
+        return cached
     
+    if (workers and workers > 1) or (checkpoint and use_cache and len(audio) > CHECKPOINT_SECONDS * SAMPLE_RATE):
+        result = transcribe_parallel(audio, model_size, language, workers or 1,
+                                     checkpoints=checkpoints, cache=cache)
+    else:
+        # Load Whisper model (reused across calls in the same process)
+        model = (cache if cache is not None else model_cache).get(model_size)
+        
+        # Transcribe audio
+        print("Transcribing audio...")
+        result = model.transcribe(
+            audio,
+            language=language,
+            task="transcribe",
+            verbose=False
+        )
+    
+    if use_cache:
+        transcript_cache.put(key, result)
+    return result
+
+def write_outputs(video_path, result, output_dir=None):
+    """
+    Write the SRT and plain-text transcript for a video
+
+    Args:
+        video_path (str): Path to the source video; its stem names the outputs
+        result (dict): Transcription result with "segments" and "text"
+        output_dir (str, optional): Directory to save output files. Defaults to video's directory.
+
     Returns:
         dict: Dictionary containing paths to generated files and transcription result
     """
     video_path = Path(video_path)
-    if not video_path.exists():
-        raise FileNotFoundError(f"Video file not found: {video_path}")
     
     # Set output directory
     if output_dir is None:
@@ -55,69 +524,107 @@ def extract_subtitles(video_path, output_dir=None, model_size="base", language=N
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Extract audio
-    audio_path = output_dir / f"{video_path.stem}_audio.wav"
+    # Save outputs
+    srt_path = output_dir / f"{video_path.stem}.srt"
+    txt_path = output_dir / f"{video_path.stem}.txt"
+
+    # Save SRT file
+    save_srt(result["segments"], srt_path)
+
+    # Save plain text
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write(result["text"])
+
+    print(f"Generated files:")
+    print(f"- SRT subtitles: {srt_path}")
+    print(f"- Text transcript: {txt_path}")
+
+    return {
+        "srt_path": str(srt_path),
+        "txt_path": str(txt_path),
+        "result": result
+    }
+
+def extract_subtitles(video_path, output_dir=None, model_size="base", language=None, cache=None, workers=None,
+                      use_cache=True, checkpoint=False):
+    """
+    Extract subtitles from a video file using Whisper
+    
+    Args:
+        video_path (str): Path to the video file
+        output_dir (str, optional): Directory to save output files. Defaults to video's directory.
+        model_size (str, optional): Whisper model size ('tiny', 'base', 'small', 'medium', 'large').
+        language (str, optional): Language code (e.g., 'en', 'zh'). If None, auto-detected.
+        cache (ModelCache, optional): Cache to take the model from. Defaults to the process-wide cache.
+        workers (int, optional): If above 1, split the audio at pauses and transcribe the
+            chunks in that many processes (see transcribe_parallel).
+        use_cache (bool, optional): Reuse a stored transcription of identical audio, and
+            checkpoint each transcribed chunk. Defaults to True.
+        checkpoint (bool, optional): Checkpoint long inputs even on one worker (see transcribe_audio).
+    
+    Returns:
+        dict: Dictionary containing paths to generated files and transcription result
+    """
+    video_path = Path(video_path)
+    if not video_path.exists():
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+    
+    # Decode audio into memory; no intermediate file is written
     print(f"Extracting audio from video...")
-    extract_audio(str(video_path), str(audio_path))
+    audio = load_audio(video_path)
     
-    try:
-        # Load Whisper model
-        print(f"Loading Whisper {model_size} model...")
-        model = whisper.load_model(model_size)
-        
-        # Transcribe audio
-        print("Transcribing audio...")
-        result = model.transcribe(
-            str(audio_path),
-            language=language,
-            task="transcribe",
-            verbose=False
-        )
-        
-        # Save outputs
-        srt_path = output_dir / f"{video_path.stem}.srt"
-        txt_path = output_dir / f"{video_path.stem}.txt"
-        
-        # Save SRT file
-        save_srt(result["segments"], srt_path)
-        
-        # Save plain text
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write(result["text"])
-        
-        print(f"Generated files:")
-        print(f"- SRT subtitles: {srt_path}")
-        print(f"- Text transcript: {txt_path}")
-        
-        return {
-            "srt_path": str(srt_path),
-            "txt_path": str(txt_path),
-            "result": result
-        }
-        
-    finally:
-        # Clean up temporary audio file
-        if audio_path.exists():
-            os.remove(audio_path)
+    result = transcribe_audio(audio, model_size, language, cache=cache, workers=workers, use_cache=use_cache,
+                              checkpoint=checkpoint)
+    return write_outputs(video_path, result, output_dir)
 
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Extract subtitles from video using Whisper")
-    parser.add_argument("video_path", help="Path to the video file")
+    parser.add_argument("video_path", nargs="+",
+                      help="Video file(s), directories or glob patterns (e.g. 'clips/**/*.mp4')")
     parser.add_argument("--output-dir", help="Output directory (optional)")
-    parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large"],
+    parser.add_argument("--model", default="base", choices=MODEL_SIZES,
                       help="Whisper model size (default: base)")
     parser.add_argument("--language", help="Language code (e.g., en, zh). If not specified, auto-detected")
+    parser.add_argument("--workers", type=int, default=1,
+                      help="Split long audio at pauses and transcribe on this many processes (default: 1)")
+    parser.add_argument("--no-cache", action="store_true",
+                      help=f"Do not reuse or store transcriptions (cache: {TRANSCRIPT_CACHE_DIR})")
+    parser.add_argument("--checkpoint", action="store_true",
+                      help="Transcribe long audio in resumable chunks even with one worker")
     
     args = parser.parse_args()
     
-    try:
-        extract_subtitles(
-            args.video_path,
-            output_dir=args.output_dir,
+    videos = find_videos(args.video_path)
+    if not videos:
+        print(f"Error: no video files found in {', '.join(args.video_path)}")
+    
+    if len(videos) > 1:
+        # Decode the next video while the current one is transcribed, all in
+        # this one process so the model is loaded only once
+        from whisper_pipeline import SubtitlePipeline
+        
+        outcomes = SubtitlePipeline(
             model_size=args.model,
-            language=args.language
-        )
-    except Exception as e:
-        print(f"Error: {e}")
+            language=args.language,
+            output_dir=args.output_dir,
+            chunk_workers=args.workers,
+            use_cache=not args.no_cache,
+            checkpoint=args.checkpoint
+        ).run(videos)
+        failed = sum(isinstance(outcome, Exception) for _, outcome in outcomes)
+        print(f"Done: {len(videos) - failed} succeeded, {failed} failed")
+    elif videos:
+        try:
+            extract_subtitles(
+                videos[0],
+                output_dir=args.output_dir,
+                model_size=args.model,
+                language=args.language,
+                workers=args.workers,
+                use_cache=not args.no_cache,
+                checkpoint=args.checkpoint
+            )
+        except Exception as e:
+            print(f"Error: {e}")
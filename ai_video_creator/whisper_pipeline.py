@@ -0,0 +1,205 @@
+"""
+Overlapped extract/transcribe/write pipeline for batches of videos
+
+Each video passes through three stages connected by bounded queues:
+
+    decode (ffmpeg) -> transcribe (Whisper) -> write (SRT/TXT)
+
+so the audio of video N+1 is decoded while video N is transcribed and the
+outputs of video N-1 are written. A full queue blocks the stage feeding it,
+which caps the decoded audio held in memory at roughly
+decode_workers + queue_size + transcribe_workers tracks.
+
+    python whisper_pipeline.py clips/ --decode-workers 2 --queue-size 2
+"""
+import queue
+import threading
+import time
+from pathlib import Path
+
+from whisper_extractor import MODEL_SIZES, ModelCache, find_videos, load_audio, transcribe_audio, write_outputs
+
+_DONE = object()
+
+class SubtitlePipeline:
+    """
+    Staged producer/consumer subtitle extraction
+
+    Args:
+        model_size (str, optional): Whisper model size. Defaults to "base".
+        language (str, optional): Language code. If None, auto-detected per video.
+        output_dir (str, optional): Directory to save output files. Defaults to each video's directory.
+        decode_workers (int, optional): Concurrent ffmpeg decoders. Defaults to 2.
+        transcribe_workers (int, optional): Concurrent transcriptions. Each holds its own
+            copy of the model, since a Whisper model cannot decode two inputs at once. Defaults to 1.
+        write_workers (int, optional): Concurrent output writers. Defaults to 1.
+        queue_size (int, optional): Items allowed to wait between two stages. Defaults to 2.
+        chunk_workers (int, optional): Processes per transcription (see transcribe_parallel).
+        use_cache (bool, optional): Use the transcript cache. Defaults to True.
+        checkpoint (bool, optional): Checkpoint long inputs even on one worker (see transcribe_audio).
+    """
+
+    def __init__(self, model_size="base", language=None, output_dir=None, decode_workers=2,
+                 transcribe_workers=1, write_workers=1, queue_size=2, chunk_workers=None, use_cache=True,
+                 checkpoint=False):
+        if min(decode_workers, transcribe_workers, write_workers, queue_size) < 1:
+            raise ValueError("Worker counts and queue size must be at least 1")
+        self.model_size = model_size
+        self.language = language
+        self.output_dir = output_dir
+        self.decode_workers = decode_workers
+        self.transcribe_workers = transcribe_workers
+        self.write_workers = write_workers
+        self.queue_size = queue_size
+        self.chunk_workers = chunk_workers
+        self.use_cache = use_cache
+        self.checkpoint = checkpoint
+        self.busy = {}  # Seconds spent working in each stage during the last run()
+        self._lock = threading.Lock()
+
+    def _timed(self, stage, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.busy[stage] += time.perf_counter() - started
+
+    def run(self, video_paths):
+        """
+        Process all videos and wait for the last outputs to be written
+
+        A failure in any stage is recorded for that video and the rest of the
+        batch carries on.
+
+        Args:
+            video_paths (list): Video files to process
+
+        Returns:
+            list: (video_path, outcome) in input order, where outcome is the
+            write_outputs() dict or the exception that stopped the video
+        """
+        videos = [Path(p) for p in video_paths]
+        outcomes = [None] * len(videos)
+        self.busy = {"decode": 0.0, "transcribe": 0.0, "write": 0.0}
+
+        pending = queue.Queue()
+        for item in enumerate(videos):
+            pending.put(item)
+        decoded = queue.Queue(self.queue_size)
+        transcribed = queue.Queue(self.queue_size)
+
+        def fail(index, error):
+            outcomes[index] = error
+            print(f"Error: {videos[index]}: {error}")
+
+        def decode():
+            while True:
+                try:
+                    index, video = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    if not video.exists():
+                        raise FileNotFoundError(f"Video file not found: {video}")
+                    audio = self._timed("decode", load_audio, video)
+                except Exception as e:
+                    fail(index, e)
+                    continue
+                decoded.put((index, audio))
+
+        def transcribe():
+            models = ModelCache(max_models=1)
+            while True:
+                item = decoded.get()
+                if item is _DONE:
+                    return
+                index, audio = item
+                try:
+                    result = self._timed("transcribe", transcribe_audio, audio, self.model_size, self.language,
+                                         models, self.chunk_workers, self.use_cache, self.checkpoint)
+                except Exception as e:
+                    fail(index, e)
+                    continue
+                finally:
+                    del audio
+                transcribed.put((index, result))
+
+        def write():
+            while True:
+                item = transcribed.get()
+                if item is _DONE:
+                    return
+                index, result = item
+                try:
+                    outcomes[index] = self._timed("write", write_outputs, videos[index], result, self.output_dir)
+                except Exception as e:
+                    fail(index, e)
+
+        def start(target, count):
+            threads = [threading.Thread(target=target, daemon=True) for _ in range(count)]
+            for thread in threads:
+                thread.start()
+            return threads
+
+        # Shut the stages down in order: once every producer of a queue has
+        # finished, one sentinel per consumer tells them to stop
+        decoders = start(decode, self.decode_workers)
+        transcribers = start(transcribe, self.transcribe_workers)
+        writers = start(write, self.write_workers)
+        for downstream, producers, consumers in ((decoded, decoders, self.transcribe_workers),
+                                                 (transcribed, transcribers, self.write_workers)):
+            for thread in producers:
+                thread.join()
+            for _ in range(consumers):
+                downstream.put(_DONE)
+        for thread in writers:
+            thread.join()
+
+        return list(zip(videos, outcomes))
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract subtitles from many videos with overlapped stages")
+    parser.add_argument("video_path", nargs="+", help="Video file(s), directories or glob patterns")
+    parser.add_argument("--output-dir", help="Output directory (optional)")
+    parser.add_argument("--model", default="base", choices=MODEL_SIZES,
+                      help="Whisper model size (default: base)")
+    parser.add_argument("--language", help="Language code (e.g., en, zh). If not specified, auto-detected")
+    parser.add_argument("--decode-workers", type=int, default=2, help="Concurrent ffmpeg decoders (default: 2)")
+    parser.add_argument("--transcribe-workers", type=int, default=1,
+                      help="Concurrent transcriptions, one model copy each (default: 1)")
+    parser.add_argument("--write-workers", type=int, default=1, help="Concurrent output writers (default: 1)")
+    parser.add_argument("--queue-size", type=int, default=2, help="Items waiting between stages (default: 2)")
+    parser.add_argument("--chunk-workers", type=int, default=1,
+                      help="Processes per transcription for long audio (default: 1)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse or store transcriptions")
+    parser.add_argument("--checkpoint", action="store_true",
+                      help="Transcribe long audio in resumable chunks even with one chunk worker")
+
+    args = parser.parse_args()
+
+    videos = find_videos(args.video_path)
+    if not videos:
+        print(f"Error: no video files found in {', '.join(args.video_path)}")
+
+    pipeline = SubtitlePipeline(
+        model_size=args.model,
+        language=args.language,
+        output_dir=args.output_dir,
+        decode_workers=args.decode_workers,
+        transcribe_workers=args.transcribe_workers,
+        write_workers=args.write_workers,
+        queue_size=args.queue_size,
+        chunk_workers=args.chunk_workers,
+        use_cache=not args.no_cache,
+        checkpoint=args.checkpoint
+    )
+    started = time.perf_counter()
+    outcomes = pipeline.run(videos)
+    elapsed = time.perf_counter() - started
+
+    failed = sum(isinstance(outcome, Exception) for _, outcome in outcomes)
+    print(f"Done: {len(outcomes) - failed} succeeded, {failed} failed in {elapsed:.1f}s")
+    print("Stage busy time: " + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in pipeline.busy.items()))
@@ -0,0 +1,197 @@
+"""
+Long-lived Whisper worker
+
+Keeps loaded models warm in an LRU ModelCache and runs subtitle jobs one at a
+time on a single thread. Jobs come either from the same process via submit(),
+or from other processes over a Unix domain socket: one JSON request per line,
+answered by one JSON response per line.
+
+    python whisper_worker.py serve --max-models 2
+    python whisper_worker.py submit clips/*.mp4 --model small --language en
+"""
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+from concurrent.futures import Future
+
+from whisper_extractor import MODEL_SIZES, ModelCache, extract_subtitles, find_videos
+
+DEFAULT_SOCKET_PATH = "/tmp/whisper_worker.sock"
+
+class WhisperWorker:
+    """
+    Serial job runner with a warm model cache
+
+    Args:
+        max_models (int, optional): Number of models kept loaded. Defaults to 2.
+        max_pending (int, optional): Queue bound; submit() blocks when full. 0 means unbounded.
+    """
+
+    def __init__(self, max_models=2, max_pending=0):
+        self.cache = ModelCache(max_models)
+        self.jobs = queue.Queue(max_pending)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="whisper-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, video_path, output_dir=None, model_size="base", language=None):
+        """
+        Queue a video for transcription
+
+        Returns:
+            concurrent.futures.Future: Resolves to the extract_subtitles() result dict
+        """
+        future = Future()
+        job = {
+            "video_path": video_path,
+            "output_dir": output_dir,
+            "model_size": model_size,
+            "language": language,
+        }
+        self.jobs.put((future, job))
+        return future
+
+    def _run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            future, job = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(extract_subtitles(cache=self.cache, **job))
+            except Exception as e:
+                future.set_exception(e)
+
+    def stop(self):
+        """Finish the jobs already queued, then stop the worker thread"""
+        if self._thread is not None:
+            self.jobs.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def serve(self, socket_path=DEFAULT_SOCKET_PATH):
+        """
+        Accept jobs over a Unix socket until interrupted
+
+        Each request is a JSON object with "video_path" and optionally
+        "output_dir", "model" and "language". The response carries
+        "srt_path", "txt_path" and "text", or "error" if the job failed.
+        """
+        worker = self.start()
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    self.wfile.write(json.dumps(worker._handle_request(line)).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+        server.daemon_threads = True
+        print(f"Whisper worker listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.remove(socket_path)
+            self.stop()
+
+    def _handle_request(self, line):
+        try:
+            request = json.loads(line)
+            future = self.submit(
+                request["video_path"],
+                output_dir=request.get("output_dir"),
+                model_size=request.get("model", "base"),
+                language=request.get("language"),
+            )
+            result = future.result()
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {
+            "ok": True,
+            "srt_path": result["srt_path"],
+            "txt_path": result["txt_path"],
+            "text": result["result"]["text"],
+        }
+
+def submit_jobs(video_paths, socket_path=DEFAULT_SOCKET_PATH, output_dir=None, model_size="base", language=None):
+    """
+    Send videos to a running worker over one connection
+
+    Args:
+        video_paths (list): Video files to transcribe
+        socket_path (str, optional): Worker socket. Defaults to DEFAULT_SOCKET_PATH.
+
+    Yields:
+        tuple: (video_path, response dict) in submission order
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        reader = sock.makefile("rb")
+        for video_path in video_paths:
+            request = {
+                "video_path": os.path.abspath(video_path),
+                "output_dir": os.path.abspath(output_dir) if output_dir else None,
+                "model": model_size,
+                "language": language,
+            }
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            line = reader.readline()
+            if not line:
+                raise ConnectionError("Worker closed the connection")
+            yield video_path, json.loads(line)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Persistent Whisper subtitle worker")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help=f"Unix socket path (default: {DEFAULT_SOCKET_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the worker")
+    serve_parser.add_argument("--max-models", type=int, default=2, help="Models kept loaded (default: 2)")
+
+    submit_parser = commands.add_parser("submit", help="Send videos to a running worker")
+    submit_parser.add_argument("video_path", nargs="+", help="Video file(s), directories or glob patterns")
+    submit_parser.add_argument("--output-dir", help="Output directory (optional)")
+    submit_parser.add_argument("--model", default="base", choices=MODEL_SIZES,
+                      help="Whisper model size (default: base)")
+    submit_parser.add_argument("--language", help="Language code (e.g., en, zh). If not specified, auto-detected")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        WhisperWorker(max_models=args.max_models).serve(args.socket)
+    else:
+        videos = find_videos(args.video_path)
+        if not videos:
+            print(f"Error: no video files found in {', '.join(args.video_path)}")
+        try:
+            for video, response in submit_jobs(videos, args.socket, args.output_dir, args.model, args.language):
+                if response["ok"]:
+                    print(f"{video}: {response['srt_path']}")
+                else:
+                    print(f"{video}: Error: {response['error']}")
+        except OSError as e:
+            print(f"Error: cannot reach worker at {args.socket}: {e}")
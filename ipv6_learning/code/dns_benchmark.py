@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+dns_parser 热路径的微基准与回退检查
+
+用固定构造的报文语料（小A查询、大的压缩响应、指针密集的报文、格式错误的输入）测量
+parse_header、parse_name、parse_resource_record、parse_packet 四个操作：
+每次操作的纳秒数（多次重复取最小值，并记录各次重复的中位数和MAD），以及用tracemalloc
+测得的每次操作保留的内存块数、字节数和一轮运行中的内存峰值。每次重复前还跑一段约10ms的
+固定参照负载，它在整次运行中的最快一次反映这台机器此时的快慢，比较时据此换算基线。
+结果保存为JSON，可以和之前的运行比较，耗时或内存超出阈值时以非零状态退出，作为回退检查。
+"""
+import gc
+import json
+import platform
+import statistics
+import struct
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dns_builder import FLAG_QR, FLAG_RA, FLAG_RD, DNSMessageBuilder
+from dns_parser import DNSParser
+from pcap_reader import MALFORMED_ERRORS
+
+TYPE_A = 1
+TYPE_CNAME = 5
+TYPE_NULL = 10
+TYPE_AAAA = 28
+
+# 默认的回退阈值：比基线慢（或多占内存）超过10%即视为回退
+DEFAULT_THRESHOLD = 0.10
+# 耗时的变化还必须超过两次运行中较大的MAD的这么多倍，才算回退而不是噪声
+NOISE_MADS = 3.0
+# 参照负载的迭代次数，约10ms：比单个基准样本的计时抖动长得多
+REFERENCE_ITERATIONS = 30000
+_REFERENCE_STRUCT = struct.Struct('!HHI')
+_REFERENCE_DATA = bytes(range(256)) * 4
+# 疑似回退的项重新测量的次数，取所有测量中最快的一次；持续存在的变慢才算回退
+RECHECKS = 3
+
+
+@dataclass
+class BenchResult:
+    """一项基准的结果，键为 "语料/操作" """
+    ns_per_op: float        # 各次重复中最快一次的每操作纳秒数，回退检查比较的是它
+    median_ns: float        # 各次重复的中位数
+    mad_ns: float           # 各次重复相对中位数的绝对偏差的中位数，衡量这台机器上的噪声
+    reference_ns: float     # 同一次运行中参照负载最快一次的纳秒数，衡量机器此时的快慢
+    ops: int                # 每轮的操作数
+    blocks_per_op: float    # 每次操作的结果保留的内存块数
+    bytes_per_op: float     # 每次操作的结果保留的字节数
+    peak_kib: float         # 一轮运行中tracemalloc记录的内存峰值（相对运行前）
+
+
+def _response(question: str, qtype: int = TYPE_A) -> DNSMessageBuilder:
+    return DNSMessageBuilder(1024).reset(0x1234, FLAG_QR | FLAG_RD | FLAG_RA).add_question(question, qtype)
+
+
+def _small_corpus() -> List[bytes]:
+    """小报文：A查询，以及只有一两条回答的响应"""
+    packets = []
+    for i in range(32):
+        name = f'www{i}.example.com'
+        packets.append(DNSMessageBuilder(64).reset(i).add_question(name, TYPE_A).build())
+        packets.append(_response(name).add_answer(name, TYPE_A, 300, bytes([192, 0, 2, i])).build())
+    return packets
+
+
+def _large_corpus() -> List[bytes]:
+    """大的压缩响应：CNAME链加上几十条A/AAAA记录，名称大量共享后缀"""
+    packets = []
+    for i in range(8):
+        name = f'cdn{i}.static.example.com'
+        builder = _response(name)
+        target = name
+        for hop in range(4):
+            alias = f'edge{hop}.cdn{i}.global.example.net'
+            builder.add_answer(target, TYPE_CNAME, 60, alias)
+            target = alias
+        for j in range(40):
+            builder.add_answer(target, TYPE_A, 20, bytes([198, 51, 100, j]))
+        for j in range(16):
+            builder.add_answer(target, TYPE_AAAA, 20, bytes(15) + bytes([j]))
+        packets.append(builder.build())
+    return packets
+
+
+def _pointer_chain_packet(depth: int, records: int) -> bytes:
+    """
+    手工构造的指针链：第k个名称是一个单字符标签加指向第k-1个名称的指针，
+    每条记录的名称都指向链的末端，解压一次要跟随depth次指针。
+    链本身放在第一条NULL记录的数据里，使报文各部分都合法
+    """
+    base = 12 + 1 + 10  # 第一条记录的根名称和定长字段之后
+    chain = bytearray(b'\x01z\x00')
+    previous = base
+    for _ in range(depth):
+        offset = base + len(chain)
+        chain += b'\x01a' + struct.pack('!H', 0xC000 | previous)
+        previous = offset
+    header = struct.pack('!6H', 0x4321, FLAG_QR, 0, records + 1, 0, 0)
+    holder = b'\x00' + struct.pack('!HHIH', TYPE_NULL, 1, 0, len(chain)) + bytes(chain)
+    record = (struct.pack('!H', 0xC000 | previous) + struct.pack('!HHIH', TYPE_A, 1, 60, 4)
+              + bytes([203, 0, 113, 7]))
+    return header + holder + record * records
+
+
+def _pointer_corpus() -> List[bytes]:
+    """指针密集的报文：多层后缀共享的压缩名称，以及很深的指针链"""
+    packets = []
+    for i in range(8):
+        builder = _response(f'q{i}.zone.example.org')
+        for j in range(48):
+            builder.add_answer(f'h{j}.r{j % 6}.s{j % 3}.zone.example.org', TYPE_CNAME, 60,
+                               f't{j}.r{j % 6}.s{j % 3}.zone.example.org')
+        packets.append(builder.build())
+    packets.extend(_pointer_chain_packet(60, 32) for _ in range(4))
+    return packets
+
+
+def _malformed_corpus() -> List[bytes]:
+    """各种应当被快速拒绝的输入"""
+    header = struct.Struct('!6H')
+    valid = _response('bad.example').add_answer('bad.example', TYPE_A, 60, bytes(4)).build()
+    return [
+        b'\x12\x34\x81',                                              # 头部不完整
+        header.pack(1, 0, 1, 0, 0, 0),                                # 声明有问题但没有数据
+        header.pack(2, 0, 1, 0, 0, 0) + b'\xc0\x0c\x00\x01\x00\x01',  # 指向自身的指针
+        header.pack(3, 0, 1, 0, 0, 0) + b'\x3fabc',                   # 标签超出报文
+        header.pack(4, 0, 1, 0, 0, 0) + b'\x41abc\x00\x00\x01\x00\x01',  # 不支持的标签类型
+        header.pack(5, 0, 1, 0, 0, 0) + (b'\x3f' + b'x' * 63) * 5 + b'\x00\x00\x01\x00\x01',  # 名称过长
+        valid[:-2],                                                   # 记录数据被截断
+        valid[:len(valid) - 14],                                      # 记录头部被截断
+    ]
+
+
+def build_corpora() -> Dict[str, List[bytes]]:
+    """固定的基准语料，每次运行内容完全相同"""
+    return {
+        'small': _small_corpus(),
+        'large': _large_corpus(),
+        'pointers': _pointer_corpus(),
+        'malformed': _malformed_corpus(),
+    }
+
+
+def _record_start(packet: bytes) -> Tuple[int, int]:
+    """资源记录部分的起始偏移量和记录数；格式错误的报文返回 (12, 1)，让操作自己去出错"""
+    try:
+        parser = DNSParser(packet)
+        header = parser.parse_header()
+        for _ in range(header.qdcount):
+            parser.skip_question()
+        return parser.offset, header.ancount + header.nscount + header.arcount
+    except MALFORMED_ERRORS:
+        return 12, 1
+
+
+def _last_name(packet: bytes) -> int:
+    """最后一条记录（没有记录时为第一个问题）的名称偏移量，通常是压缩最深的名称"""
+    try:
+        parser = DNSParser(packet)
+        header = parser.parse_header()
+        offset = parser.offset
+        for _ in range(header.qdcount):
+            parser.skip_question()
+        for _ in range(header.ancount + header.nscount + header.arcount):
+            offset = parser.offset
+            parser.skip_resource_record()
+        return offset
+    except MALFORMED_ERRORS:
+        return 12
+
+
+def _guard(operation: Callable[[bytes], object]) -> Callable[[bytes], object]:
+    """格式错误的语料上把异常当作结果返回，测的是拒绝一个报文的开销"""
+    def guarded(packet: bytes):
+        try:
+            return operation(packet)
+        except MALFORMED_ERRORS as exc:
+            return exc
+    return guarded
+
+
+def _parse_header(packet: bytes):
+    return DNSParser(packet).parse_header()
+
+
+def _parse_packet(packet: bytes):
+    return DNSParser(packet).parse_packet()
+
+
+def make_benchmark(operation: str, packets: List[bytes],
+                   malformed: bool) -> Tuple[Callable[[], list], int]:
+    """返回 (跑一轮语料的函数, 每轮操作数)"""
+    if operation == 'parse_resource_record':
+        # 每个报文用新的解析器按顺序解析全部记录，操作数按记录计
+        starts = [(packet,) + _record_start(packet) for packet in packets]
+
+        def records(packet: bytes, start: int, count: int):
+            parser = DNSParser(packet)
+            parser.offset = start
+            return [parser.parse_resource_record() for _ in range(count)]
+
+        if malformed:
+            def run():
+                return [_guard(lambda p: records(p, start, count))(packet)
+                        for packet, start, count in starts]
+            return run, len(starts)
+
+        def run():
+            return [records(packet, start, count) for packet, start, count in starts]
+        return run, sum(count for _, _, count in starts)
+
+    if operation == 'parse_name':
+        # 每次用新的解析器，避免命中上一轮留下的名称缓存
+        offsets = [(packet, _last_name(packet)) for packet in packets]
+
+        def name(packet: bytes, offset: int):
+            parser = DNSParser(packet)
+            parser.offset = offset
+            return parser.parse_name()
+
+        if malformed:
+            def run():
+                return [_guard(lambda p: name(p, offset))(packet) for packet, offset in offsets]
+        else:
+            def run():
+                return [name(packet, offset) for packet, offset in offsets]
+        return run, len(offsets)
+
+    function = {'parse_header': _parse_header, 'parse_packet': _parse_packet}[operation]
+    if malformed:
+        function = _guard(function)
+
+    def run():
+        return [function(packet) for packet in packets]
+    return run, len(packets)
+
+
+OPERATIONS = ('parse_header', 'parse_name', 'parse_resource_record', 'parse_packet')
+
+
+def _calibrate(run: Callable[[], list], min_time: float) -> int:
+    """与timeit相同：轮数翻倍，直到一次重复至少运行min_time秒"""
+    loops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            run()
+        if time.perf_counter_ns() - start >= min_time * 1e9:
+            return loops
+        loops *= 2
+
+
+def _reference_workload():
+    """固定的纯Python参照负载：结构体解包、切片和字典写入，与解析器的热路径相近"""
+    unpack = _REFERENCE_STRUCT.unpack_from
+    data = _REFERENCE_DATA
+    table = {}
+    for i in range(REFERENCE_ITERATIONS):
+        offset = i & 1015
+        first, second, _ = unpack(data, offset)
+        table[first ^ second] = data[offset:offset + 8]
+    return table
+
+
+def time_benchmarks(benchmarks: List[Tuple[Callable[[], list], int]], repeat: int = 10,
+                    min_time: float = 0.2) -> Tuple[List[Tuple[float, float, float]], float]:
+    """
+    关闭GC，按轮交替运行各项基准：每一轮每项各重复一次，每次重复之前跑一次参照负载。
+    共享虚拟机上的变慢往往持续数秒，交替运行让每项的重复分散在整个运行期间，
+    不会全部落在同一段慢的时间里；整段运行都变慢时，参照负载的最快一次也随之变慢。
+    返回 (每项每操作纳秒数的 (最快一次, 中位数, MAD) 列表, 参照负载最快一次的纳秒数)
+    """
+    loops = [_calibrate(run, min_time / repeat) for run, _ in benchmarks]
+    samples: List[List[float]] = [[] for _ in benchmarks]
+    reference = None
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for (run, ops), count, collected in zip(benchmarks, loops, samples):
+                start = time.perf_counter_ns()
+                _reference_workload()
+                elapsed = time.perf_counter_ns() - start
+                reference = elapsed if reference is None else min(reference, elapsed)
+
+                start = time.perf_counter_ns()
+                for _ in range(count):
+                    run()
+                collected.append((time.perf_counter_ns() - start) / count / ops)
+    finally:
+        if enabled:
+            gc.enable()
+
+    results = []
+    for collected in samples:
+        median = statistics.median(collected)
+        mad = statistics.median(abs(sample - median) for sample in collected)
+        results.append((min(collected), median, mad))
+    return results, reference
+
+
+def time_benchmark(run: Callable[[], list], ops: int, repeat: int = 10,
+                   min_time: float = 0.2) -> Tuple[float, float, float]:
+    """单独测量一项基准，返回每操作纳秒数的 (最快一次, 中位数, MAD)"""
+    return time_benchmarks([(run, ops)], repeat, min_time)[0][0]
+
+
+def measure_memory(run: Callable[[], list], ops: int) -> Tuple[float, float, float]:
+    """
+    用tracemalloc跑一轮并保留结果，返回 (每操作保留的内存块数, 每操作保留的字节数, 峰值KiB)
+    保留量包括存放结果的列表本身，各次运行之间可以直接比较
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        results = run()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+        del results
+    finally:
+        tracemalloc.stop()
+    return blocks / ops, (current - base) / ops, (peak - base) / 1024
+
+
+def run_benchmarks(selected: Optional[List[str]] = None, repeat: int = 10,
+                   min_time: float = 0.2) -> Dict[str, BenchResult]:
+    """运行全部（或名称中包含selected任一项的）基准"""
+    benchmarks = {}
+    for corpus_name, packets in build_corpora().items():
+        for operation in OPERATIONS:
+            key = f'{corpus_name}/{operation}'
+            if selected and not any(part in key for part in selected):
+                continue
+            benchmarks[key] = make_benchmark(operation, packets, malformed=corpus_name == 'malformed')
+
+    timings, reference = time_benchmarks(list(benchmarks.values()), repeat, min_time)
+    results = {}
+    for (key, (run, ops)), (best, median, mad) in zip(benchmarks.items(), timings):
+        blocks, size, peak = measure_memory(run, ops)
+        results[key] = BenchResult(round(best, 1), round(median, 1), round(mad, 2), round(reference), ops,
+                                   round(blocks, 2), round(size, 1), round(peak, 1))
+    return results
+
+
+def recheck(results: Dict[str, BenchResult], keys: List[str], repeat: int = 10,
+            min_time: float = 0.2) -> None:
+    """重新测量keys中的基准，每项保留历次测量中按机器快慢换算后最快的一次（连同那次的MAD）"""
+    again = run_benchmarks(keys, repeat, min_time)
+    for key in keys:
+        new, old = again[key], results[key]
+        results[key] = new if new.ns_per_op / new.reference_ns < old.ns_per_op / old.reference_ns else old
+
+
+def compare(current: Dict[str, BenchResult], baseline: Dict[str, Dict],
+            threshold: float = DEFAULT_THRESHOLD, verbose: bool = True) -> List[str]:
+    """
+    逐项与基线比较，打印变化，返回回退的项
+
+    耗时比较最快一次的绝对值，基线按两次运行参照负载的快慢换算：变慢超过threshold，
+    并且超过两次运行中较大MAD的NOISE_MADS倍，才算回退；噪声本身超过threshold时
+    该项无法判断，只标注不判回退。
+    保留内存按字节数比较，超出阈值即为回退
+    """
+    regressions = []
+    show = print if verbose else (lambda *args, **kwargs: None)
+    show(f"{'基准':<36}{'基线ns':>10}{'本次ns':>10}{'耗时变化':>10}{'噪声':>10}{'内存变化':>10}")
+    for key, result in current.items():
+        old = baseline.get(key)
+        if old is None:
+            show(f"{key:<36}{'-':>10}{result.ns_per_op:>10.1f}{'新增':>10}")
+            continue
+        # 这次运行时机器整体变慢（参照负载也变慢）的部分不算回退
+        expected = old['ns_per_op'] * result.reference_ns / old.get('reference_ns', result.reference_ns)
+        time_change = result.ns_per_op / expected - 1
+        noise = NOISE_MADS * max(result.mad_ns, old.get('mad_ns', 0.0)) / old['ns_per_op']
+        memory_change = (result.bytes_per_op / old['bytes_per_op'] - 1) if old['bytes_per_op'] else 0.0
+        regressed = (time_change > threshold and time_change > noise) or memory_change > threshold
+        mark = '  回退' if regressed else ('  噪声过大' if noise > threshold else '')
+        show(f"{key:<36}{old['ns_per_op']:>10.1f}{result.ns_per_op:>10.1f}"
+              f"{time_change:>+10.1%}{noise:>10.1%}{memory_change:>+10.1%}{mark}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    """运行基准，可保存结果或与之前的结果比较"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="dns_parser 热路径微基准")
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    parser.add_argument("--compare", help="与之前保存的JSON结果比较，出现回退时以状态1退出")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="回退阈值（默认0.10，即慢10%%）")
+    parser.add_argument("--filter", action="append", help="只运行名称包含该字符串的基准，可重复指定")
+    parser.add_argument("--repeat", type=int, default=10, help="重复次数，取最快一次（默认10）")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每项基准大约的运行秒数")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, args.repeat, args.min_time)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        # 疑似回退的项重新测量，只有每次都慢的才报告
+        regressions = compare(results, baseline, args.threshold, verbose=False)
+        for _ in range(RECHECKS):
+            if not regressions:
+                break
+            recheck(results, regressions, args.repeat, args.min_time)
+            regressions = compare({key: results[key] for key in regressions}, baseline, args.threshold,
+                                  verbose=False)
+        regressions = compare(results, baseline, args.threshold)
+    else:
+        regressions = []
+        print(f"{'基准':<36}{'ns/操作':>10}{'块/操作':>10}{'字节/操作':>11}{'峰值KiB':>10}")
+        for key, result in results.items():
+            print(f"{key:<36}{result.ns_per_op:>10.1f}{result.blocks_per_op:>10.2f}"
+                  f"{result.bytes_per_op:>11.1f}{result.peak_kib:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "implementation": platform.python_implementation(),
+                    "machine": platform.machine(),
+                    "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                },
+                "results": {key: asdict(result) for key, result in results.items()}
+            }, f, ensure_ascii=False, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} 项基准回退超过 {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+DNS报文构造
+
+DNSMessageBuilder 在预分配的 bytearray 中就地写入报文，域名按 RFC 1035 第4.1.4节
+用 后缀 -> 偏移量 表做压缩；QueryTemplate 把 (名称, 类型) 的查询预先编码好，
+每次发送只需替换2字节的事务ID，适合批量生成合成查询做压测。
+"""
+import random
+import struct
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple, Union
+
+_HEADER_STRUCT = struct.Struct('!6H')
+_QUESTION_STRUCT = struct.Struct('!HH')
+_RR_STRUCT = struct.Struct('!HHIH')
+_ID_STRUCT = struct.Struct('!H')
+_POINTER_STRUCT = struct.Struct('!H')
+
+# 报文各部分，按顺序添加
+SECTION_QUESTION = 0
+SECTION_ANSWER = 1
+SECTION_AUTHORITY = 2
+SECTION_ADDITIONAL = 3
+
+# 常用标志
+FLAG_QR = 0x8000   # 响应
+FLAG_AA = 0x0400   # 权威应答
+FLAG_TC = 0x0200   # 截断
+FLAG_RD = 0x0100   # 期望递归
+FLAG_RA = 0x0080   # 可用递归
+
+CLASS_IN = 1
+TYPE_OPT = 41
+
+# 压缩指针只能指向报文前16KB
+MAX_POINTER_OFFSET = 0x3FFF
+# 默认通告的EDNS UDP缓冲区大小（DNS Flag Day 2020建议值）
+DEFAULT_EDNS_PAYLOAD_SIZE = 1232
+
+_rng = random.SystemRandom()
+
+
+def random_transaction_id() -> int:
+    """使用系统随机源生成不可预测的事务ID"""
+    return _rng.getrandbits(16)
+
+
+class DNSMessageBuilder:
+    """
+    在预分配缓冲区中构造DNS报文
+
+    各部分必须按 问题、回答、授权、附加 的顺序添加，计数在 build() 时写回头部。
+    reset() 后缓冲区可以复用，不再重新分配内存。
+    """
+
+    def __init__(self, capacity: int = 512):
+        self._buf = bytearray(capacity)
+        self.reset()
+
+    def reset(self, transaction_id: Optional[int] = None, flags: int = FLAG_RD) -> 'DNSMessageBuilder':
+        """开始构造新报文；transaction_id为None时随机生成"""
+        self.transaction_id = random_transaction_id() if transaction_id is None else transaction_id
+        self.flags = flags
+        self._length = 12
+        self._counts = [0, 0, 0, 0]
+        self._section = SECTION_QUESTION
+        self._names = {}  # 已写入的名称后缀 -> 偏移量
+        return self
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _reserve(self, size: int):
+        """保证缓冲区还能写入size字节，不够时成倍扩容"""
+        needed = self._length + size
+        if needed > len(self._buf):
+            self._buf.extend(bytes(max(needed, 2 * len(self._buf)) - len(self._buf)))
+
+    def _enter(self, section: int):
+        if section < self._section:
+            raise ValueError("报文各部分必须按 问题、回答、授权、附加 的顺序添加")
+        self._section = section
+        self._counts[section] += 1
+
+    def write_name(self, name: str):
+        """写入域名，能压缩的后缀写成指向已有位置的指针"""
+        name = name.rstrip('.')
+        names = self._names
+        position = 0
+
+        if name:
+            for label in name.split('.'):
+                suffix = name[position:]
+                pointer = names.get(suffix)
+                if pointer is not None:
+                    self._reserve(2)
+                    _POINTER_STRUCT.pack_into(self._buf, self._length, 0xC000 | pointer)
+                    self._length += 2
+                    return
+
+                encoded = label.encode('utf-8')
+                length = len(encoded)
+                if not 0 < length < 64:
+                    raise ValueError(f"标签长度必须在1到63字节之间: {label!r}")
+                if self._length <= MAX_POINTER_OFFSET:
+                    names[suffix] = self._length
+
+                self._reserve(length + 1)
+                buf = self._buf
+                offset = self._length
+                buf[offset] = length
+                buf[offset + 1:offset + 1 + length] = encoded
+                self._length = offset + 1 + length
+                position += len(label) + 1
+
+        self._reserve(1)
+        self._buf[self._length] = 0
+        self._length += 1
+
+    def add_question(self, name: str, qtype: int, qclass: int = CLASS_IN) -> 'DNSMessageBuilder':
+        self._enter(SECTION_QUESTION)
+        self.write_name(name)
+        self._reserve(4)
+        _QUESTION_STRUCT.pack_into(self._buf, self._length, qtype, qclass)
+        self._length += 4
+        return self
+
+    def add_record(self, section: int, name: str, type_: int, ttl: int,
+                   rdata: Union[bytes, str], class_: int = CLASS_IN) -> 'DNSMessageBuilder':
+        """
+        添加资源记录；rdata为str时按（可压缩的）域名编码，
+        适用于 NS/CNAME/PTR 这类数据只有一个名称的记录
+        """
+        if section == SECTION_QUESTION:
+            raise ValueError("问题部分请使用 add_question")
+        self._enter(section)
+        self.write_name(name)
+
+        self._reserve(10)
+        header_offset = self._length
+        self._length += 10
+        if isinstance(rdata, str):
+            self.write_name(rdata)
+        else:
+            self._reserve(len(rdata))
+            self._buf[self._length:self._length + len(rdata)] = rdata
+            self._length += len(rdata)
+
+        rdlength = self._length - header_offset - 10
+        if rdlength > 0xFFFF:
+            raise ValueError("资源记录数据超过65535字节")
+        _RR_STRUCT.pack_into(self._buf, header_offset, type_, class_, ttl, rdlength)
+        return self
+
+    def add_answer(self, name: str, type_: int, ttl: int, rdata: Union[bytes, str],
+                   class_: int = CLASS_IN) -> 'DNSMessageBuilder':
+        return self.add_record(SECTION_ANSWER, name, type_, ttl, rdata, class_)
+
+    def add_authority(self, name: str, type_: int, ttl: int, rdata: Union[bytes, str],
+                      class_: int = CLASS_IN) -> 'DNSMessageBuilder':
+        return self.add_record(SECTION_AUTHORITY, name, type_, ttl, rdata, class_)
+
+    def add_additional(self, name: str, type_: int, ttl: int, rdata: Union[bytes, str],
+                       class_: int = CLASS_IN) -> 'DNSMessageBuilder':
+        return self.add_record(SECTION_ADDITIONAL, name, type_, ttl, rdata, class_)
+
+    def add_edns(self, udp_payload_size: int = DEFAULT_EDNS_PAYLOAD_SIZE, dnssec_ok: bool = False,
+                 options: Iterable[Tuple[int, bytes]] = (), extended_rcode: int = 0,
+                 version: int = 0) -> 'DNSMessageBuilder':
+        """在附加部分添加EDNS0 OPT伪记录"""
+        rdata = b''.join(struct.pack('!HH', code, len(data)) + data for code, data in options)
+        ttl = (extended_rcode << 24) | (version << 16) | (0x8000 if dnssec_ok else 0)
+        return self.add_record(SECTION_ADDITIONAL, '', TYPE_OPT, ttl, rdata, udp_payload_size)
+
+    def view(self) -> memoryview:
+        """写回头部并返回缓冲区中报文部分的视图（下次reset后失效）"""
+        _HEADER_STRUCT.pack_into(self._buf, 0, self.transaction_id, self.flags, *self._counts)
+        return memoryview(self._buf)[:self._length]
+
+    def build(self) -> bytes:
+        """写回头部并返回报文"""
+        with self.view() as view:
+            return view.tobytes()
+
+
+class QueryTemplate:
+    """预编码的查询报文，每次发送只替换事务ID"""
+
+    __slots__ = ('name', 'qtype', 'qclass', '_tail')
+
+    def __init__(self, name: str, qtype: int, qclass: int = CLASS_IN, flags: int = FLAG_RD,
+                 edns_payload_size: Optional[int] = None):
+        self.name = name
+        self.qtype = qtype
+        self.qclass = qclass
+        builder = DNSMessageBuilder(64 + len(name)).reset(0, flags).add_question(name, qtype, qclass)
+        if edns_payload_size is not None:
+            builder.add_edns(edns_payload_size)
+        self._tail = builder.build()[2:]
+
+    def __len__(self) -> int:
+        return len(self._tail) + 2
+
+    def render(self, transaction_id: Optional[int] = None) -> bytes:
+        """生成带指定（默认随机）事务ID的查询报文"""
+        if transaction_id is None:
+            transaction_id = random_transaction_id()
+        return _ID_STRUCT.pack(transaction_id) + self._tail
+
+    def render_into(self, buf: bytearray, transaction_id: int, offset: int = 0) -> int:
+        """把查询写入调用方的缓冲区，返回写入的字节数"""
+        end = offset + 2 + len(self._tail)
+        _ID_STRUCT.pack_into(buf, offset, transaction_id)
+        buf[offset + 2:end] = self._tail
+        return end - offset
+
+
+@lru_cache(maxsize=4096)
+def query_template(name: str, qtype: int, qclass: int = CLASS_IN, flags: int = FLAG_RD,
+                   edns_payload_size: Optional[int] = None) -> QueryTemplate:
+    """按 (名称, 类型, ...) 缓存的查询模板"""
+    return QueryTemplate(name, qtype, qclass, flags, edns_payload_size)
+
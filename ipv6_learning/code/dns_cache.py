@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+按TTL过期的DNS响应缓存
+
+以 (小写名称, 类型, 类别) 为键缓存响应报文：
+肯定应答按回答部分中资源记录的最小TTL过期；
+NXDOMAIN和NODATA按 RFC 2308 做否定缓存，TTL取授权部分SOA记录的TTL与MINIMUM字段中较小的一个。
+容量有上限，满了按LRU淘汰，命中、未命中、淘汰等计数可以用来确定合适的容量。
+"""
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from dns_parser import DNSMessage
+
+CacheKey = Tuple[str, int, int]
+
+TYPE_SOA = 6
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+_UINT32 = struct.Struct('!I')
+
+
+@dataclass
+class CacheStats:
+    """缓存计数"""
+    hits: int = 0
+    negative_hits: int = 0   # hits中命中否定缓存的次数
+    misses: int = 0
+    expirations: int = 0     # 查找时发现已过期而删除的条目
+    evictions: int = 0       # 容量已满被LRU淘汰的条目
+    uncacheable: int = 0     # 无法缓存的响应（SERVFAIL、截断、没有SOA的否定应答等）
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def soa_minimum(message: DNSMessage) -> Optional[int]:
+    """
+    否定缓存的TTL：授权部分SOA记录的TTL与其MINIMUM字段取较小值
+    MINIMUM是SOA数据的最后4个字节，不需要解压前面的两个名称
+    """
+    for record in message.authorities:
+        if record.type_ == TYPE_SOA and len(record.data) >= 22:
+            minimum = _UINT32.unpack_from(record.data, len(record.data) - 4)[0]
+            return min(record.ttl, minimum)
+    return None
+
+
+def cache_ttl(message: DNSMessage) -> Optional[int]:
+    """计算响应可以缓存的秒数，不能缓存时返回None"""
+    header = message.header
+    if header.truncated:
+        return None
+
+    rcode = message.rcode
+    if rcode == RCODE_NOERROR and header.ancount:
+        # OPT伪记录只出现在附加部分，回答部分的TTL都是真实值
+        return min(record.ttl for record in message.answers)
+    if rcode == RCODE_NXDOMAIN or (rcode == RCODE_NOERROR and not header.ancount):
+        return soa_minimum(message)
+    return None
+
+
+class DNSCache:
+    """
+    带LRU淘汰的DNS响应缓存
+
+    max_entries限制条目数；max_ttl给过长的TTL设上限，min_ttl避免TTL为0的记录反复穿透。
+    clock默认使用单调时钟，测试时可以替换。
+    """
+
+    def __init__(self, max_entries: int = 10000, max_ttl: int = 86400, min_ttl: int = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.min_ttl = min_ttl
+        self.clock = clock
+        self.stats = CacheStats()
+        # 键 -> (过期时间, 响应报文, 是否否定应答)
+        self._entries: 'OrderedDict[CacheKey, Tuple[float, DNSMessage, bool]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(name: str, qtype: int, qclass: int = 1) -> CacheKey:
+        return name.rstrip('.').lower(), qtype, qclass
+
+    def get(self, name: str, qtype: int, qclass: int = 1) -> Optional[DNSMessage]:
+        """
+        查找未过期的响应，命中时把条目移到LRU队尾
+        返回的是当初缓存的报文，事务ID和TTL都保持原样
+        """
+        key = self.make_key(name, qtype, qclass)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires, message, negative = entry
+        if expires <= self.clock():
+            del self._entries[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        if negative:
+            self.stats.negative_hits += 1
+        return message
+
+    def remaining_ttl(self, name: str, qtype: int, qclass: int = 1) -> Optional[float]:
+        """条目剩余的存活秒数，不存在或已过期时返回None；不影响计数和LRU顺序"""
+        entry = self._entries.get(self.make_key(name, qtype, qclass))
+        if entry is None:
+            return None
+        remaining = entry[0] - self.clock()
+        return remaining if remaining > 0 else None
+
+    def put(self, message: DNSMessage, name: Optional[str] = None,
+            qtype: Optional[int] = None, qclass: Optional[int] = None) -> bool:
+        """
+        缓存一个响应，返回是否被缓存
+        键默认取自响应的问题部分
+        """
+        if name is None or qtype is None:
+            if len(message.questions) != 1:
+                self.stats.uncacheable += 1
+                return False
+            question = message.questions[0]
+            name, qtype, qclass = question.name, question.type_, question.class_
+
+        ttl = cache_ttl(message)
+        if ttl is None:
+            self.stats.uncacheable += 1
+            return False
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        if ttl <= 0:
+            return False
+
+        key = self.make_key(name, qtype, qclass if qclass is not None else 1)
+        negative = message.rcode == RCODE_NXDOMAIN or not message.header.ancount
+        entries = self._entries
+        entries[key] = (self.clock() + ttl, message, negative)
+        entries.move_to_end(key)
+
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.stats.evictions += 1
+        return True
+
+    def purge_expired(self) -> int:
+        """删除所有已过期的条目，返回删除的数量"""
+        now = self.clock()
+        expired = [key for key, (expires, _, _) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        self.stats.expirations += len(expired)
+        return len(expired)
+
+    def clear(self):
+        self._entries.clear()
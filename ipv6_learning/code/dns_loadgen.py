@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+DNS负载生成器
+
+按目标QPS开环发送查询（不等待上一个响应），查询从加权的查询组合中抽取，
+由预编码的 QueryTemplate 生成；响应用 DNSParser 完整解析。
+结束后报告实际QPS、时延分位数（p50/p90/p99）、丢失数，以及每个报文的构造和解析CPU时间，
+与 dns_server.py 配合在回环地址上发现解析/构造热路径的性能回退。
+"""
+import asyncio
+import random
+import struct
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dns_builder import DEFAULT_EDNS_PAYLOAD_SIZE, QueryTemplate, query_template
+from dns_parser import TYPE_A, TYPE_AAAA, DNSParser, record_type_code
+from pcap_reader import MALFORMED_ERRORS
+
+# 发送循环的节拍：每个节拍补发落后于目标速率的查询
+TICK = 0.001
+# 预先抽样的查询序列长度，发送时循环使用，避免在热路径上调用random
+SCHEDULE_LENGTH = 65536
+
+_LENGTH_STRUCT = struct.Struct('!H')
+
+QueryMix = List[Tuple[str, int, float]]  # (名称, 类型, 权重)
+
+
+def load_mix(path: str) -> QueryMix:
+    """读取查询组合，每行 "名称 [类型] [权重]"，类型默认A，权重默认1"""
+    mix = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            qtype = record_type_code(fields[1]) if len(fields) > 1 else TYPE_A
+            weight = float(fields[2]) if len(fields) > 2 else 1.0
+            mix.append((fields[0], qtype, weight))
+    if not mix:
+        raise ValueError(f"查询组合为空: {path}")
+    return mix
+
+
+def synthetic_mix(count: int, origin: str = 'example.com', nx_ratio: float = 0.05) -> QueryMix:
+    """与 dns_server.py --synthetic 对应的查询组合：A和AAAA各半，另按nx_ratio混入不存在的名称"""
+    mix = []
+    for i in range(count):
+        mix.append((f'host{i}.{origin}', TYPE_A, 1.0))
+        mix.append((f'host{i}.{origin}', TYPE_AAAA, 1.0))
+    if nx_ratio > 0:
+        weight = 2 * nx_ratio / (1 - nx_ratio)  # 使不存在的名称占总权重的nx_ratio
+        mix.extend((f'missing{i}.{origin}', TYPE_A, weight) for i in range(count))
+    return mix
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """已排序序列的分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+@dataclass
+class LoadReport:
+    """一次压测的结果"""
+    target_qps: float
+    duration: float
+    sent: int = 0
+    received: int = 0
+    lost: int = 0          # 超时仍未收到响应
+    mismatched: int = 0    # 事务ID未知或问题不匹配的响应
+    malformed: int = 0
+    truncated: int = 0
+    build_ns: int = 0      # 生成查询报文的累计CPU时间
+    parse_ns: int = 0      # 解析响应的累计CPU时间
+    rcodes: Counter = field(default_factory=Counter)
+    latencies: List[float] = field(default_factory=list, repr=False)  # 毫秒
+
+    @property
+    def achieved_qps(self) -> float:
+        return self.received / self.duration if self.duration else 0.0
+
+    def summary(self) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            "target_qps": self.target_qps,
+            "achieved_qps": round(self.achieved_qps, 1),
+            "duration": round(self.duration, 3),
+            "sent": self.sent,
+            "received": self.received,
+            "lost": self.lost,
+            "mismatched": self.mismatched,
+            "malformed": self.malformed,
+            "truncated": self.truncated,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 0.50), 3),
+                "p90": round(percentile(latencies, 0.90), 3),
+                "p99": round(percentile(latencies, 0.99), 3),
+                "max": round(latencies[-1], 3) if latencies else 0.0
+            },
+            "build_us_per_query": round(self.build_ns / max(self.sent, 1) / 1000, 3),
+            "parse_us_per_response": round(self.parse_ns / max(self.received, 1) / 1000, 3),
+            "rcodes": dict(self.rcodes)
+        }
+
+
+class _UDPClient(asyncio.DatagramProtocol):
+    def __init__(self, generator: 'LoadGenerator'):
+        self.generator = generator
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.generator._on_response(data)
+
+    def error_received(self, exc):
+        pass
+
+
+class LoadGenerator:
+    """
+    开环负载生成器
+
+    所有套接字（或TCP连接）共用一张 事务ID -> (模板, 发送时间) 的表，
+    事务ID顺序递增，表中仍有未完成查询的ID会被跳过。
+    """
+
+    def __init__(self, server: str, port: int, mix: QueryMix, qps: float, duration: float,
+                 timeout: float = 1.0, sockets: int = 4, tcp: bool = False,
+                 edns_payload_size: Optional[int] = DEFAULT_EDNS_PAYLOAD_SIZE, seed: int = 0):
+        self.server = server
+        self.port = port
+        self.qps = qps
+        self.duration = duration
+        self.timeout = timeout
+        self.sockets = sockets
+        self.tcp = tcp
+        self.report = LoadReport(target_qps=qps, duration=duration)
+
+        templates = [query_template(name, qtype, edns_payload_size=edns_payload_size)
+                     for name, qtype, _ in mix]
+        weights = [weight for _, _, weight in mix]
+        self._schedule: List[QueryTemplate] = random.Random(seed).choices(
+            templates, weights, k=min(SCHEDULE_LENGTH, max(len(templates), int(qps * duration))))
+        self._pending: Dict[int, Tuple[QueryTemplate, int]] = {}
+        self._next_id = 0
+        self._writers = []
+
+    def _on_response(self, data: bytes):
+        received = time.perf_counter_ns()
+        report = self.report
+        if len(data) < 12:
+            report.malformed += 1
+            return
+        entry = self._pending.pop((data[0] << 8) | data[1], None)
+        if entry is None:
+            report.mismatched += 1
+            return
+        template, sent = entry
+
+        start = time.thread_time_ns()
+        try:
+            message = DNSParser(data).parse_message()
+            question = message.questions[0]
+            message.answers  # 回答部分也计入解析耗时
+            rcode = message.rcode
+        except MALFORMED_ERRORS:
+            report.parse_ns += time.thread_time_ns() - start
+            report.malformed += 1
+            return
+        report.parse_ns += time.thread_time_ns() - start
+
+        if question.type_ != template.qtype or question.name.lower() != template.name.lower():
+            report.mismatched += 1
+            return
+        report.received += 1
+        report.rcodes[rcode] += 1
+        if message.header.truncated:
+            report.truncated += 1
+        report.latencies.append((received - sent) / 1e6)
+
+    def _transaction_id(self) -> Optional[int]:
+        """下一个空闲的事务ID；65536个ID全部在途时返回None"""
+        pending = self._pending
+        for _ in range(len(pending) + 1):
+            transaction_id = self._next_id
+            self._next_id = (transaction_id + 1) & 0xFFFF
+            if transaction_id not in pending:
+                return transaction_id
+        return None
+
+    async def _connect(self):
+        loop = asyncio.get_running_loop()
+        for _ in range(self.sockets):
+            if self.tcp:
+                reader, writer = await asyncio.open_connection(self.server, self.port)
+                loop.create_task(self._read_tcp(reader))
+                self._writers.append(writer)
+            else:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _UDPClient(self), remote_addr=(self.server, self.port))
+                self._writers.append(transport)
+
+    async def _read_tcp(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                length = _LENGTH_STRUCT.unpack(await reader.readexactly(2))[0]
+                self._on_response(await reader.readexactly(length))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def _send(self, count: int):
+        report = self.report
+        schedule = self._schedule
+        writers = self._writers
+        for _ in range(count):
+            transaction_id = self._transaction_id()
+            if transaction_id is None:
+                return
+            template = schedule[report.sent % len(schedule)]
+            writer = writers[report.sent % len(writers)]
+
+            start = time.thread_time_ns()
+            query = template.render(transaction_id)
+            report.build_ns += time.thread_time_ns() - start
+
+            self._pending[transaction_id] = (template, time.perf_counter_ns())
+            if self.tcp:
+                writer.write(_LENGTH_STRUCT.pack(len(query)) + query)
+            else:
+                writer.sendto(query)
+            report.sent += 1
+
+    def _expire(self, now: int):
+        """删除超时未回答的查询，计入丢失"""
+        deadline = now - int(self.timeout * 1e9)
+        expired = [tid for tid, (_, sent) in self._pending.items() if sent < deadline]
+        for transaction_id in expired:
+            del self._pending[transaction_id]
+        self.report.lost += len(expired)
+
+    async def run(self) -> LoadReport:
+        await self._connect()
+        start = time.perf_counter()
+        next_expire = start + self.timeout
+        try:
+            while True:
+                now = time.perf_counter()
+                elapsed = now - start
+                if elapsed >= self.duration:
+                    self.report.duration = elapsed
+                    break
+                self._send(int(elapsed * self.qps) - self.report.sent)
+                if now >= next_expire:
+                    self._expire(time.perf_counter_ns())
+                    next_expire = now + self.timeout
+                await asyncio.sleep(TICK)
+
+            # 等最后一批响应到达
+            grace = time.perf_counter() + self.timeout
+            while self._pending and time.perf_counter() < grace:
+                await asyncio.sleep(TICK)
+            self.report.lost += len(self._pending)
+            self._pending.clear()
+        finally:
+            for writer in self._writers:
+                writer.close()
+        return self.report
+
+
+def main():
+    """按目标QPS压测DNS服务器并输出报告"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="按目标QPS回放DNS查询组合")
+    parser.add_argument("--server", default="::1", help="服务器地址（默认::1）")
+    parser.add_argument("--port", type=int, default=5353, help="服务器端口（默认5353）")
+    parser.add_argument("--mix", help="查询组合文件，每行 \"名称 [类型] [权重]\"")
+    parser.add_argument("--synthetic", type=int, default=10000,
+                        help="未指定查询组合时使用的合成主机数，与 dns_server.py 一致（默认10000）")
+    parser.add_argument("--nx-ratio", type=float, default=0.05, help="合成组合中不存在名称的比例")
+    parser.add_argument("--qps", type=float, default=5000, help="目标QPS（默认5000）")
+    parser.add_argument("--duration", type=float, default=10, help="发送时长秒数（默认10）")
+    parser.add_argument("--timeout", type=float, default=1.0, help="超过多少秒未收到响应算丢失")
+    parser.add_argument("--sockets", type=int, default=4, help="UDP套接字或TCP连接数")
+    parser.add_argument("--tcp", action="store_true", help="经TCP发送（同一连接上流水线）")
+    parser.add_argument("--no-edns", action="store_true", help="查询不带EDNS0 OPT记录")
+    parser.add_argument("--json", help="把报告写入JSON文件")
+    args = parser.parse_args()
+
+    mix = load_mix(args.mix) if args.mix else synthetic_mix(args.synthetic, nx_ratio=args.nx_ratio)
+    generator = LoadGenerator(args.server, args.port, mix, qps=args.qps, duration=args.duration,
+                              timeout=args.timeout, sockets=args.sockets, tcp=args.tcp,
+                              edns_payload_size=None if args.no_edns else DEFAULT_EDNS_PAYLOAD_SIZE)
+    summary = asyncio.run(generator.run()).summary()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    latency = summary["latency_ms"]
+    print(f"目标QPS: {summary['target_qps']:.0f}  实际QPS: {summary['achieved_qps']:.0f}  "
+          f"用时: {summary['duration']:.2f} 秒")
+    print(f"发送: {summary['sent']}  收到: {summary['received']}  丢失: {summary['lost']}  "
+          f"不匹配: {summary['mismatched']}  格式错误: {summary['malformed']}  截断: {summary['truncated']}")
+    print(f"时延(毫秒): p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  "
+          f"最大 {latency['max']}")
+    print(f"构造查询: {summary['build_us_per_query']} 微秒/个  "
+          f"解析响应: {summary['parse_us_per_response']} 微秒/个")
+    print(f"响应码: {summary['rcodes']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,46 @@
 #!/usr/bin/env python3
+import socket
 import struct
-import ipaddress
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
+
+from dns_builder import query_template
+
+# 预编译的结构体，配合 unpack_from 按偏移量直接解码，避免切片产生临时 bytes
+_HEADER_STRUCT = struct.Struct('!6H')     # ID、标志、四个计数器
+_QUESTION_STRUCT = struct.Struct('!HH')   # 类型、类别
+_RR_STRUCT = struct.Struct('!HHIH')       # 类型、类别、TTL、数据长度
+_OPTION_STRUCT = struct.Struct('!HH')     # EDNS选项代码、长度
+_MX_STRUCT = struct.Struct('!H')          # MX优先级
+_SOA_STRUCT = struct.Struct('!5I')        # SOA序列号、刷新、重试、过期、最小TTL
+_SRV_STRUCT = struct.Struct('!3H')        # SRV优先级、权重、端口
+
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_CNAME = 5
+TYPE_SOA = 6
+TYPE_PTR = 12
+TYPE_MX = 15
+TYPE_TXT = 16
+TYPE_AAAA = 28
+TYPE_SRV = 33
+TYPE_OPT = 41
+# 记录数据中含有（可能压缩的）名称的类型，解码时需要原报文
+_NAME_RDATA_TYPES = frozenset((TYPE_NS, TYPE_CNAME, TYPE_SOA, TYPE_PTR, TYPE_MX, TYPE_SRV))
+
+# 名称解压时允许的最大指针跳转次数，防止指针环
+MAX_POINTER_HOPS = 64
+# 名称在报文中的最大长度（RFC 1035）
+MAX_NAME_LENGTH = 255
+
+# 记录类都声明 __slots__，不带 __dict__，在内存中保留数千万条记录时每条可省下上百字节
 
 @dataclass
 class DNSHeader:
     """DNS报文头部结构"""
+    __slots__ = ('id', 'is_response', 'opcode', 'authoritative', 'truncated',
+                 'recursion_desired', 'recursion_available', 'rcode',
+                 'qdcount', 'ancount', 'nscount', 'arcount')
     id: int
     is_response: bool
     opcode: int
@@ -23,18 +57,169 @@ class DNSHeader:
 @dataclass
 class DNSQuestion:
     """DNS问题部分结构"""
+    __slots__ = ('name', 'type_', 'class_')
     name: str
     type_: int
     class_: int
 
+@dataclass
+class MXData:
+    """MX记录数据"""
+    __slots__ = ('preference', 'exchange')
+    preference: int
+    exchange: str
+
+@dataclass
+class SOAData:
+    """SOA记录数据"""
+    __slots__ = ('mname', 'rname', 'serial', 'refresh', 'retry', 'expire', 'minimum')
+    mname: str
+    rname: str
+    serial: int
+    refresh: int
+    retry: int
+    expire: int
+    minimum: int
+
+@dataclass
+class SRVData:
+    """SRV记录数据（RFC 2782）"""
+    __slots__ = ('priority', 'weight', 'port', 'target')
+    priority: int
+    weight: int
+    port: int
+    target: str
+
+@dataclass
+class TXTData:
+    """TXT记录数据，由一个或多个字符串组成，内容不一定是UTF-8"""
+    __slots__ = ('strings',)
+    strings: List[bytes]
+    
+    @property
+    def text(self) -> str:
+        return ''.join(s.decode('utf-8', 'replace') for s in self.strings)
+
+# A/AAAA为地址字符串，NS/CNAME/PTR为名称，不认识的类型为原始数据
+RData = Union[str, MXData, SOAData, SRVData, TXTData, bytes, memoryview]
+
 @dataclass
 class DNSResourceRecord:
-    """DNS资源记录结构"""
+    """
+    DNS资源记录结构
+    rdata在第一次访问时才按类型解码，其中的压缩名称对照原报文解压
+    """
+    # 后三个槽不是数据类字段：数据中含名称的记录由解析器设置原报文（_RDataSource）和数据偏移量，
+    # 解码后不再引用原报文；_rdata 缓存解码结果
+    __slots__ = ('name', 'type_', 'class_', 'ttl', 'data', '_source', '_rdata_offset', '_rdata')
     name: str
     type_: int
     class_: int
     ttl: int
-    data: bytes
+    data: Union[bytes, memoryview]  # 零拷贝模式下为原报文的视图
+    
+    @property
+    def rdata(self) -> RData:
+        """按类型解码的记录数据，结果缓存在记录上"""
+        try:
+            return self._rdata
+        except AttributeError:
+            pass
+        data = self.data
+        if self.type_ not in _NAME_RDATA_TYPES:
+            self._rdata = _decode_plain_rdata(self.type_, data, data, 0, len(data))
+        else:
+            try:
+                source, offset = self._source, self._rdata_offset
+            except AttributeError:
+                source = None
+            if source is None:
+                # 不是解析器产生的记录，没有原报文，数据中的压缩指针无法解压
+                parser, offset = DNSParser(bytes(data)), 0
+            else:
+                parser = DNSParser(source.packet, intern=source.intern)
+            self._rdata = parser.decode_rdata(self.type_, offset, len(data))
+            self._source = None
+        return self._rdata
+
+def _decode_plain_rdata(type_: int, raw, buf, start: int, end: int) -> RData:
+    """解码不含名称的记录数据：A/AAAA用inet_ntop直接格式化，TXT拆成字符串，其他类型返回buf中的原始数据"""
+    length = end - start
+    if type_ == TYPE_A:
+        if length != 4:
+            raise ValueError(f"A记录数据长度应为4字节: {length}")
+        return socket.inet_ntop(socket.AF_INET, raw[start:end])
+    if type_ == TYPE_AAAA:
+        if length != 16:
+            raise ValueError(f"AAAA记录数据长度应为16字节: {length}")
+        return socket.inet_ntop(socket.AF_INET6, raw[start:end])
+    if type_ == TYPE_TXT:
+        strings = []
+        offset = start
+        while offset < end:
+            size = raw[offset]
+            if offset + 1 + size > end:
+                raise ValueError("TXT字符串超出数据范围")
+            strings.append(bytes(raw[offset + 1:offset + 1 + size]))
+            offset += 1 + size
+        return TXTData(strings)
+    return buf[start:end]
+
+class _RDataSource:
+    """含名称的记录数据解码时需要的原报文和驻留表；同一报文的记录共用一个，不引用解析器和它的名称缓存"""
+    __slots__ = ('packet', 'intern')
+
+    def __init__(self, packet: Union[bytes, bytearray, memoryview], intern: Optional['NameInternTable']):
+        self.packet = packet
+        self.intern = intern
+
+@dataclass
+class EDNSOption:
+    """EDNS0选项"""
+    __slots__ = ('code', 'data')
+    code: int
+    data: Union[bytes, memoryview]
+
+@dataclass
+class EDNSInfo:
+    """EDNS0 OPT伪记录（RFC 6891）"""
+    __slots__ = ('udp_payload_size', 'extended_rcode', 'version', 'dnssec_ok', 'options')
+    udp_payload_size: int
+    extended_rcode: int  # 扩展响应码的高8位
+    version: int
+    dnssec_ok: bool
+    options: List[EDNSOption]
+
+class NameInternTable:
+    """
+    进程级的标签/名称驻留表
+
+    长时间解析大量报文时，重复出现的名称共享同一个字符串对象，节省内存，
+    也让后续以名称为键的字典查找可以走身份比较的快速路径。
+    max_size限制表的大小，满了以后新名称不再驻留。
+    """
+    
+    def __init__(self, max_size: Optional[int] = None):
+        self._table: Dict[str, str] = {}
+        self.max_size = max_size
+    
+    def intern(self, value: str) -> str:
+        table = self._table
+        cached = table.get(value)
+        if cached is not None:
+            return cached
+        if self.max_size is None or len(table) < self.max_size:
+            table[value] = value
+        return value
+    
+    def __len__(self) -> int:
+        return len(self._table)
+    
+    def clear(self):
+        self._table.clear()
+
+# 默认的进程级驻留表，传给 DNSParser(intern=NAME_INTERN) 使用
+NAME_INTERN = NameInternTable()
 
 class DNSParser:
     """DNS报文解析器"""
@@ -45,22 +230,41 @@ class DNSParser:
         2: "NS",
         5: "CNAME",
         15: "MX",
+        6: "SOA",
+        12: "PTR",
         16: "TXT",
-        28: "AAAA"
+        28: "AAAA",
+        33: "SRV",
+        41: "OPT"
     }
     
-    def __init__(self, data: bytes):
+    def __init__(self, data: Union[bytes, bytearray, memoryview], zero_copy: bool = False,
+                 intern: Optional[NameInternTable] = None):
+        """
+        zero_copy为True时在memoryview上解析，资源记录的data是原报文的视图而不是副本。
+        视图会引用原缓冲区，若缓冲区会被复用，需要保留的数据请自行bytes()复制。
+        intern指定驻留表时，解析出的标签和名称都经过该表去重。
+        """
         self.data = data
+        self.zero_copy = zero_copy
+        self.buf = memoryview(data) if zero_copy else data
+        # 定长字段和名称标签直接在bytes上unpack_from/解码，比经由memoryview更快；
+        # 视图只用在资源记录数据上
+        self._raw = data if isinstance(data, bytes) else memoryview(data)
+        self._intern = intern.intern if intern is not None else None
+        self._intern_table = intern
+        self._rdata_source: Optional[_RDataSource] = None
+        # 本报文内 偏移量 -> (名称, 名称在该位置结束后的偏移量)
+        self._names: Dict[int, Tuple[str, int]] = {}
         self.offset = 0
     
     def parse_header(self) -> DNSHeader:
         """解析DNS头部（12字节）"""
-        if len(self.data) < 12:
+        if len(self.buf) < 12:
             raise ValueError("DNS报文头部不完整")
         
-        # 解析各个字段
-        id_ = struct.unpack('!H', self.data[0:2])[0]
-        flags = struct.unpack('!H', self.data[2:4])[0]
+        # 一次解码ID、标志和四个计数器
+        id_, flags, qdcount, ancount, nscount, arcount = _HEADER_STRUCT.unpack_from(self._raw, 0)
         
         # 解析标志位
         is_response = bool(flags & 0x8000)
@@ -71,12 +275,6 @@ class DNSParser:
         recursion_available = bool(flags & 0x0080)
         rcode = flags & 0xF
         
-        # 解析计数器
-        qdcount = struct.unpack('!H', self.data[4:6])[0]
-        ancount = struct.unpack('!H', self.data[6:8])[0]
-        nscount = struct.unpack('!H', self.data[8:10])[0]
-        arcount = struct.unpack('!H', self.data[10:12])[0]
-        
         self.offset = 12
         
         return DNSHeader(
@@ -95,90 +293,247 @@ class DNSParser:
         )
     
     def parse_name(self) -> str:
-        """解析DNS名称（支持压缩指针）"""
-        name_parts = []
+        """
+        解析DNS名称（支持压缩指针）
+
+        迭代跟随指针，跳转次数超过MAX_POINTER_HOPS或名称超过255字节时抛出ValueError，
+        指针环不会导致无限递归。每个标签起点解码出的后缀名称按偏移量缓存在本报文内，
+        后续指向同一后缀的指针直接命中缓存。
+        """
+        cache = self._names
+        first = self.offset
+        hit = cache.get(first)
+        if hit is not None:
+            self.offset = hit[1]
+            return hit[0]
+        
+        buf = self._raw
+        size = len(buf)
+        intern = self._intern
+        offset = first
+        labels = []         # 解码出的标签
+        starts = []         # 每个标签的起始偏移量
+        segments = []       # 每个标签所在的段（两次指针跳转之间为一段）
+        segment_ends = []   # 每段在报文中的结束位置
+        suffix = ''         # 命中缓存的后缀
+        hops = 0
+        wire_length = 1
         
         while True:
-            if self.offset >= len(self.data):
+            if offset >= size:
                 raise ValueError("DNS名称解析超出数据范围")
-                
-            length = self.data[self.offset]
+            
+            if offset != first:
+                hit = cache.get(offset)
+                if hit is not None:
+                    suffix = hit[0]
+                    segment_ends.append(hit[1])
+                    wire_length += len(suffix) + 1
+                    break
+            
+            length = buf[offset]
             
             # 检查是否是压缩指针
             if (length & 0xC0) == 0xC0:
-                if self.offset + 2 > len(self.data):
+                if offset + 2 > size:
                     raise ValueError("压缩指针超出数据范围")
-                
-                pointer = ((length & 0x3F) << 8) + self.data[self.offset + 1]
-                current_offset = self.offset
-                self.offset = pointer
-                name_parts.append(self.parse_name())
-                self.offset = current_offset + 2
-                break
+                hops += 1
+                if hops > MAX_POINTER_HOPS:
+                    raise ValueError("压缩指针跳转次数过多，可能存在指针环")
+                segment_ends.append(offset + 2)
+                offset = ((length & 0x3F) << 8) | buf[offset + 1]
                 
             # 检查是否是结束符
             elif length == 0:
-                self.offset += 1
+                segment_ends.append(offset + 1)
                 break
+            
+            elif length & 0xC0:
+                raise ValueError(f"不支持的标签类型: 0x{length:02x}")
                 
             # 常规标签处理
             else:
-                self.offset += 1
-                if self.offset + length > len(self.data):
+                wire_length += length + 1
+                if wire_length > MAX_NAME_LENGTH:
+                    raise ValueError("DNS名称超过255字节")
+                if offset + 1 + length > size:
                     raise ValueError("名称标签超出数据范围")
-                name_parts.append(
-                    self.data[self.offset:self.offset + length].decode('utf-8')
-                )
-                self.offset += length
+                label = str(buf[offset + 1:offset + 1 + length], 'utf-8')
+                labels.append(intern(label) if intern else label)
+                starts.append(offset)
+                segments.append(len(segment_ends))
+                offset += 1 + length
+        
+        if wire_length > MAX_NAME_LENGTH:
+            raise ValueError("DNS名称超过255字节")
+        
+        # 从后往前拼出每个标签起点对应的后缀名称并缓存
+        name = suffix
+        for i in range(len(labels) - 1, -1, -1):
+            name = labels[i] + '.' + name if name else labels[i]
+            if intern:
+                name = intern(name)
+            cache[starts[i]] = (name, segment_ends[segments[i]])
+        
+        cache[first] = (name, segment_ends[0])
+        self.offset = segment_ends[0]
+        return name
+    
+    def skip_name(self):
+        """跳过一个DNS名称而不解码，遇到压缩指针即结束"""
+        buf = self._raw
+        size = len(buf)
+        offset = self.offset
         
-        return '.'.join(filter(None, name_parts))
+        while True:
+            if offset >= size:
+                raise ValueError("DNS名称解析超出数据范围")
+            length = buf[offset]
+            if (length & 0xC0) == 0xC0:
+                offset += 2
+                break
+            offset += 1 + length
+            if length == 0:
+                break
+        
+        if offset > size:
+            raise ValueError("DNS名称超出数据范围")
+        self.offset = offset
+    
+    def skip_question(self):
+        """跳过一个问题记录"""
+        self.skip_name()
+        self.offset += 4
+        if self.offset > len(self._raw):
+            raise ValueError("问题记录不完整")
+    
+    def skip_resource_record(self):
+        """跳过一个资源记录"""
+        self.skip_name()
+        if self.offset + 10 > len(self._raw):
+            raise ValueError("资源记录不完整")
+        rdlength = _RR_STRUCT.unpack_from(self._raw, self.offset)[3]
+        self.offset += 10 + rdlength
+        if self.offset > len(self._raw):
+            raise ValueError("资源记录数据不完整")
     
     def parse_question(self) -> DNSQuestion:
         """解析DNS问题部分"""
         name = self.parse_name()
         
-        if self.offset + 4 > len(self.data):
+        if self.offset + 4 > len(self.buf):
             raise ValueError("问题记录不完整")
         
-        type_ = struct.unpack('!H', self.data[self.offset:self.offset + 2])[0]
-        self.offset += 2
-        
-        class_ = struct.unpack('!H', self.data[self.offset:self.offset + 2])[0]
-        self.offset += 2
+        type_, class_ = _QUESTION_STRUCT.unpack_from(self._raw, self.offset)
+        self.offset += 4
         
         return DNSQuestion(name=name, type_=type_, class_=class_)
     
-    def parse_resource_record(self) -> DNSResourceRecord:
-        """解析资源记录"""
+    def parse_record_fields(self) -> Tuple[str, int, int, int, int, int]:
+        """
+        解析资源记录但不构造对象，也不切出数据
+        返回 (名称, 类型, 类别, TTL, 数据偏移量, 数据长度)，供批量/列式解析使用
+        """
         name = self.parse_name()
         
-        if self.offset + 10 > len(self.data):
+        if self.offset + 10 > len(self._raw):
             raise ValueError("资源记录不完整")
         
-        type_ = struct.unpack('!H', self.data[self.offset:self.offset + 2])[0]
-        self.offset += 2
-        
-        class_ = struct.unpack('!H', self.data[self.offset:self.offset + 2])[0]
-        self.offset += 2
+        type_, class_, ttl, rdlength = _RR_STRUCT.unpack_from(self._raw, self.offset)
+        start = self.offset + 10
+        self.offset = start + rdlength
         
-        ttl = struct.unpack('!I', self.data[self.offset:self.offset + 4])[0]
-        self.offset += 4
-        
-        rdlength = struct.unpack('!H', self.data[self.offset:self.offset + 2])[0]
-        self.offset += 2
-        
-        if self.offset + rdlength > len(self.data):
+        if self.offset > len(self._raw):
             raise ValueError("资源记录数据不完整")
         
-        data = self.data[self.offset:self.offset + rdlength]
-        self.offset += rdlength
+        return name, type_, class_, ttl, start, rdlength
+    
+    def parse_resource_record(self) -> DNSResourceRecord:
+        """解析资源记录"""
+        name, type_, class_, ttl, start, rdlength = self.parse_record_fields()
         
-        return DNSResourceRecord(
+        # 零拷贝模式下切片得到的是视图
+        record = DNSResourceRecord(
             name=name,
             type_=type_,
             class_=class_,
             ttl=ttl,
-            data=data
+            data=self.buf[start:start + rdlength]
+        )
+        if type_ in _NAME_RDATA_TYPES:
+            source = self._rdata_source
+            if source is None:
+                source = self._rdata_source = _RDataSource(self.data, self._intern_table)
+            record._source = source
+            record._rdata_offset = start
+        return record
+    
+    def _rdata_name(self, offset: int, end: int) -> Tuple[str, int]:
+        """解压记录数据中位于offset的名称，不改变当前解析位置；返回 (名称, 名称结束的偏移量)"""
+        saved = self.offset
+        self.offset = offset
+        try:
+            name = self.parse_name()
+            offset = self.offset
+        finally:
+            self.offset = saved
+        if offset > end:
+            raise ValueError("记录数据中的名称超出数据范围")
+        return name, offset
+    
+    def decode_rdata(self, type_: int, start: int, length: int) -> RData:
+        """
+        按类型解码从start开始、长length字节的记录数据
+        A/AAAA用inet_ntop直接格式化，不构造ipaddress对象；
+        NS/CNAME/PTR返回名称，MX/SOA/SRV/TXT返回对应的数据类，其他类型返回原始数据
+        """
+        raw = self._raw
+        end = start + length
+        if end > len(raw):
+            raise ValueError("资源记录数据不完整")
+        
+        if type_ in (TYPE_NS, TYPE_CNAME, TYPE_PTR):
+            return self._rdata_name(start, end)[0]
+        if type_ == TYPE_MX:
+            if length < 3:
+                raise ValueError("MX记录数据不完整")
+            exchange = self._rdata_name(start + 2, end)[0]
+            return MXData(_MX_STRUCT.unpack_from(raw, start)[0], exchange)
+        if type_ == TYPE_SOA:
+            mname, offset = self._rdata_name(start, end)
+            rname, offset = self._rdata_name(offset, end)
+            if offset + 20 > end:
+                raise ValueError("SOA记录数据不完整")
+            return SOAData(mname, rname, *_SOA_STRUCT.unpack_from(raw, offset))
+        if type_ == TYPE_SRV:
+            if length < 7:
+                raise ValueError("SRV记录数据不完整")
+            target = self._rdata_name(start + 6, end)[0]
+            return SRVData(*_SRV_STRUCT.unpack_from(raw, start), target)
+        return _decode_plain_rdata(type_, raw, self.buf, start, end)
+    
+    @staticmethod
+    def parse_edns(record: DNSResourceRecord) -> EDNSInfo:
+        """把OPT伪记录解码为EDNS信息：类别字段是UDP负载大小，TTL字段是扩展响应码、版本和DO位"""
+        data = record.data
+        options = []
+        offset = 0
+        while offset < len(data):
+            if offset + 4 > len(data):
+                raise ValueError("EDNS选项不完整")
+            code, length = _OPTION_STRUCT.unpack_from(data, offset)
+            offset += 4
+            if offset + length > len(data):
+                raise ValueError("EDNS选项数据不完整")
+            options.append(EDNSOption(code=code, data=data[offset:offset + length]))
+            offset += length
+        
+        return EDNSInfo(
+            udp_payload_size=record.class_,
+            extended_rcode=(record.ttl >> 24) & 0xFF,
+            version=(record.ttl >> 16) & 0xFF,
+            dnssec_ok=bool(record.ttl & 0x8000),
+            options=options
         )
     
     def format_resource_record(self, record: DNSResourceRecord) -> str:
@@ -189,14 +544,33 @@ class DNSParser:
         result += f"TTL: {record.ttl}秒\n"
         
         # 根据记录类型解析数据
-        if record.type_ == 1:  # A记录
-            ip = ipaddress.IPv4Address(record.data)
-            result += f"IPv4地址: {ip}"
-        elif record.type_ == 28:  # AAAA记录
-            ip = ipaddress.IPv6Address(record.data)
-            result += f"IPv6地址: {ip}"
-        else:
-            result += f"数据长度: {len(record.data)}字节"
+        type_ = record.type_
+        if type_ not in self.RECORD_TYPES or type_ == TYPE_OPT:
+            return result + f"数据长度: {len(record.data)}字节"
+        
+        rdata = record.rdata
+        if type_ == TYPE_A:
+            result += f"IPv4地址: {rdata}"
+        elif type_ == TYPE_AAAA:
+            result += f"IPv6地址: {rdata}"
+        elif type_ == TYPE_NS:
+            result += f"名称服务器: {rdata}"
+        elif type_ == TYPE_CNAME:
+            result += f"规范名称: {rdata}"
+        elif type_ == TYPE_PTR:
+            result += f"指向: {rdata}"
+        elif type_ == TYPE_MX:
+            result += f"邮件服务器: {rdata.exchange} (优先级 {rdata.preference})"
+        elif type_ == TYPE_SRV:
+            result += (f"目标: {rdata.target}:{rdata.port} "
+                       f"(优先级 {rdata.priority}, 权重 {rdata.weight})")
+        elif type_ == TYPE_TXT:
+            result += "文本: " + ' '.join(repr(s.decode('utf-8', 'replace')) for s in rdata.strings)
+        elif type_ == TYPE_SOA:
+            result += (f"主服务器: {rdata.mname}\n"
+                       f"管理员邮箱: {rdata.rname}\n"
+                       f"序列号: {rdata.serial}  刷新: {rdata.refresh}  重试: {rdata.retry}  "
+                       f"过期: {rdata.expire}  最小TTL: {rdata.minimum}")
         
         return result
     
@@ -213,38 +587,104 @@ class DNSParser:
             answers.append(self.parse_resource_record())
         
         return header, questions, answers
+    
+    def parse_message(self) -> 'DNSMessage':
+        """解析头部，返回各部分按需解码的完整报文"""
+        return DNSMessage(self)
+
+class DNSMessage:
+    """
+    完整的DNS报文（问题、回答、授权、附加四个部分）
+
+    构造时只解析12字节头部，各部分在第一次访问时才解码；
+    访问靠后的部分时，未访问过的前面部分只跳过不解码。
+    因此格式错误也是在访问对应部分时才抛出ValueError。
+    """
+    
+    def __init__(self, parser: DNSParser):
+        self._parser = parser
+        self.header = parser.parse_header()
+        header = self.header
+        self._counts = (header.qdcount, header.ancount, header.nscount, header.arcount)
+        # 各部分的起始偏移量，最后一项是报文结束位置；None表示尚未确定
+        self._offsets: List[Optional[int]] = [12, None, None, None, None]
+        self._sections: List[Optional[list]] = [None, None, None, None]
+        self._edns: Optional[EDNSInfo] = None
+        self._edns_parsed = False
+    
+    def _section_start(self, index: int) -> int:
+        """确定第index部分的起始偏移量，必要时跳过前一部分"""
+        start = self._offsets[index]
+        if start is None:
+            parser = self._parser
+            parser.offset = self._section_start(index - 1)
+            skip = parser.skip_question if index == 1 else parser.skip_resource_record
+            for _ in range(self._counts[index - 1]):
+                skip()
+            start = self._offsets[index] = parser.offset
+        return start
+    
+    def _section(self, index: int) -> list:
+        section = self._sections[index]
+        if section is None:
+            parser = self._parser
+            parser.offset = self._section_start(index)
+            parse = parser.parse_question if index == 0 else parser.parse_resource_record
+            section = [parse() for _ in range(self._counts[index])]
+            self._sections[index] = section
+            self._offsets[index + 1] = parser.offset
+        return section
+    
+    @property
+    def questions(self) -> List[DNSQuestion]:
+        return self._section(0)
+    
+    @property
+    def answers(self) -> List[DNSResourceRecord]:
+        return self._section(1)
+    
+    @property
+    def authorities(self) -> List[DNSResourceRecord]:
+        return self._section(2)
+    
+    @property
+    def additionals(self) -> List[DNSResourceRecord]:
+        return self._section(3)
+    
+    @property
+    def edns(self) -> Optional[EDNSInfo]:
+        """附加部分中的OPT伪记录，没有时为None"""
+        if not self._edns_parsed:
+            for record in self.additionals:
+                if record.type_ == TYPE_OPT:
+                    self._edns = DNSParser.parse_edns(record)
+                    break
+            self._edns_parsed = True
+        return self._edns
+    
+    @property
+    def rcode(self) -> int:
+        """完整响应码：带EDNS时高8位来自OPT记录"""
+        if self.header.arcount == 0:
+            return self.header.rcode
+        edns = self.edns
+        if edns is None:
+            return self.header.rcode
+        return (edns.extended_rcode << 4) | self.header.rcode
+
+def record_type_code(text: str) -> int:
+    """把记录类型名称（如AAAA）或编号字符串转换为类型编号"""
+    if text.isdigit():
+        return int(text)
+    for code, name in DNSParser.RECORD_TYPES.items():
+        if name == text.upper():
+            return code
+    raise ValueError(f"未知的记录类型: {text}")
 
-def create_dns_query(domain: str, record_type: int) -> bytes:
-    """创建DNS查询报文"""
-    # 构建DNS头部
-    transaction_id = 0x1234  # 可以是随机值
-    flags = 0x0100          # 标准查询
-    qdcount = 1            # 一个问题
-    ancount = 0            # 没有答案
-    nscount = 0            # 没有授权记录
-    arcount = 0            # 没有附加记录
-    
-    header = struct.pack('!HHHHHH',
-        transaction_id,
-        flags,
-        qdcount,
-        ancount,
-        nscount,
-        arcount
-    )
-    
-    # 编码域名
-    question = b''
-    for part in domain.split('.'):
-        length = len(part)
-        question += bytes([length])
-        question += part.encode()
-    question += b'\x00'  # 结束符
-    
-    # 添加查询类型和类别
-    question += struct.pack('!HH',
-        record_type,  # 查询类型
-        1            # IN类别
-    )
-    
-    return header + question
+def create_dns_query(domain: str, record_type: int, transaction_id: Optional[int] = None,
+                     edns_payload_size: Optional[int] = None) -> bytes:
+    """
+    创建DNS查询报文（期望递归、IN类别）；transaction_id为None时随机生成
+    指定edns_payload_size时附带EDNS0 OPT记录，通告可接收的UDP响应大小
+    """
+    return query_template(domain, record_type, edns_payload_size=edns_payload_size).render(transaction_id)
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+基于asyncio的流水线DNS存根解析器
+
+在少量UDP套接字上同时保持成千上万个未完成的查询：
+每个查询使用随机事务ID，响应必须同时匹配事务ID和问题（名称、类型、类别）才会被接受；
+每次尝试有独立的超时，超时后换一个新的事务ID重试。
+查询默认通告EDNS0的UDP缓冲区大小；响应带TC标志时自动改用TCP（两字节长度前缀，RFC 7766）
+重新查询，到每个服务器的TCP连接放在连接池中供后续查询复用。
+"""
+import asyncio
+import itertools
+import socket
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from dns_builder import CLASS_IN, DEFAULT_EDNS_PAYLOAD_SIZE, query_template, random_transaction_id
+from dns_cache import DNSCache
+from dns_parser import DNSMessage, DNSParser, record_type_code
+
+DNS_PORT = 53
+
+QueryKey = Tuple[str, int, int]  # (小写名称, 类型, 类别)
+Pending = Dict[int, Tuple[QueryKey, asyncio.Future]]
+
+_LENGTH_STRUCT = struct.Struct('!H')
+
+
+def _expire(future: asyncio.Future):
+    """单次尝试的超时回调；用call_later代替wait_for，避免每次尝试创建一个Task"""
+    if not future.done():
+        future.set_exception(asyncio.TimeoutError())
+
+
+@dataclass
+class ResolverStats:
+    """解析器计数"""
+    sent: int = 0          # 发出的UDP查询（含重试）
+    received: int = 0      # 匹配成功的响应
+    retries: int = 0       # 超时后的重试次数
+    timeouts: int = 0      # 所有尝试都超时的查询
+    mismatched: int = 0    # 事务ID或问题不匹配、被丢弃的响应
+    malformed: int = 0     # 无法解析的响应
+    truncated: int = 0     # 带TC标志、改用TCP重新查询的响应
+    tcp_queries: int = 0   # 经TCP发出的查询
+
+
+def _match_response(pending: Pending, data: bytes, stats: ResolverStats):
+    """按事务ID找到等待中的查询，核对问题部分后交付响应；UDP和TCP共用"""
+    if len(data) < 12:
+        stats.malformed += 1
+        return
+    entry = pending.get((data[0] << 8) | data[1])
+    if entry is None:
+        stats.mismatched += 1
+        return
+    key, future = entry
+
+    try:
+        message = DNSParser(data).parse_message()
+        questions = message.questions
+    except (ValueError, UnicodeDecodeError):
+        stats.malformed += 1
+        return
+
+    if not message.header.is_response or len(questions) != 1 or (
+            questions[0].name.lower(), questions[0].type_, questions[0].class_) != key:
+        stats.mismatched += 1
+        return
+
+    del pending[message.header.id]
+    if not future.done():
+        stats.received += 1
+        future.set_result(message)
+
+
+def _unused_transaction_id(pending: Pending) -> int:
+    transaction_id = random_transaction_id()
+    while transaction_id in pending:
+        transaction_id = random_transaction_id()
+    return transaction_id
+
+
+def _release(pending: Pending, transaction_id: int, future: asyncio.Future):
+    """尝试结束后删除仍登记着的查询（超时或取消时）"""
+    entry = pending.get(transaction_id)
+    if entry is not None and entry[1] is future:
+        del pending[transaction_id]
+
+
+class _ResolverProtocol(asyncio.DatagramProtocol):
+    """一个已连接到服务器的UDP套接字，维护该套接字上未完成的查询"""
+
+    def __init__(self, resolver: 'AsyncStubResolver'):
+        self.resolver = resolver
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        # 事务ID -> (问题, 等待响应的future)
+        self.pending: Pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        _match_response(self.pending, data, self.resolver.stats)
+
+    def error_received(self, exc):
+        # ICMP不可达等错误只影响单个数据报，未完成的查询交给超时重试处理
+        pass
+
+    def connection_lost(self, exc):
+        for _, future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc or ConnectionError("UDP套接字已关闭"))
+        self.pending.clear()
+
+
+class AsyncStubResolver:
+    """
+    向单个递归服务器发查询的异步存根解析器
+
+    指定cache时先查缓存，收到的响应按TTL写入缓存。
+    UDP响应被截断时经tcp_pool（默认新建一个）重新查询。
+
+    用法:
+        async with AsyncStubResolver('::1', port=5353) as resolver:
+            message = await resolver.resolve('example.com', 28)
+    """
+
+    def __init__(self, server: str, port: int = DNS_PORT, sockets: int = 4,
+                 max_inflight: int = 4096, timeout: float = 2.0, retries: int = 2,
+                 edns_payload_size: Optional[int] = DEFAULT_EDNS_PAYLOAD_SIZE,
+                 cache: Optional[DNSCache] = None,
+                 tcp_pool: Optional['AsyncTCPConnectionPool'] = None):
+        self.server = server
+        self.port = port
+        self.socket_count = sockets
+        self.timeout = timeout
+        self.retries = retries
+        self.edns_payload_size = edns_payload_size
+        self.max_inflight = max_inflight
+        self.cache = cache
+        self.stats = ResolverStats()
+        self.tcp_pool = tcp_pool or AsyncTCPConnectionPool(timeout=timeout, stats=self.stats)
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._protocols: List[_ResolverProtocol] = []
+        self._next_protocol = None
+
+    async def start(self):
+        """创建并连接UDP套接字"""
+        loop = asyncio.get_running_loop()
+        self._inflight = asyncio.Semaphore(self.max_inflight)
+        for _ in range(self.socket_count):
+            _, protocol = await loop.create_datagram_endpoint(
+                lambda: _ResolverProtocol(self),
+                remote_addr=(self.server, self.port)
+            )
+            self._protocols.append(protocol)
+        self._next_protocol = itertools.cycle(self._protocols)
+
+    async def close(self):
+        for protocol in self._protocols:
+            if protocol.transport is not None:
+                protocol.transport.close()
+        self._protocols.clear()
+        await self.tcp_pool.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _send(self, key: QueryKey, name: str) -> Tuple[_ResolverProtocol, int, asyncio.Future]:
+        """在下一个套接字上用一个未被占用的随机事务ID发出查询"""
+        protocol = next(self._next_protocol)
+        transaction_id = _unused_transaction_id(protocol.pending)
+        future = asyncio.get_running_loop().create_future()
+        protocol.pending[transaction_id] = (key, future)
+        template = query_template(name, key[1], key[2], edns_payload_size=self.edns_payload_size)
+        protocol.transport.sendto(template.render(transaction_id))
+        self.stats.sent += 1
+        return protocol, transaction_id, future
+
+    async def resolve(self, name: str, qtype: int = 1, qclass: int = CLASS_IN) -> DNSMessage:
+        """查询一个名称，返回响应报文；所有尝试都超时则抛出asyncio.TimeoutError"""
+        if not self._protocols:
+            raise RuntimeError("解析器尚未启动，请先调用 start()")
+        name = name.rstrip('.')
+        key = (name.lower(), qtype, qclass)
+
+        cache = self.cache
+        if cache is not None:
+            cached = cache.get(name, qtype, qclass)
+            if cached is not None:
+                return cached
+
+        loop = asyncio.get_running_loop()
+        async with self._inflight:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.stats.retries += 1
+                protocol, transaction_id, future = self._send(key, name)
+                timer = loop.call_later(self.timeout, _expire, future)
+                try:
+                    message = await future
+                except asyncio.TimeoutError:
+                    continue
+                finally:
+                    timer.cancel()
+                    _release(protocol.pending, transaction_id, future)
+
+                if message.header.truncated:
+                    self.stats.truncated += 1
+                    self.stats.tcp_queries += 1
+                    message = await self.tcp_pool.query(self.server, self.port, key, name,
+                                                        self.edns_payload_size)
+                if cache is not None:
+                    cache.put(message, name, qtype, qclass)
+                return message
+
+        self.stats.timeouts += 1
+        raise asyncio.TimeoutError(f"DNS查询超时: {name} (类型 {qtype})")
+
+    async def resolve_many(self, queries: Iterable[Tuple[str, int]]
+                           ) -> List[Union[DNSMessage, BaseException]]:
+        """并发解析一批 (名称, 类型)，结果按输入顺序返回，失败的位置是对应的异常"""
+        return await asyncio.gather(
+            *(self.resolve(name, qtype) for name, qtype in queries),
+            return_exceptions=True
+        )
+
+
+class _TCPConnection:
+    """一条到服务器的TCP连接；可以流水线发送多个查询，响应按事务ID和问题分发"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 stats: ResolverStats):
+        self.reader = reader
+        self.writer = writer
+        self.stats = stats
+        self.pending: Pending = {}
+        self.closed = False
+        self._task = asyncio.ensure_future(self._read_loop())
+
+    async def _read_loop(self):
+        error: BaseException = ConnectionError("TCP连接已关闭")
+        try:
+            while True:
+                length = _LENGTH_STRUCT.unpack(await self.reader.readexactly(2))[0]
+                _match_response(self.pending, await self.reader.readexactly(length), self.stats)
+        except (asyncio.IncompleteReadError, OSError) as exc:
+            if isinstance(exc, OSError):
+                error = exc
+        finally:
+            self.closed = True
+            for _, future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+            self.writer.close()
+
+    def send(self, key: QueryKey, wire_tail: bytes) -> Tuple[int, asyncio.Future]:
+        """wire_tail是去掉事务ID的查询报文"""
+        transaction_id = _unused_transaction_id(self.pending)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[transaction_id] = (key, future)
+        self.writer.write(_LENGTH_STRUCT.pack(len(wire_tail) + 2)
+                          + _LENGTH_STRUCT.pack(transaction_id) + wire_tail)
+        return transaction_id, future
+
+    async def close(self):
+        self.writer.close()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class AsyncTCPConnectionPool:
+    """
+    按服务器复用的DNS over TCP连接池
+
+    每个服务器最多保持max_connections条连接，新查询优先放到未完成查询最少的连接上；
+    服务器关闭空闲连接后，下一次查询会自动重连。
+    """
+
+    def __init__(self, max_connections: int = 2, timeout: float = 5.0,
+                 stats: Optional[ResolverStats] = None):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.stats = stats or ResolverStats()
+        self._connections: Dict[Tuple[str, int], List[_TCPConnection]] = {}
+        self._locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+
+    async def _connection(self, server: str, port: int) -> _TCPConnection:
+        address = (server, port)
+        lock = self._locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            connections = [c for c in self._connections.get(address, []) if not c.closed]
+            self._connections[address] = connections
+            idle = [c for c in connections if not c.pending]
+            if idle:
+                return idle[0]
+            if len(connections) < self.max_connections:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(server, port), self.timeout)
+                connection = _TCPConnection(reader, writer, self.stats)
+                connections.append(connection)
+                return connection
+            return min(connections, key=lambda c: len(c.pending))
+
+    async def query(self, server: str, port: int, key: QueryKey, name: str,
+                    edns_payload_size: Optional[int] = None) -> DNSMessage:
+        """经TCP查询；连接在查询途中断开时换一条新连接重试一次"""
+        wire_tail = query_template(name, key[1], key[2],
+                                   edns_payload_size=edns_payload_size).render(0)[2:]
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(2):
+            connection = await self._connection(server, port)
+            transaction_id, future = connection.send(key, wire_tail)
+            timer = loop.call_later(self.timeout, _expire, future)
+            try:
+                return await future
+            except ConnectionError:
+                if attempt:
+                    raise
+            finally:
+                timer.cancel()
+                _release(connection.pending, transaction_id, future)
+
+    async def close(self):
+        for connections in self._connections.values():
+            for connection in connections:
+                await connection.close()
+        self._connections.clear()
+
+
+class TCPConnectionPool:
+    """阻塞式的DNS over TCP查询，按服务器复用连接，一次只处理一个查询"""
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+        self._sockets: Dict[Tuple[str, int], socket.socket] = {}
+
+    def _recv_exactly(self, sock: socket.socket, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = sock.recv(size)
+            if not chunk:
+                raise ConnectionError("TCP连接已被对端关闭")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def query(self, server: str, port: int, query: bytes) -> bytes:
+        """发送完整的查询报文，返回事务ID相同的响应；复用的连接失效时重连一次"""
+        address = (server, port)
+        for attempt in range(2):
+            sock = self._sockets.get(address)
+            reused = sock is not None
+            if sock is None:
+                sock = socket.create_connection(address, timeout=self.timeout)
+                self._sockets[address] = sock
+            try:
+                sock.sendall(_LENGTH_STRUCT.pack(len(query)) + query)
+                while True:
+                    length = _LENGTH_STRUCT.unpack(self._recv_exactly(sock, 2))[0]
+                    response = self._recv_exactly(sock, length)
+                    # 之前超时的查询可能留下迟到的响应，跳过事务ID不同的报文
+                    if response[:2] == query[:2]:
+                        return response
+            except OSError as exc:
+                # 连接状态已不可知，关闭后只在复用的连接被对端关闭时重连
+                sock.close()
+                del self._sockets[address]
+                if attempt or not reused or not isinstance(exc, ConnectionError):
+                    raise
+
+    def close(self):
+        for sock in self._sockets.values():
+            sock.close()
+        self._sockets.clear()
+
+
+async def _resolve_file(args):
+    qtype = record_type_code(args.type)
+
+    with open(args.names, encoding='utf-8') as f:
+        names = [line.strip() for line in f if line.strip()]
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    async with AsyncStubResolver(args.server, port=args.port, sockets=args.sockets,
+                                 max_inflight=args.inflight, timeout=args.timeout,
+                                 retries=args.retries) as resolver:
+        results = await resolver.resolve_many((name, qtype) for name in names)
+        elapsed = loop.time() - start
+
+        formatter = DNSParser(b'')
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                print(f"{name}: 失败 ({result})")
+            elif not args.quiet:
+                print(f"{name}: 响应码 {result.rcode}, {len(result.answers)} 个答案")
+                for answer in result.answers:
+                    print("  " + formatter.format_resource_record(answer).replace('\n', '\n  '))
+
+        stats = resolver.stats
+        print(f"\n{len(names)} 个名称，用时 {elapsed:.2f} 秒（{len(names) / max(elapsed, 1e-9):.0f} 个/秒）")
+        print(f"发送: {stats.sent}  收到: {stats.received}  重试: {stats.retries}  "
+              f"超时: {stats.timeouts}  不匹配: {stats.mismatched}  格式错误: {stats.malformed}  "
+              f"截断转TCP: {stats.truncated}")
+
+
+def main():
+    """批量解析文件中的名称"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="异步批量DNS解析")
+    parser.add_argument("names", help="每行一个名称的文件")
+    parser.add_argument("--server", default="2001:4860:4860::8888", help="递归服务器地址")
+    parser.add_argument("--port", type=int, default=DNS_PORT)
+    parser.add_argument("--type", default="AAAA", help="记录类型名称或编号（默认AAAA）")
+    parser.add_argument("--sockets", type=int, default=4, help="UDP套接字数量")
+    parser.add_argument("--inflight", type=int, default=4096, help="最大并发查询数")
+    parser.add_argument("--timeout", type=float, default=2.0, help="单次尝试的超时秒数")
+    parser.add_argument("--retries", type=int, default=2, help="超时后的重试次数")
+    parser.add_argument("--quiet", action="store_true", help="只输出失败的名称和汇总")
+    asyncio.run(_resolve_file(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
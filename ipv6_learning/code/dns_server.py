@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+用于压测的本地DNS服务器
+
+基于asyncio同时监听UDP和TCP（两字节长度前缀），从内存中的区域表（Zone）回答查询：
+每个查询都经过 DNSParser 解析、由 DNSMessageBuilder 构造响应，
+并分别累计解析和构造的CPU时间，配合 dns_loadgen.py 在回环地址上测量解析/构造热路径的性能。
+"""
+import asyncio
+import signal
+import socket
+import struct
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from dns_builder import (CLASS_IN, FLAG_AA, FLAG_QR, FLAG_RD, FLAG_TC, SECTION_ANSWER,
+                         SECTION_AUTHORITY, DNSMessageBuilder)
+from dns_parser import (TYPE_A, TYPE_AAAA, TYPE_CNAME, TYPE_MX, TYPE_NS, TYPE_PTR, TYPE_SOA,
+                        TYPE_SRV, TYPE_TXT, DNSParser, record_type_code)
+from pcap_reader import MALFORMED_ERRORS
+
+RCODE_NOERROR = 0
+RCODE_FORMERR = 1
+RCODE_NXDOMAIN = 3
+RCODE_NOTIMP = 4
+
+# 没有EDNS时UDP响应的上限（RFC 1035）
+UDP_PAYLOAD_LIMIT = 512
+# 跟随CNAME链的最大长度
+MAX_CNAME_CHAIN = 8
+
+_LENGTH_STRUCT = struct.Struct('!H')
+
+RData = Union[bytes, str]  # str表示可压缩的单个名称（NS/CNAME/PTR）
+
+
+def encode_name(name: str) -> bytes:
+    """把名称编码为不压缩的线路格式，用于MX/SRV/SOA等数据中的名称"""
+    name = name.rstrip('.')
+    labels = name.split('.') if name else []
+    return b''.join(bytes([len(label)]) + label.encode('utf-8') for label in labels) + b'\x00'
+
+
+def encode_rdata(type_: int, fields: List[str]) -> RData:
+    """
+    把区域文件中的文本数据编码为记录数据
+    支持 A、AAAA、NS、CNAME、PTR、MX、TXT、SRV、SOA
+    """
+    if type_ == TYPE_A:
+        return socket.inet_pton(socket.AF_INET, fields[0])
+    if type_ == TYPE_AAAA:
+        return socket.inet_pton(socket.AF_INET6, fields[0])
+    if type_ in (TYPE_NS, TYPE_CNAME, TYPE_PTR):
+        return fields[0]
+    if type_ == TYPE_MX:
+        return struct.pack('!H', int(fields[0])) + encode_name(fields[1])
+    if type_ == TYPE_TXT:
+        strings = [field.strip('"').encode('utf-8') for field in fields]
+        return b''.join(bytes([len(s)]) + s for s in strings)
+    if type_ == TYPE_SRV:
+        return struct.pack('!3H', *map(int, fields[:3])) + encode_name(fields[3])
+    if type_ == TYPE_SOA:
+        return (encode_name(fields[0]) + encode_name(fields[1])
+                + struct.pack('!5I', *map(int, fields[2:7])))
+    raise ValueError(f"区域文件不支持该记录类型: {type_}")
+
+
+class Zone:
+    """
+    内存中的区域表：(小写名称, 类型) -> [(TTL, 数据), ...]
+
+    存在的名称查询不存在的类型时返回NODATA，不存在的名称返回NXDOMAIN；
+    两者都在授权部分附上最近的上级SOA记录，便于客户端做否定缓存。
+    """
+
+    def __init__(self):
+        self._records: Dict[Tuple[str, int], List[Tuple[int, RData]]] = {}
+        self._names = set()
+
+    def __len__(self) -> int:
+        return sum(len(rrset) for rrset in self._records.values())
+
+    def add(self, name: str, type_: int, ttl: int, rdata: RData):
+        name = name.rstrip('.').lower()
+        self._records.setdefault((name, type_), []).append((ttl, rdata))
+        self._names.add(name)
+
+    def load(self, lines: Iterable[str]) -> 'Zone':
+        """
+        读取简化的区域文件，每行 "名称 TTL 类型 数据..."，#开头为注释，例如：
+            example.com 3600 SOA ns.example.com hostmaster.example.com 1 7200 3600 1209600 300
+            www.example.com 300 AAAA 2001:db8::1
+            example.com 300 MX 10 mail.example.com
+        """
+        for number, line in enumerate(lines, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) < 4:
+                raise ValueError(f"区域文件第{number}行格式错误: {line.strip()}")
+            type_ = record_type_code(fields[2])
+            self.add(fields[0], type_, int(fields[1]), encode_rdata(type_, fields[3:]))
+        return self
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Zone':
+        with open(path, encoding='utf-8') as f:
+            return cls().load(f)
+
+    @classmethod
+    def synthetic(cls, count: int, origin: str = 'example.com') -> 'Zone':
+        """生成 host0..host{count-1}.origin 的A和AAAA记录，与 dns_loadgen.py --synthetic 对应"""
+        zone = cls()
+        zone.add(origin, TYPE_SOA, 3600,
+                 encode_rdata(TYPE_SOA, [f'ns.{origin}', f'hostmaster.{origin}', '1', '7200',
+                                         '3600', '1209600', '300']))
+        for i in range(count):
+            name = f'host{i}.{origin}'
+            zone.add(name, TYPE_A, 300, struct.pack('!I', 0x0A000000 | i & 0xFFFFFF))
+            zone.add(name, TYPE_AAAA, 300, socket.inet_pton(socket.AF_INET6, '2001:db8::')[:8]
+                     + struct.pack('!Q', i))
+        return zone
+
+    def _soa(self, name: str) -> Optional[Tuple[str, int, RData]]:
+        """从name开始逐级向上查找SOA记录"""
+        while True:
+            rrset = self._records.get((name, TYPE_SOA))
+            if rrset:
+                return (name,) + rrset[0]
+            if not name:
+                return None
+            name = name.partition('.')[2]
+
+    def lookup(self, name: str, type_: int) -> Tuple[int, List[Tuple[str, int, int, RData]],
+                                                      List[Tuple[str, int, int, RData]]]:
+        """
+        查找记录，返回 (响应码, 回答, 授权)，回答和授权的每项为 (名称, 类型, TTL, 数据)
+        区域内的CNAME链会被跟随
+        """
+        answers = []
+        current = name.rstrip('.').lower()
+        for _ in range(MAX_CNAME_CHAIN):
+            rrset = self._records.get((current, type_))
+            if rrset:
+                answers.extend((current, type_, ttl, rdata) for ttl, rdata in rrset)
+                return RCODE_NOERROR, answers, []
+            cname = self._records.get((current, TYPE_CNAME))
+            if not cname:
+                break
+            ttl, target = cname[0]
+            answers.append((current, TYPE_CNAME, ttl, target))
+            current = target.rstrip('.').lower()
+
+        rcode = RCODE_NOERROR if answers or current in self._names else RCODE_NXDOMAIN
+        soa = self._soa(current)
+        authority = [(soa[0], TYPE_SOA, soa[1], soa[2])] if soa else []
+        return rcode, answers, authority
+
+
+@dataclass
+class ServerStats:
+    """服务器计数与热路径耗时"""
+    queries: int = 0
+    responses: int = 0
+    formerr: int = 0       # 无法解析的查询
+    nxdomain: int = 0
+    truncated: int = 0     # 超出UDP上限、只返回TC标志的响应
+    tcp_queries: int = 0
+    # 热路径的累计CPU时间（线程CPU时钟，不含被调度出去的时间）
+    parse_ns: int = 0      # DNSParser
+    build_ns: int = 0      # DNSMessageBuilder
+
+    def per_packet_us(self) -> Tuple[float, float]:
+        """平均每个查询的 (解析, 构造) CPU微秒数"""
+        n = max(self.queries, 1)
+        return self.parse_ns / n / 1000, self.build_ns / n / 1000
+
+
+class DNSServer:
+    """
+    在同一端口上提供UDP和TCP服务
+
+    respond() 是两种传输共用的处理函数：解析查询、查区域表、构造响应；
+    构造器在各次响应之间复用，不重复分配缓冲区。
+    """
+
+    def __init__(self, zone: Zone):
+        self.zone = zone
+        self.stats = ServerStats()
+        self._builder = DNSMessageBuilder(4096)
+        self._udp_transport = None
+        self._tcp_server = None
+
+    def _error(self, data: bytes, rcode: int) -> Optional[bytes]:
+        """只带头部的错误响应；报文连事务ID都没有时不回答"""
+        if len(data) < 12:
+            return None
+        transaction_id, flags = struct.unpack_from('!HH', data)
+        return struct.pack('!6H', transaction_id, FLAG_QR | (flags & FLAG_RD) | rcode, 0, 0, 0, 0)
+
+    def respond(self, data: bytes, udp: bool = False) -> Optional[bytes]:
+        """
+        回答一个查询，不需要回答时返回None
+        UDP响应的上限是 max(512, 查询通告的EDNS缓冲区大小)，超出时只回带TC标志的头部和问题，
+        让客户端改用TCP
+        """
+        stats = self.stats
+        stats.queries += 1
+
+        start = time.thread_time_ns()
+        try:
+            message = DNSParser(data).parse_message()
+            header = message.header
+            questions = message.questions
+            edns = message.edns if header.arcount else None
+        except MALFORMED_ERRORS:
+            stats.parse_ns += time.thread_time_ns() - start
+            stats.formerr += 1
+            return self._error(data, RCODE_FORMERR)
+        stats.parse_ns += time.thread_time_ns() - start
+
+        if header.is_response:
+            return None
+        if header.opcode != 0 or len(questions) != 1:
+            return self._error(data, RCODE_NOTIMP if header.opcode else RCODE_FORMERR)
+
+        question = questions[0]
+        if question.class_ != CLASS_IN:
+            return self._error(data, RCODE_NOTIMP)
+        rcode, answers, authority = self.zone.lookup(question.name, question.type_)
+        if rcode == RCODE_NXDOMAIN:
+            stats.nxdomain += 1
+        limit = 0xFFFF
+        if udp:
+            limit = max(UDP_PAYLOAD_LIMIT, edns.udp_payload_size) if edns else UDP_PAYLOAD_LIMIT
+
+        start = time.thread_time_ns()
+        flags = FLAG_QR | FLAG_AA | (FLAG_RD if header.recursion_desired else 0) | rcode
+        builder = self._builder.reset(header.id, flags)
+        try:
+            builder.add_question(question.name, question.type_, question.class_)
+            for name, type_, ttl, rdata in answers:
+                builder.add_record(SECTION_ANSWER, name, type_, ttl, rdata)
+            for name, type_, ttl, rdata in authority:
+                builder.add_record(SECTION_AUTHORITY, name, type_, ttl, rdata)
+            if edns is not None:
+                builder.add_edns()
+            if len(builder) > limit:
+                stats.truncated += 1
+                builder.reset(header.id, flags | FLAG_TC)
+                builder.add_question(question.name, question.type_, question.class_)
+                if edns is not None:
+                    builder.add_edns()
+            response = builder.build()
+        except ValueError:
+            # 解析器接受、构造器却写不回去的问题名（空标签、按UTF-8编码后超过63字节的标签），
+            # 按格式错误回答，不让异常中断TCP连接
+            stats.build_ns += time.thread_time_ns() - start
+            stats.formerr += 1
+            return self._error(data, RCODE_FORMERR)
+        stats.build_ns += time.thread_time_ns() - start
+
+        stats.responses += 1
+        return response
+
+    async def start(self, host: str = '::1', port: int = 5353, tcp: bool = True) -> int:
+        """开始监听，返回实际端口（port为0时由系统分配）"""
+        loop = asyncio.get_running_loop()
+        self._udp_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPProtocol(self), local_addr=(host, port))
+        port = self._udp_transport.get_extra_info('sockname')[1]
+        if tcp:
+            self._tcp_server = await asyncio.start_server(self._handle_tcp, host, port)
+        return port
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """一个TCP连接上可以连续发送多个查询，按顺序逐个回答"""
+        try:
+            while True:
+                length = _LENGTH_STRUCT.unpack(await reader.readexactly(2))[0]
+                data = await reader.readexactly(length)
+                self.stats.tcp_queries += 1
+                response = self.respond(data)
+                if response is not None:
+                    writer.write(_LENGTH_STRUCT.pack(len(response)) + response)
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: DNSServer):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        response = self.server.respond(data, udp=True)
+        if response is not None:
+            self.transport.sendto(response, addr)
+
+
+def _print_stats(stats: ServerStats):
+    parse_us, build_us = stats.per_packet_us()
+    print(f"查询: {stats.queries}  响应: {stats.responses}  NXDOMAIN: {stats.nxdomain}  "
+          f"格式错误: {stats.formerr}  截断: {stats.truncated}  TCP: {stats.tcp_queries}  "
+          f"解析: {parse_us:.2f} 微秒/个  构造: {build_us:.2f} 微秒/个", flush=True)
+
+
+async def _serve(args):
+    zone = Zone.from_file(args.zone) if args.zone else Zone.synthetic(args.synthetic)
+    server = DNSServer(zone)
+    port = await server.start(args.host, args.port, tcp=not args.no_tcp)
+    print(f"在 [{args.host}]:{port} 上提供 {len(zone)} 条记录", flush=True)
+
+    # 压测脚本通常用SIGTERM结束后台运行的服务器，同样输出统计后退出
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), args.interval or None)
+            except asyncio.TimeoutError:
+                _print_stats(server.stats)
+    finally:
+        await server.close()
+        _print_stats(server.stats)
+
+
+def main():
+    """启动本地DNS服务器，Ctrl+C或SIGTERM退出时输出统计"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="用于压测的本地UDP/TCP DNS服务器")
+    parser.add_argument("--host", default="::1", help="监听地址（默认::1）")
+    parser.add_argument("--port", type=int, default=5353, help="监听端口（默认5353）")
+    parser.add_argument("--zone", help="区域文件，每行 \"名称 TTL 类型 数据...\"")
+    parser.add_argument("--synthetic", type=int, default=10000,
+                        help="未指定区域文件时生成的主机数（默认10000）")
+    parser.add_argument("--no-tcp", action="store_true", help="只监听UDP")
+    parser.add_argument("--interval", type=float, default=0, help="每隔多少秒输出一次统计（默认不输出）")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+多进程DNS抓包统计
+
+把抓包文件切成若干字节区间（CaptureShard），由进程池并行解析；
+每个子进程只返回可合并的计数摘要（DNSSummary），不把逐条记录传回父进程，
+父进程合并摘要后输出Top-N报告。
+"""
+import os
+import socket
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from dns_parser import DNSParser
+from pcap_reader import MALFORMED_ERRORS, CaptureShard, DNSCaptureReader
+
+# 每个工作进程分到的区间数，区间更细可以平衡各进程的负载
+SHARDS_PER_WORKER = 4
+
+RCODE_NAMES = {
+    0: "NOERROR",
+    1: "FORMERR",
+    2: "SERVFAIL",
+    3: "NXDOMAIN",
+    4: "NOTIMP",
+    5: "REFUSED"
+}
+
+
+class DNSSummary:
+    """可合并的DNS统计摘要，所有计数都是精确值"""
+
+    def __init__(self):
+        self.frames = 0
+        self.queries = 0
+        self.responses = 0
+        self.malformed = 0
+        self.qnames = Counter()    # 查询名称（小写）
+        self.qtypes = Counter()    # 查询类型
+        self.rcodes = Counter()    # 响应码，只统计响应
+        self.talkers = Counter()   # 源地址（打包后的bytes）
+
+    def add(self, src: bytes, payload) -> None:
+        """统计一个DNS负载，只解析头部和问题部分"""
+        try:
+            parser = DNSParser(payload)
+            header = parser.parse_header()
+            questions = [parser.parse_question() for _ in range(header.qdcount)]
+        except MALFORMED_ERRORS:
+            self.malformed += 1
+            return
+
+        if header.is_response:
+            self.responses += 1
+            self.rcodes[header.rcode] += 1
+        else:
+            self.queries += 1
+            for q in questions:
+                self.qnames[q.name.lower()] += 1
+                self.qtypes[q.type_] += 1
+        self.talkers[src] += 1
+
+    def merge(self, other: 'DNSSummary') -> 'DNSSummary':
+        """把另一个摘要累加进来，返回自身"""
+        self.frames += other.frames
+        self.queries += other.queries
+        self.responses += other.responses
+        self.malformed += other.malformed
+        self.qnames.update(other.qnames)
+        self.qtypes.update(other.qtypes)
+        self.rcodes.update(other.rcodes)
+        self.talkers.update(other.talkers)
+        return self
+
+    def report(self, top: int = 10) -> Dict:
+        """生成可序列化的Top-N报告"""
+        def family(addr: bytes) -> int:
+            return socket.AF_INET if len(addr) == 4 else socket.AF_INET6
+
+        return {
+            "frames": self.frames,
+            "queries": self.queries,
+            "responses": self.responses,
+            "malformed": self.malformed,
+            "top_qnames": self.qnames.most_common(top),
+            "qtypes": [
+                (DNSParser.RECORD_TYPES.get(t, f"TYPE{t}"), n)
+                for t, n in self.qtypes.most_common()
+            ],
+            "rcodes": [
+                (RCODE_NAMES.get(r, f"RCODE{r}"), n)
+                for r, n in self.rcodes.most_common()
+            ],
+            "top_talkers": [
+                (socket.inet_ntop(family(addr), addr), n)
+                for addr, n in self.talkers.most_common(top)
+            ]
+        }
+
+
+def analyze_shard(path: str, shard: Optional[CaptureShard], ports: Tuple[int, ...] = (53,)) -> DNSSummary:
+    """在当前进程中统计抓包文件的一个区间（shard为None时统计整个文件）"""
+    summary = DNSSummary()
+    with DNSCaptureReader(path, ports=ports) as reader:
+        for _, src, _, _, _, payload in reader.payloads(shard):
+            summary.add(src.tobytes(), payload)
+        summary.frames = reader.stats.frames
+    return summary
+
+
+def analyze_capture(path: str, workers: Optional[int] = None,
+                    ports: Tuple[int, ...] = (53,)) -> DNSSummary:
+    """
+    并行统计整个抓包文件
+
+    workers默认取CPU核数；为1时直接在当前进程中处理，不启动进程池
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return analyze_shard(path, None, ports)
+
+    with DNSCaptureReader(path, ports=ports) as reader:
+        shards: List[CaptureShard] = reader.capture.shards(workers * SHARDS_PER_WORKER)
+
+    summary = DNSSummary()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(analyze_shard, path, shard, ports) for shard in shards]
+        for future in futures:
+            summary.merge(future.result())
+    return summary
+
+
+def main():
+    """统计抓包文件中的DNS流量并输出Top-N报告"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="多进程统计pcap/pcapng中的DNS流量")
+    parser.add_argument("capture", help="抓包文件路径")
+    parser.add_argument("--workers", type=int, help="工作进程数（默认CPU核数）")
+    parser.add_argument("--top", type=int, default=10, help="Top-N的数量（默认10）")
+    parser.add_argument("--port", type=int, action="append", help="DNS端口，可重复指定（默认53）")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args()
+
+    summary = analyze_capture(args.capture, workers=args.workers, ports=tuple(args.port or (53,)))
+    report = summary.report(args.top)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"帧总数: {report['frames']}")
+    print(f"查询: {report['queries']}  响应: {report['responses']}  格式错误: {report['malformed']}")
+    print(f"\n查询最多的名称:")
+    for name, count in report["top_qnames"]:
+        print(f"  {count:>10}  {name}")
+    print(f"\n查询类型分布:")
+    for name, count in report["qtypes"]:
+        print(f"  {count:>10}  {name}")
+    print(f"\n响应码分布:")
+    for name, count in report["rcodes"]:
+        print(f"  {count:>10}  {name}")
+    print(f"\n发送最多的地址:")
+    for addr, count in report["top_talkers"]:
+        print(f"  {count:>10}  {addr}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+IPv6地址的列式批量处理
+
+ipaddress.IPv6Address 每个地址都要建一个对象，判断作用域、输出压缩/完整形式都要几微秒，
+处理日志里成百上万的地址时太慢。这里把一批地址解析成高、低64位两列uint64（AddressArray），
+链路本地、多播、全局、ULA、IPv4映射等判断都是整列的掩码运算，压缩和完整形式也整批生成。
+网络范围取 RFC 6890（IANA特殊用途地址表）中的候选块，导入时按本机 ipaddress 的判断取舍，
+结果与 ipaddress 逐个计算的一致，可以用 --verify 核对。
+"""
+import ipaddress
+import socket
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_MASK64 = (1 << 64) - 1
+_IPV4_MASK = np.uint64(0xFFFFFFFF)
+_MAPPED_PREFIX = np.uint64(0xFFFF)
+
+# 网络表：每行是一个网络的 (前缀高64位, 前缀低64位, 掩码高64位, 掩码低64位)
+_NETWORK_DTYPE = np.dtype([('hi', '<u8'), ('lo', '<u8'), ('mask_hi', '<u8'), ('mask_lo', '<u8')])
+
+
+def _network_table(networks) -> np.ndarray:
+    table = np.zeros(len(networks), dtype=_NETWORK_DTYPE)
+    for row, network in zip(table, networks):
+        address = int(network.network_address) << (128 - network.max_prefixlen)
+        mask = int(network.netmask) << (128 - network.max_prefixlen)
+        row['hi'], row['lo'] = address >> 64, address & _MASK64
+        row['mask_hi'], row['mask_lo'] = mask >> 64, mask & _MASK64
+    return table
+
+
+def _networks(*networks: str) -> list:
+    return [ipaddress.ip_network(network) for network in networks]
+
+
+def _classified(networks: list, predicate) -> list:
+    """留下首尾地址都满足predicate的网络，按本机 ipaddress 的判断取舍"""
+    return [network for network in networks
+            if predicate(network.network_address) and predicate(network.broadcast_address)]
+
+
+# 候选地址块取 RFC 6890 和IANA特殊用途地址表的各个版本的并集，哪些块算私有、
+# 哪些是例外由本机 ipaddress 的公开判断决定：不同Python版本的表不一样（例如3.13
+# 增加了 64:ff9b:1::/48、2002::/16 和 2001:1::1 等例外），结果始终与本机一致，可以用 --verify 核对
+_V6_PRIVATE_CANDIDATES = _networks(
+    '::1/128',          # 环回
+    '::/128',           # 未指定地址
+    '::ffff:0:0/96',    # IPv4映射地址，实际按其IPv4地址判断
+    '64:ff9b:1::/48',   # 本地使用的IPv4/IPv6转换（RFC 8215）
+    '100::/64',         # 丢弃前缀（RFC 6666）
+    '2001::/23',        # IETF协议分配
+    '2001:2::/48',      # 基准测试（RFC 5180）
+    '2001:db8::/32',    # 文档（RFC 3849）
+    '2001:10::/28',     # ORCHID（RFC 4843）
+    '2002::/16',        # 6to4（RFC 3056）
+    '3fff::/20',        # 文档（RFC 9637）
+    '5f00::/16',        # SRv6 SID（RFC 9602）
+    'fc00::/7',         # 唯一本地地址（RFC 4193）
+    'fe80::/10',        # 链路本地
+)
+# 2001::/23 中可以全局路由的块
+_V6_EXCEPTION_CANDIDATES = _networks(
+    '2001:1::1/128', '2001:1::2/128', '2001:1::3/128', '2001:3::/32', '2001:4:112::/48',
+    '2001:20::/28', '2001:30::/28')
+_V4_PRIVATE_CANDIDATES = _networks(
+    '0.0.0.0/8', '10.0.0.0/8', '127.0.0.0/8', '169.254.0.0/16', '172.16.0.0/12',
+    '192.0.0.0/24',     # IETF协议分配
+    '192.0.0.0/29',     # DS-Lite（RFC 6333）
+    '192.0.0.170/31',   # NAT64前缀发现（RFC 7050）
+    '192.0.2.0/24', '192.168.0.0/16', '198.18.0.0/15', '198.51.100.0/24', '203.0.113.0/24',
+    '240.0.0.0/4', '255.255.255.255/32')
+_V4_EXCEPTION_CANDIDATES = _networks('192.0.0.9/32', '192.0.0.10/32')
+
+_LINK_LOCAL_NETWORKS = _classified(_networks('fe80::/10'), lambda address: address.is_link_local)
+_SITE_LOCAL_NETWORKS = _classified(_networks('fec0::/10'), lambda address: address.is_site_local)
+_MULTICAST_NETWORKS = _classified(_networks('ff00::/8'), lambda address: address.is_multicast)
+# IETF保留、尚未分配的地址空间（RFC 4291）
+_RESERVED_NETWORKS = _classified(
+    _networks('::/8', '100::/8', '200::/7', '400::/6', '800::/5', '1000::/4', '4000::/3', '6000::/3',
+              '8000::/3', 'a000::/3', 'c000::/3', 'e000::/4', 'f000::/5', 'f800::/6', 'fe00::/9'),
+    lambda address: address.is_reserved)
+_PRIVATE_NETWORKS = _classified(_V6_PRIVATE_CANDIDATES, lambda address: address.is_private)
+_PRIVATE_EXCEPTION_NETWORKS = _classified(_V6_EXCEPTION_CANDIDATES, lambda address: not address.is_private)
+_V4_PRIVATE_NETWORKS = _classified(_V4_PRIVATE_CANDIDATES, lambda address: address.is_private)
+_V4_PRIVATE_EXCEPTION_NETWORKS = _classified(_V4_EXCEPTION_CANDIDATES, lambda address: not address.is_private)
+# 共享地址（RFC 6598）既不私有也不全局
+_V4_SHARED_NETWORKS = _networks('100.64.0.0/10')
+
+_LINK_LOCAL = _network_table(_LINK_LOCAL_NETWORKS)
+_SITE_LOCAL = _network_table(_SITE_LOCAL_NETWORKS)
+_MULTICAST = _network_table(_MULTICAST_NETWORKS)
+_UNIQUE_LOCAL = _network_table(_networks('fc00::/7'))
+_RESERVED = _network_table(_RESERVED_NETWORKS)
+_PRIVATE = _network_table(_PRIVATE_NETWORKS)
+_PRIVATE_EXCEPTIONS = _network_table(_PRIVATE_EXCEPTION_NETWORKS)
+# IPv4网络左移到128位的最高32位，与映射地址的低32位左移后比较
+_V4_PRIVATE = _network_table(_V4_PRIVATE_NETWORKS)
+_V4_PRIVATE_EXCEPTIONS = _network_table(_V4_PRIVATE_EXCEPTION_NETWORKS)
+_V4_SHARED = _network_table(_V4_SHARED_NETWORKS)
+# 有的版本按IPv4地址的 is_global 判断映射地址是否全局，这时映射的共享地址不算全局
+_MAPPED_GLOBAL_FROM_V4 = not ipaddress.IPv6Address('::ffff:100.64.0.1').is_global
+# 3.13起映射地址的 is_loopback 也按IPv4地址判断，文本形式的最后32位写成点分形式
+_MAPPED_LOOPBACK_FROM_V4 = ipaddress.IPv6Address('::ffff:127.0.0.1').is_loopback
+_MAPPED_DOTTED = '.' in ipaddress.IPv6Address('::ffff:192.0.2.1').compressed
+_V4_LOOPBACK = _network_table(_networks('127.0.0.0/8'))
+
+
+def _in_networks(hi: np.ndarray, lo: np.ndarray, table: np.ndarray) -> np.ndarray:
+    result = np.zeros(len(hi), dtype=bool)
+    for network in table:
+        result |= (((hi & network['mask_hi']) == network['hi'])
+                   & ((lo & network['mask_lo']) == network['lo']))
+    return result
+
+
+def _parse_one(text: str) -> Tuple[bytes, Optional[str]]:
+    """解析单个地址，返回 (16字节地址, 作用域)；规则与 ipaddress.IPv6Address 相同"""
+    try:
+        return socket.inet_pton(socket.AF_INET6, text), None
+    except (OSError, TypeError):
+        pass
+    address, separator, scope = text.partition('%') if isinstance(text, str) else ('', '', '')
+    if separator and scope and '%' not in scope and '/' not in scope:
+        try:
+            return socket.inet_pton(socket.AF_INET6, address), scope
+        except OSError:
+            pass
+    raise ValueError(f"无效的IPv6地址: {text!r}")
+
+
+class AddressArray:
+    """
+    一批IPv6地址，按高、低64位两列uint64存储
+
+    作用域判断（is_link_local、is_global 等）返回布尔数组，名称和含义与 ipaddress 相同；
+    compressed、exploded 返回字符串列表。宽松解析时无效地址记为 ::，valid 列为False。
+    """
+
+    def __init__(self, hi: np.ndarray, lo: np.ndarray, scopes: Optional[List[Optional[str]]] = None,
+                 valid: Optional[np.ndarray] = None):
+        self.hi = np.asarray(hi, dtype=np.uint64)
+        self.lo = np.asarray(lo, dtype=np.uint64)
+        if self.hi.shape != self.lo.shape:
+            raise ValueError("高、低64位两列长度不一致")
+        self.scopes = scopes
+        self.valid = np.ones(len(self.hi), dtype=bool) if valid is None else valid
+
+    @classmethod
+    def parse(cls, addresses: Iterable[str], strict: bool = True) -> 'AddressArray':
+        """
+        解析地址字符串，可以带 %作用域
+        strict为True时遇到无效地址抛出ValueError，否则记为无效继续解析
+        """
+        inet_pton = socket.inet_pton
+        family = socket.AF_INET6
+        chunks = []
+        scopes = {}
+        invalid = []
+        for index, text in enumerate(addresses):
+            try:
+                chunks.append(inet_pton(family, text))
+                continue
+            except (OSError, TypeError):
+                pass
+            # 慢路径：带作用域或无效的地址
+            try:
+                packed, scope = _parse_one(text)
+            except ValueError:
+                if strict:
+                    raise
+                packed, scope = bytes(16), None
+                invalid.append(index)
+            chunks.append(packed)
+            if scope is not None:
+                scopes[index] = scope
+        array = cls.from_packed(b''.join(chunks))
+        if scopes:
+            array.scopes = [scopes.get(index) for index in range(len(chunks))]
+        array.valid[invalid] = False
+        return array
+
+    @classmethod
+    def from_packed(cls, packed: bytes) -> 'AddressArray':
+        """从连续的16字节网络序地址构造"""
+        if len(packed) % 16:
+            raise ValueError("地址数据长度必须是16的整数倍")
+        words = np.frombuffer(packed, dtype='>u8').reshape(-1, 2)
+        return cls(words[:, 0].astype(np.uint64), words[:, 1].astype(np.uint64))
+
+    def __len__(self) -> int:
+        return len(self.hi)
+
+    def __getitem__(self, index: int) -> ipaddress.IPv6Address:
+        value = (int(self.hi[index]) << 64) | int(self.lo[index])
+        scope = self.scopes[index] if self.scopes else None
+        if scope:
+            return ipaddress.IPv6Address(f'{ipaddress.IPv6Address(value)}%{scope}')
+        return ipaddress.IPv6Address(value)
+
+    @property
+    def packed(self) -> bytes:
+        words = np.empty((len(self), 2), dtype='>u8')
+        words[:, 0] = self.hi
+        words[:, 1] = self.lo
+        return words.tobytes()
+
+    def in_network(self, network) -> np.ndarray:
+        """是否属于给定网络（"2001:db8::/32" 或 IPv6Network）"""
+        return _in_networks(self.hi, self.lo, _network_table([ipaddress.IPv6Network(network)]))
+
+    # 作用域判断
+
+    @property
+    def is_link_local(self) -> np.ndarray:
+        return _in_networks(self.hi, self.lo, _LINK_LOCAL)
+
+    @property
+    def is_site_local(self) -> np.ndarray:
+        return _in_networks(self.hi, self.lo, _SITE_LOCAL)
+
+    @property
+    def is_multicast(self) -> np.ndarray:
+        return _in_networks(self.hi, self.lo, _MULTICAST)
+
+    @property
+    def is_unique_local(self) -> np.ndarray:
+        """唯一本地地址（ULA，fc00::/7），ipaddress 中归入 is_private"""
+        return _in_networks(self.hi, self.lo, _UNIQUE_LOCAL)
+
+    @property
+    def is_reserved(self) -> np.ndarray:
+        return _in_networks(self.hi, self.lo, _RESERVED)
+
+    @property
+    def is_loopback(self) -> np.ndarray:
+        loopback = (self.hi == 0) & (self.lo == 1)
+        if _MAPPED_LOOPBACK_FROM_V4:
+            loopback |= self.is_ipv4_mapped & _in_networks(*self._mapped_ipv4(), _V4_LOOPBACK)
+        return loopback
+
+    @property
+    def is_unspecified(self) -> np.ndarray:
+        return (self.hi == 0) & (self.lo == 0)
+
+    @property
+    def is_ipv4_mapped(self) -> np.ndarray:
+        """::ffff:0:0/96"""
+        return (self.hi == 0) & ((self.lo >> np.uint64(32)) == _MAPPED_PREFIX)
+
+    def _mapped_ipv4(self) -> Tuple[np.ndarray, np.ndarray]:
+        """映射地址的IPv4部分移到最高32位，便于和IPv4网络表比较"""
+        return (self.lo & _IPV4_MASK) << np.uint64(32), np.zeros(len(self), dtype=np.uint64)
+
+    @property
+    def is_private(self) -> np.ndarray:
+        """IPv4映射地址按其IPv4地址判断，其余按IANA的IPv6特殊地址表"""
+        mapped = self.is_ipv4_mapped
+        private = (_in_networks(self.hi, self.lo, _PRIVATE)
+                   & ~_in_networks(self.hi, self.lo, _PRIVATE_EXCEPTIONS))
+        if mapped.any():
+            v4_hi, v4_lo = self._mapped_ipv4()
+            private[mapped] = (_in_networks(v4_hi, v4_lo, _V4_PRIVATE)
+                               & ~_in_networks(v4_hi, v4_lo, _V4_PRIVATE_EXCEPTIONS))[mapped]
+        return private
+
+    @property
+    def is_global(self) -> np.ndarray:
+        is_global = ~self.is_private
+        if _MAPPED_GLOBAL_FROM_V4:
+            mapped = self.is_ipv4_mapped
+            if mapped.any():
+                is_global[mapped & _in_networks(*self._mapped_ipv4(), _V4_SHARED)] = False
+        return is_global
+
+    # 文本形式
+
+    def _hex_digits(self) -> np.ndarray:
+        """每个地址8组、每组4个十六进制数字字符，形状 (n, 8, 4)"""
+        return np.frombuffer(self.packed.hex().encode('ascii'), dtype=np.uint8).reshape(len(self), 8, 4)
+
+    def _dotted_mapped(self, texts: List[str], prefix: str) -> List[str]:
+        """按本机 ipaddress 的写法，把IPv4映射地址改成 prefix 加点分形式"""
+        if _MAPPED_DOTTED:
+            for index in np.flatnonzero(self.is_ipv4_mapped).tolist():
+                v4 = int(self.lo[index]) & 0xFFFFFFFF
+                texts[index] = f'{prefix}{v4 >> 24}.{v4 >> 16 & 0xFF}.{v4 >> 8 & 0xFF}.{v4 & 0xFF}'
+        return texts
+
+    @staticmethod
+    def _join_rows(chars: np.ndarray, keep: np.ndarray) -> List[str]:
+        """按 keep 选出每行保留的字符，各行拼成一个字符串"""
+        text = chars[keep].tobytes().decode('ascii')
+        ends = np.cumsum(keep.sum(axis=1)).tolist()
+        return [text[begin:end] for begin, end in zip([0] + ends[:-1], ends)]
+
+    @property
+    def compressed(self) -> List[str]:
+        """
+        RFC 5952压缩形式，与 IPv6Address.compressed 相同（带作用域的地址附加 %作用域）
+        socket.inet_ntop 每次调用将近1微秒，而且会把IPv4映射地址写成点分形式，
+        这里直接在字符矩阵上去掉前导零、把最长（并列时取最前）的一段全零组换成 ::
+        """
+        count = len(self)
+        if not count:
+            return []
+        groups = np.frombuffer(self.packed, dtype='>u2').reshape(count, 8)
+        # 每组5个字符位：4位数字加一个冒号，最后一组的冒号位默认不输出
+        chars = np.full((count, 8, 5), ord(':'), dtype=np.uint8)
+        chars[:, :, :4] = self._hex_digits()
+        keep = np.ones((count, 8, 5), dtype=bool)
+        keep[:, :, 0] = groups >= 0x1000
+        keep[:, :, 1] = groups >= 0x100
+        keep[:, :, 2] = groups >= 0x10
+        keep[:, 7, 4] = False
+
+        # 找最长的全零组序列：run为以当前组结尾的连续零组数
+        zero = groups == 0
+        run = np.zeros(count, dtype=np.int64)
+        best_length = np.zeros(count, dtype=np.int64)
+        best_end = np.zeros(count, dtype=np.int64)
+        for group in range(8):
+            run = (run + 1) * zero[:, group]
+            longer = run > best_length
+            best_length[longer] = run[longer]
+            best_end[longer] = group
+        # 序列内的组不输出数字，只保留最后一组的冒号；从第一组开始的序列再多保留一个冒号
+        position = np.arange(8)
+        best_end = best_end[:, None]
+        best_begin = best_end - best_length[:, None] + 1
+        in_run = (best_length[:, None] >= 2) & (position >= best_begin) & (position <= best_end)
+        keep[:, :, :4] &= ~in_run[:, :, None]
+        keep[:, :, 4] = np.where(in_run, (position == best_end) | (best_begin == 0) & (position == 0),
+                                 keep[:, :, 4])
+
+        texts = self._dotted_mapped(self._join_rows(chars.reshape(count, 40), keep.reshape(count, 40)),
+                                    '::ffff:')
+        if self.scopes:
+            for index, scope in enumerate(self.scopes):
+                if scope:
+                    texts[index] = f'{texts[index]}%{scope}'
+        return texts
+
+    @property
+    def exploded(self) -> List[str]:
+        """完整形式：8组各4位十六进制数（不含作用域）"""
+        count = len(self)
+        chars = np.full((count, 8, 5), ord(':'), dtype=np.uint8)
+        chars[:, :, :4] = self._hex_digits()
+        text = chars.reshape(count, 40)[:, :39].tobytes().decode('ascii')
+        return self._dotted_mapped([text[offset:offset + 39] for offset in range(0, len(text), 39)],
+                                   '0000:0000:0000:0000:0000:ffff:')
+
+
+def address_columns(addresses: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """把地址字符串转换为高、低64位两列uint64"""
+    array = AddressArray.parse(addresses)
+    return array.hi, array.lo
+
+
+_PROPERTIES = ('is_link_local', 'is_site_local', 'is_multicast', 'is_reserved', 'is_loopback',
+               'is_unspecified', 'is_private', 'is_global')
+
+
+def _sample_addresses(count: int, seed: int = 0) -> List[str]:
+    """用于核对的地址：各特殊网络边界附近的地址、映射/兼容地址、全零段不同位置的地址和随机地址"""
+    import random
+    rng = random.Random(seed)
+    # 包括本机不算私有的候选块，它们的边界同样要核对
+    networks = (_V6_PRIVATE_CANDIDATES + _V6_EXCEPTION_CANDIDATES + _RESERVED_NETWORKS + _LINK_LOCAL_NETWORKS
+                + _SITE_LOCAL_NETWORKS + _MULTICAST_NETWORKS)
+    values = [0, 1, 2, 0xFFFF, 0x1_0000, 0xFFFF_0000_0000, 0xFFFF_FFFF_FFFF, (1 << 128) - 1]
+    for network in networks:
+        first, last = int(network.network_address), int(network.broadcast_address)
+        values += [first, last, max(first - 1, 0), min(last + 1, (1 << 128) - 1),
+                   first + rng.getrandbits(network.max_prefixlen - network.prefixlen)]
+    for network in _V4_PRIVATE_CANDIDATES + _V4_EXCEPTION_CANDIDATES + _V4_SHARED_NETWORKS:
+        for v4 in (int(network.network_address), int(network.broadcast_address),
+                   int(network.broadcast_address) + 1 & 0xFFFFFFFF):
+            values += [0xFFFF_0000_0000 | v4, v4]
+    texts = [str(ipaddress.IPv6Address(value)) for value in values]
+    while len(texts) < count:
+        # 随机挑几组置零，覆盖压缩形式中 :: 的各种位置和并列情况
+        groups = [rng.getrandbits(16) if rng.random() < 0.5 else 0 for _ in range(8)]
+        if rng.random() < 0.3:
+            groups[rng.randrange(8)] = 0xFFFF
+        texts.append(':'.join(f'{group:x}' for group in groups))
+    texts += ['fe80::1%eth0', 'ff02::1%1', '::ffff:192.0.2.1', '::192.0.2.1', '1:2:3:4:5:6:1.2.3.4']
+    return texts
+
+
+_INVALID_SAMPLES = ['', ':', ':::', '1::2::3', '1:2:3:4:5:6:7:8:9', '1:2:3:4:5:6:7', '12345::',
+                    'g::', '::ffff:1.2.3', '::ffff:1.2.3.256', '::ffff:01.2.3.4', '::1.2.3.4:5',
+                    ' ::1', '::1 ', 'fe80::1%', 'fe80::1%a%b', 'fe80::1%a/b', '::/64', '1.2.3.4',
+                    '1:2:3:4:5:6:7:8::', '::1:2:3:4:5:6:7:8', '[::1]', '::-1', '0x1::']
+
+
+def verify(count: int = 20000, seed: int = 0) -> int:
+    """逐个与 ipaddress 比较，返回不一致的个数"""
+    texts = _sample_addresses(count, seed)
+    array = AddressArray.parse(texts)
+    objects = [ipaddress.IPv6Address(text) for text in texts]
+    mismatches = 0
+
+    def report(what, text, expected, actual):
+        nonlocal mismatches
+        mismatches += 1
+        if mismatches <= 20:
+            print(f"不一致 {what} {text!r}: ipaddress={expected!r} 批量={actual!r}")
+
+    columns = {name: getattr(array, name).tolist() for name in _PROPERTIES}
+    compressed, exploded = array.compressed, array.exploded
+    for index, (text, address) in enumerate(zip(texts, objects)):
+        for name in _PROPERTIES:
+            if getattr(address, name) != columns[name][index]:
+                report(name, text, getattr(address, name), columns[name][index])
+        if address.compressed != compressed[index]:
+            report('compressed', text, address.compressed, compressed[index])
+        if not address.scope_id and address.exploded != exploded[index]:
+            report('exploded', text, address.exploded, exploded[index])
+        if array[index] != address:
+            report('value', text, address, array[index])
+
+    lenient = AddressArray.parse(_INVALID_SAMPLES + texts[:1], strict=False)
+    for text, valid in zip(_INVALID_SAMPLES, lenient.valid.tolist()):
+        try:
+            ipaddress.IPv6Address(text)
+            expected = True
+        except ValueError:
+            expected = False
+        if expected != valid:
+            report('valid', text, expected, valid)
+    print(f"核对了 {len(texts)} 个地址、{len(_INVALID_SAMPLES)} 个无效输入，不一致 {mismatches} 处")
+    return mismatches
+
+
+def benchmark(count: int = 100000) -> None:
+    """比较批量处理与逐个构造 IPv6Address 的每地址耗时"""
+    import time
+    # 带作用域的地址在部分Python版本上 IPv6Address.exploded 会出错，测量时不用
+    texts = [text for text in _sample_addresses(count, seed=1) if '%' not in text]
+
+    def timed(function):
+        start = time.perf_counter()
+        function()
+        return (time.perf_counter() - start) / len(texts) * 1e9
+
+    def per_object():
+        for text in texts:
+            address = ipaddress.IPv6Address(text)
+            address.compressed, address.exploded, address.is_link_local, address.is_global
+
+    def batch():
+        array = AddressArray.parse(texts)
+        array.compressed, array.exploded, array.is_link_local, array.is_global
+
+    print(f"ipaddress逐个处理: {timed(per_object):8.0f} ns/地址")
+    print(f"批量处理:          {timed(batch):8.0f} ns/地址")
+    array = AddressArray.parse(texts)
+    for name, function in (('解析', lambda: AddressArray.parse(texts)),
+                           ('compressed', lambda: array.compressed),
+                           ('exploded', lambda: array.exploded),
+                           ('is_global', lambda: array.is_global)):
+        print(f"  {name:<12}{timed(function):8.0f} ns/地址")
+
+
+def main():
+    """把文件中的地址统一成压缩或完整形式，或核对结果、测量速度"""
+    import argparse
+    import sys
+    from collections import Counter
+
+    parser = argparse.ArgumentParser(description="IPv6地址批量解析与规范化")
+    parser.add_argument("file", nargs="?", help="每行一个地址的文件，省略时读标准输入")
+    parser.add_argument("--exploded", action="store_true", help="输出完整形式而不是压缩形式")
+    parser.add_argument("--summary", action="store_true", help="只输出各类地址的数量")
+    parser.add_argument("--verify", action="store_true", help="与 ipaddress 逐个核对")
+    parser.add_argument("--benchmark", action="store_true", help="测量每地址耗时")
+    parser.add_argument("--count", type=int, default=20000, help="核对/测量使用的地址数")
+    args = parser.parse_args()
+
+    if args.verify:
+        sys.exit(1 if verify(args.count) else 0)
+    if args.benchmark:
+        benchmark(args.count)
+        return
+
+    f = open(args.file, encoding='utf-8') if args.file else sys.stdin
+    with f:
+        lines = [line.strip() for line in f if line.strip()]
+    array = AddressArray.parse(lines, strict=False)
+    if args.summary:
+        counts = Counter({'无效': int((~array.valid).sum())})
+        valid = array.valid
+        for name in ('is_link_local', 'is_multicast', 'is_unique_local', 'is_ipv4_mapped',
+                     'is_loopback', 'is_global'):
+            counts[name] = int((getattr(array, name) & valid).sum())
+        for name, count in counts.items():
+            print(f"{count:>10}  {name}")
+        return
+    texts = array.exploded if args.exploded else array.compressed
+    for line, text, valid in zip(lines, texts, array.valid.tolist()):
+        print(text if valid else f"# 无效: {line}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+IPv6流表
+
+按5元组（源/目的地址、协议、源/目的端口）聚合报文，双向合并为一条流：
+首个报文的方向为正向，两个方向分别计数报文数和字节数。每个方向记录最初的流标签，
+之后流标签变化的次数单独计数（中间节点不得修改流标签）；流量类别同样记录变化次数和ECN拥塞标记数。
+
+各字段存放在预分配的定长 array.array 列中，槽位由"键 -> 槽位号"索引，
+容量按内存预算一次算好，流再多也不会超过。槽位按最近活动时间串成双向链表：
+- 空闲超时：链表头部的流最久没有活动，超时后导出
+- 活动超时：长期持续的流在下一个报文到达时导出并重新开始计数
+- 表满时淘汰最久没有活动的流
+导出的流通过回调交给调用方。
+
+DNS查询和响应落在同一条流上，每条流记住最近一个未应答查询的ID和时间，
+响应到达时直接算出时延，不需要另建查询表。
+"""
+import struct
+from array import array
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from ipv6_packet import NEXT_HEADER_TCP, NEXT_HEADER_UDP, IPV6_HEADER_LENGTH, IPv6Packet
+
+DEFAULT_IDLE_TIMEOUT = 15.0
+DEFAULT_ACTIVE_TIMEOUT = 1800.0
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+DNS_PORT = 53
+
+# 导出原因
+EXPORT_IDLE = 'idle'
+EXPORT_ACTIVE = 'active'
+EXPORT_EVICTED = 'evicted'
+EXPORT_FLUSH = 'flush'
+
+_NONE = 0xFFFFFFFF  # 还没有流标签 / 没有未应答的DNS查询
+_NIL = -1           # 链表末端
+_ECN_CE = 0x03
+
+_PORTS_STRUCT = struct.Struct('!HH')
+_KEY_TAIL_STRUCT = struct.Struct('!BHH')
+
+# 列名和 array 类型码
+_COLUMNS = (
+    ('first_seen', 'd'),
+    ('last_seen', 'd'),
+    ('packets', 'Q'),          # 正向
+    ('bytes', 'Q'),
+    ('reverse_packets', 'Q'),  # 反向
+    ('reverse_bytes', 'Q'),
+    ('flow_label', 'I'),       # 正向的流标签
+    ('reverse_flow_label', 'I'),
+    ('label_changes', 'I'),
+    ('traffic_class', 'B'),    # 最近一个报文的流量类别
+    ('tc_changes', 'I'),
+    ('ce_marks', 'I'),
+    ('forward', 'B'),          # 正向是否与键中地址的顺序一致
+    ('dns_id', 'I'),
+    ('dns_time', 'd'),
+    ('dns_queries', 'I'),
+    ('dns_answered', 'I'),
+    ('dns_rtt', 'd'),          # 已应答查询的时延之和
+)
+# 键对象和索引字典在每条流上的开销：bytes对象约70字节，字典项和槽位列表引用约140字节（实测）。
+# 字典扩容的瞬间新旧两张表同时存在，峰值会再高出一部分
+_INDEX_OVERHEAD = 210
+
+
+@dataclass
+class FlowRecord:
+    """导出的一条流"""
+    __slots__ = ('src', 'dst', 'protocol', 'sport', 'dport', 'first_seen', 'last_seen',
+                 'packets', 'bytes', 'reverse_packets', 'reverse_bytes', 'flow_label', 'reverse_flow_label',
+                 'label_changes', 'traffic_class', 'tc_changes', 'ce_marks',
+                 'dns_queries', 'dns_answered', 'dns_rtt', 'reason')
+    src: bytes          # 正向的源地址
+    dst: bytes
+    protocol: int
+    sport: int
+    dport: int
+    first_seen: float
+    last_seen: float
+    packets: int
+    bytes: int
+    reverse_packets: int
+    reverse_bytes: int
+    flow_label: Optional[int]
+    reverse_flow_label: Optional[int]
+    label_changes: int
+    traffic_class: int
+    tc_changes: int
+    ce_marks: int
+    dns_queries: int
+    dns_answered: int
+    dns_rtt: float
+    reason: str
+
+    @property
+    def duration(self) -> float:
+        return self.last_seen - self.first_seen
+
+    @property
+    def label_consistent(self) -> bool:
+        return self.label_changes == 0
+
+
+@dataclass
+class FlowTableStats:
+    """流表的计数"""
+    packets: int = 0
+    skipped: int = 0        # 没有端口信息的报文（非首片分片等）
+    flows: int = 0          # 新建的流
+    active: int = 0         # 当前在表中的流
+    peak_active: int = 0
+    idle: int = 0           # 各原因导出的流数
+    active_timeouts: int = 0
+    evicted: int = 0
+    flushed: int = 0
+    dns_pairs: int = 0
+
+
+class FlowTable:
+    """
+    定长数组实现的流表
+
+    capacity 由 memory_budget 除以每条流的开销得到，也可以直接指定。
+    export 回调接收导出的 FlowRecord；不指定时导出的流被丢弃，只更新计数。
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, capacity: Optional[int] = None,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, active_timeout: float = DEFAULT_ACTIVE_TIMEOUT,
+                 export: Optional[Callable[[FlowRecord], None]] = None, dns_port: int = DNS_PORT):
+        if capacity is None:
+            capacity = memory_budget // self.bytes_per_flow()
+        if capacity < 1:
+            raise ValueError("内存预算太小，放不下一条流")
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.export = export
+        self.dns_port = dns_port
+        self.stats = FlowTableStats()
+
+        for name, typecode in _COLUMNS:
+            setattr(self, '_' + name, array(typecode, bytes(array(typecode).itemsize * capacity)))
+        self._keys = [None] * capacity
+        self._index: Dict[bytes, int] = {}
+        # 按最近活动时间排序的双向链表，头部最旧
+        self._prev = array('i', [_NIL]) * capacity
+        self._next = array('i', [_NIL]) * capacity
+        self._head = self._tail = _NIL
+        self._free = array('i', range(capacity - 1, -1, -1))
+
+    @staticmethod
+    def bytes_per_flow() -> int:
+        columns = sum(array(typecode).itemsize for _, typecode in _COLUMNS)
+        return columns + 2 * array('i').itemsize + 4 + _INDEX_OVERHEAD
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # 链表操作
+
+    def _unlink(self, slot: int):
+        prev, next_ = self._prev[slot], self._next[slot]
+        if prev == _NIL:
+            self._head = next_
+        else:
+            self._next[prev] = next_
+        if next_ == _NIL:
+            self._tail = prev
+        else:
+            self._prev[next_] = prev
+
+    def _append(self, slot: int):
+        tail = self._tail
+        self._prev[slot] = tail
+        self._next[slot] = _NIL
+        if tail == _NIL:
+            self._head = slot
+        else:
+            self._next[tail] = slot
+        self._tail = slot
+
+    # 报文处理
+
+    def add(self, ts: float, packet: IPv6Packet) -> Optional[float]:
+        """
+        把一个报文计入所属的流；如果它是一个DNS响应且同一条流上有对应的查询，
+        返回查询到响应的时延（秒），否则返回None
+        """
+        stats = self.stats
+        payload = packet.payload
+        protocol = packet.protocol
+        if not packet.has_upper_layer_header or (protocol in (NEXT_HEADER_UDP, NEXT_HEADER_TCP)
+                                                 and len(payload) < 4):
+            stats.skipped += 1
+            return None
+        stats.packets += 1
+        if protocol in (NEXT_HEADER_UDP, NEXT_HEADER_TCP):
+            sport, dport = _PORTS_STRUCT.unpack_from(payload, 0)
+        else:
+            sport = dport = 0
+        header = packet.header
+        src, dst = header.src.tobytes(), header.dst.tobytes()
+        # 双向的报文使用同一个键：地址和端口较小的一端在前
+        if (src, sport) <= (dst, dport):
+            key = src + dst + _KEY_TAIL_STRUCT.pack(protocol, sport, dport)
+            canonical = True
+        else:
+            key = dst + src + _KEY_TAIL_STRUCT.pack(protocol, dport, sport)
+            canonical = False
+
+        slot = self._index.get(key)
+        if slot is not None and ts - self._first_seen[slot] >= self.active_timeout:
+            self._export(slot, EXPORT_ACTIVE)
+            slot = None
+        if slot is None:
+            slot = self._allocate(key, ts, canonical)
+        else:
+            self._unlink(slot)
+            self._append(slot)
+        self._last_seen[slot] = ts
+
+        size = IPV6_HEADER_LENGTH + header.payload_length
+        forward = self._forward[slot] == canonical
+        label = header.flow_label
+        if forward:
+            self._packets[slot] += 1
+            self._bytes[slot] += size
+            labels = self._flow_label
+        else:
+            self._reverse_packets[slot] += 1
+            self._reverse_bytes[slot] += size
+            labels = self._reverse_flow_label
+        if labels[slot] == _NONE:
+            labels[slot] = label
+        elif labels[slot] != label:
+            self._label_changes[slot] += 1
+        traffic_class = header.traffic_class
+        if self._traffic_class[slot] != traffic_class:
+            if self._packets[slot] + self._reverse_packets[slot] > 1:
+                self._tc_changes[slot] += 1
+            self._traffic_class[slot] = traffic_class
+        if traffic_class & _ECN_CE == _ECN_CE:
+            self._ce_marks[slot] += 1
+
+        if protocol == NEXT_HEADER_UDP and (sport == self.dns_port or dport == self.dns_port):
+            return self._dns(slot, ts, payload)
+        return None
+
+    def _dns(self, slot: int, ts: float, payload) -> Optional[float]:
+        """只看DNS头部的ID和QR位，不做完整解析"""
+        if len(payload) < 12:
+            return None
+        transaction_id = (payload[8] << 8) | payload[9]
+        if not payload[10] & 0x80:
+            # 上一个查询如果还没有应答，就此被新的查询取代，不再配对
+            self._dns_id[slot] = transaction_id
+            self._dns_time[slot] = ts
+            self._dns_queries[slot] += 1
+            return None
+        if self._dns_id[slot] != transaction_id:
+            return None
+        self._dns_id[slot] = _NONE
+        rtt = ts - self._dns_time[slot]
+        self._dns_answered[slot] += 1
+        self._dns_rtt[slot] += rtt
+        self.stats.dns_pairs += 1
+        return rtt
+
+    def _allocate(self, key: bytes, ts: float, canonical: bool) -> int:
+        stats = self.stats
+        if not self._free:
+            self._export(self._head, EXPORT_EVICTED)
+        slot = self._free.pop()
+        self._index[key] = slot
+        self._keys[slot] = key
+        self._append(slot)
+        for name, typecode in _COLUMNS:
+            getattr(self, '_' + name)[slot] = 0
+        self._first_seen[slot] = ts
+        self._flow_label[slot] = self._reverse_flow_label[slot] = self._dns_id[slot] = _NONE
+        self._forward[slot] = canonical
+        stats.flows += 1
+        stats.active += 1
+        if stats.active > stats.peak_active:
+            stats.peak_active = stats.active
+        return slot
+
+    def _export(self, slot: int, reason: str):
+        stats = self.stats
+        if reason == EXPORT_IDLE:
+            stats.idle += 1
+        elif reason == EXPORT_ACTIVE:
+            stats.active_timeouts += 1
+        elif reason == EXPORT_EVICTED:
+            stats.evicted += 1
+        else:
+            stats.flushed += 1
+        if self.export is not None:
+            self.export(self.record(slot, reason))
+        key = self._keys[slot]
+        del self._index[key]
+        self._keys[slot] = None
+        self._unlink(slot)
+        self._free.append(slot)
+        stats.active -= 1
+
+    def record(self, slot: int, reason: str = '') -> FlowRecord:
+        """把一个槽位的内容转换为 FlowRecord"""
+        key = self._keys[slot]
+        protocol, low_port, high_port = _KEY_TAIL_STRUCT.unpack_from(key, 32)
+        src, dst, sport, dport = key[:16], key[16:32], low_port, high_port
+        if not self._forward[slot]:
+            src, dst, sport, dport = dst, src, dport, sport
+        flow_label = self._flow_label[slot]
+        reverse_flow_label = self._reverse_flow_label[slot]
+        return FlowRecord(
+            src, dst, protocol, sport, dport, self._first_seen[slot], self._last_seen[slot],
+            self._packets[slot], self._bytes[slot], self._reverse_packets[slot], self._reverse_bytes[slot],
+            None if flow_label == _NONE else flow_label,
+            None if reverse_flow_label == _NONE else reverse_flow_label,
+            self._label_changes[slot], self._traffic_class[slot], self._tc_changes[slot], self._ce_marks[slot],
+            self._dns_queries[slot], self._dns_answered[slot], self._dns_rtt[slot], reason)
+
+    def expire(self, now: float):
+        """导出空闲超时的流；链表按最近活动时间排序，只需从头部检查"""
+        deadline = now - self.idle_timeout
+        last_seen = self._last_seen
+        while self._head != _NIL and last_seen[self._head] <= deadline:
+            self._export(self._head, EXPORT_IDLE)
+
+    def flush(self):
+        """导出表中所有的流（抓包结束时调用）"""
+        while self._head != _NIL:
+            self._export(self._head, EXPORT_FLUSH)
+
+    def flows(self) -> Iterator[FlowRecord]:
+        """按最近活动时间从旧到新列出表中的流，不导出"""
+        slot = self._head
+        while slot != _NIL:
+            yield self.record(slot)
+            slot = self._next[slot]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """各列的NumPy视图（不复制，包括空闲槽位），配合 occupied() 做向量化统计"""
+        return {name: np.frombuffer(getattr(self, '_' + name), dtype=np.dtype(typecode))
+                for name, typecode in _COLUMNS}
+
+    def occupied(self) -> np.ndarray:
+        """正在使用的槽位"""
+        used = np.ones(self.capacity, dtype=bool)
+        used[np.frombuffer(self._free, dtype=np.int32)] = False
+        return used
+
+    def process(self, packets: Iterable[Tuple[float, IPv6Packet]], expire_interval: float = 1.0
+                ) -> Iterator[Tuple[float, IPv6Packet, float]]:
+        """
+        依次计入报文流，按抓包时间每隔 expire_interval 秒检查一次空闲超时，
+        产生成功配对的DNS响应 (时间戳, 报文, 时延)
+        """
+        next_expire = None
+        for ts, packet in packets:
+            if next_expire is None or ts >= next_expire:
+                self.expire(ts)
+                next_expire = ts + expire_interval
+            rtt = self.add(ts, packet)
+            if rtt is not None:
+                yield ts, packet, rtt
+
+
+def main():
+    """统计抓包文件中的IPv6流"""
+    import argparse
+    import heapq
+    import socket
+
+    from dns_loadgen import percentile
+    from ipv6_packet import NEXT_HEADER_NAMES, IPv6CaptureReader
+    from ipv6_reassembly import FragmentReassembler
+
+    parser = argparse.ArgumentParser(description="IPv6流统计")
+    parser.add_argument("capture", help="抓包文件路径")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT, help="空闲超时（秒）")
+    parser.add_argument("--active-timeout", type=float, default=DEFAULT_ACTIVE_TIMEOUT, help="活动超时（秒）")
+    parser.add_argument("--memory", type=float, default=DEFAULT_MEMORY_BUDGET / 1024 / 1024,
+                        help="流表内存预算（MiB）")
+    parser.add_argument("--top", type=int, default=10, help="显示字节数最多的N条流")
+    args = parser.parse_args()
+
+    top = []
+
+    def keep_top(record: FlowRecord):
+        item = (record.bytes + record.reverse_bytes, id(record), record)
+        if len(top) < args.top:
+            heapq.heappush(top, item)
+        elif item[0] > top[0][0]:
+            heapq.heapreplace(top, item)
+
+    table = FlowTable(int(args.memory * 1024 * 1024), idle_timeout=args.idle_timeout,
+                      active_timeout=args.active_timeout, export=keep_top)
+    rtts = []
+    with IPv6CaptureReader(args.capture) as reader:
+        packets = FragmentReassembler().reassemble(reader.packets())
+        for _, _, rtt in table.process(packets):
+            rtts.append(rtt)
+    table.flush()
+
+    def endpoint(address: bytes, port: int) -> str:
+        return f"[{socket.inet_ntop(socket.AF_INET6, address)}]:{port}"
+
+    for total, _, record in sorted(top, reverse=True):
+        protocol = NEXT_HEADER_NAMES.get(record.protocol, str(record.protocol))
+        label = '-' if record.flow_label is None else f'0x{record.flow_label:05x}'
+        consistency = '' if record.label_consistent else f' 流标签变化{record.label_changes}次'
+        print(f"{endpoint(record.src, record.sport)} <-> {endpoint(record.dst, record.dport)} {protocol} "
+              f"{record.packets}/{record.reverse_packets}个报文 {total}字节 {record.duration:.3f}秒 "
+              f"流标签={label}{consistency}")
+
+    stats = table.stats
+    print(f"\n容量 {table.capacity} 条流（每条约 {FlowTable.bytes_per_flow()} 字节），峰值 {stats.peak_active}")
+    print(f"报文: {stats.packets}（无端口信息 {stats.skipped}）")
+    print(f"流: {stats.flows}，空闲超时 {stats.idle}，活动超时 {stats.active_timeouts}，"
+          f"淘汰 {stats.evicted}，结束时导出 {stats.flushed}")
+    if rtts:
+        rtts.sort()
+        print(f"DNS配对: {stats.dns_pairs}，时延 p50={percentile(rtts, 0.5) * 1000:.2f}ms "
+              f"p99={percentile(rtts, 0.99) * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
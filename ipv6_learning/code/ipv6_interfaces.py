@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+本机网络接口的IPv6地址
+
+直接读取 /proc/net/if_inet6 得到每个地址所在的接口、前缀长度、作用域和标志，
+不经过 getaddrinfo(gethostname())：后者可能因为解析器配置阻塞在DNS上，
+也只能看到与主机名关联的地址。
+
+InterfaceMonitor 缓存上一次读到的快照。Linux上订阅rtnetlink的IPv6地址变化通知，
+每次查询只做一次非阻塞的recv，没有通知就直接返回缓存；收到通知才重新读取。
+没有netlink时（其他系统或受限的容器）退回到按时间间隔刷新。
+健康检查每秒调用一次也不会产生额外的文件读取或DNS查询。
+"""
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+IF_INET6_PATH = '/proc/net/if_inet6'
+
+# /proc/net/if_inet6 中的作用域取值（内核的 IPV6_ADDR_* 作用域位）
+SCOPE_GLOBAL = 0x00
+SCOPE_HOST = 0x10
+SCOPE_LINK = 0x20
+SCOPE_SITE = 0x40
+SCOPE_COMPAT_V4 = 0x80
+
+SCOPE_NAMES = {
+    SCOPE_GLOBAL: 'global',
+    SCOPE_HOST: 'host',
+    SCOPE_LINK: 'link',
+    SCOPE_SITE: 'site',
+    SCOPE_COMPAT_V4: 'compat-v4',
+}
+
+# 地址标志（IFA_F_*）
+IFA_F_TEMPORARY = 0x01
+IFA_F_NODAD = 0x02
+IFA_F_OPTIMISTIC = 0x04
+IFA_F_DADFAILED = 0x08
+IFA_F_HOMEADDRESS = 0x10
+IFA_F_DEPRECATED = 0x20
+IFA_F_TENTATIVE = 0x40
+IFA_F_PERMANENT = 0x80
+
+FLAG_NAMES = (
+    (IFA_F_TEMPORARY, 'temporary'),
+    (IFA_F_NODAD, 'nodad'),
+    (IFA_F_OPTIMISTIC, 'optimistic'),
+    (IFA_F_DADFAILED, 'dadfailed'),
+    (IFA_F_HOMEADDRESS, 'homeaddress'),
+    (IFA_F_DEPRECATED, 'deprecated'),
+    (IFA_F_TENTATIVE, 'tentative'),
+    (IFA_F_PERMANENT, 'permanent'),
+)
+
+# rtnetlink 多播组：IPv6地址增删
+RTMGRP_IPV6_IFADDR = 0x100
+
+DEFAULT_FALLBACK_INTERVAL = 5.0
+
+
+@dataclass
+class InterfaceAddress:
+    """接口上的一个IPv6地址"""
+    __slots__ = ('address', 'interface', 'index', 'prefix_length', 'scope', 'flags')
+    address: str
+    interface: str
+    index: int
+    prefix_length: int
+    scope: int
+    flags: int
+
+    @property
+    def scope_name(self) -> str:
+        return SCOPE_NAMES.get(self.scope, f'0x{self.scope:02x}')
+
+    @property
+    def flag_names(self) -> List[str]:
+        return [name for flag, name in FLAG_NAMES if self.flags & flag]
+
+    @property
+    def is_usable(self) -> bool:
+        """已完成重复地址检测且未废弃，可以作为源地址使用"""
+        return not self.flags & (IFA_F_TENTATIVE | IFA_F_DADFAILED | IFA_F_DEPRECATED)
+
+    @property
+    def with_prefix(self) -> str:
+        return f'{self.address}/{self.prefix_length}'
+
+
+@dataclass
+class InterfaceSnapshot:
+    """某一时刻的地址列表；generation 在内容变化时递增"""
+    __slots__ = ('addresses', 'generation', 'taken')
+    addresses: Tuple[InterfaceAddress, ...]
+    generation: int
+    taken: float
+
+
+def parse_if_inet6(text: str) -> List[InterfaceAddress]:
+    """
+    解析 /proc/net/if_inet6 的内容，每行为：
+    地址(32位十六进制) 接口编号 前缀长度 作用域 标志 接口名（除接口名外均为十六进制）
+    """
+    addresses = []
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) < 6:
+            continue
+        hex_address, index, prefix_length, scope, flags, interface = fields[:6]
+        if len(hex_address) != 32:
+            raise ValueError(f"无效的地址行: {line!r}")
+        address = socket.inet_ntop(socket.AF_INET6, bytes.fromhex(hex_address))
+        addresses.append(InterfaceAddress(address, interface, int(index, 16), int(prefix_length, 16),
+                                          int(scope, 16), int(flags, 16)))
+    return addresses
+
+
+def read_interface_addresses(path: str = IF_INET6_PATH) -> List[InterfaceAddress]:
+    """读取当前所有接口的IPv6地址；文件不存在（非Linux或未启用IPv6）时抛出OSError"""
+    with open(path, encoding='ascii') as f:
+        return parse_if_inet6(f.read())
+
+
+class InterfaceMonitor:
+    """
+    带缓存的接口地址快照
+
+    snapshot() 在没有变化通知时直接返回缓存；线程安全。
+    use_netlink=False 或netlink不可用时，每隔 fallback_interval 秒重新读取一次，
+    内容确有变化时 generation 才会递增。
+    """
+
+    def __init__(self, path: str = IF_INET6_PATH, use_netlink: bool = True,
+                 fallback_interval: float = DEFAULT_FALLBACK_INTERVAL):
+        self.path = path
+        self.fallback_interval = fallback_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[InterfaceSnapshot] = None
+        self._socket = self._open_netlink() if use_netlink else None
+        self.reads = 0  # 实际读取文件的次数
+
+    @staticmethod
+    def _open_netlink() -> Optional[socket.socket]:
+        if not hasattr(socket, 'AF_NETLINK'):
+            return None
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        except OSError:
+            return None
+        try:
+            sock.bind((0, RTMGRP_IPV6_IFADDR))
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            return None
+        return sock
+
+    @property
+    def event_driven(self) -> bool:
+        return self._socket is not None
+
+    def _pending_changes(self) -> bool:
+        """取走所有排队的通知，有任何通知（或通知溢出）就说明可能有变化"""
+        changed = False
+        while True:
+            try:
+                if not self._socket.recv(65536):
+                    return changed
+                changed = True
+            except BlockingIOError:
+                return changed
+            except OSError:
+                # ENOBUFS：通知太多被内核丢弃，只能当作有变化
+                changed = True
+
+    def snapshot(self, force: bool = False) -> InterfaceSnapshot:
+        with self._lock:
+            current = self._snapshot
+            now = time.monotonic()
+            if current is not None and not force:
+                if self._socket is not None:
+                    if not self._pending_changes():
+                        return current
+                elif now - current.taken < self.fallback_interval:
+                    return current
+            elif self._socket is not None:
+                # 读取前先清空通知队列，读取期间发生的变化会留到下一次
+                self._pending_changes()
+
+            addresses = tuple(read_interface_addresses(self.path))
+            self.reads += 1
+            if current is not None and addresses == current.addresses:
+                generation = current.generation
+            else:
+                generation = current.generation + 1 if current is not None else 1
+            self._snapshot = InterfaceSnapshot(addresses, generation, now)
+            return self._snapshot
+
+    def addresses(self) -> Tuple[InterfaceAddress, ...]:
+        return self.snapshot().addresses
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_default_monitor: Optional[InterfaceMonitor] = None
+_default_lock = threading.Lock()
+
+
+def interface_addresses() -> Tuple[InterfaceAddress, ...]:
+    """进程内共享的缓存快照"""
+    global _default_monitor
+    with _default_lock:
+        if _default_monitor is None:
+            _default_monitor = InterfaceMonitor()
+    return _default_monitor.addresses()
+
+
+def main():
+    """列出接口地址，或持续监视变化"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本机接口的IPv6地址")
+    parser.add_argument("--watch", type=float, metavar="秒", help="每隔指定秒数检查一次，有变化时打印")
+    parser.add_argument("--no-netlink", action="store_true", help="不订阅netlink，按时间间隔刷新")
+    args = parser.parse_args()
+
+    def show(snapshot: InterfaceSnapshot):
+        print(f"[{time.strftime('%H:%M:%S')}] 第 {snapshot.generation} 版，{len(snapshot.addresses)} 个地址")
+        for entry in snapshot.addresses:
+            flags = ','.join(entry.flag_names) or '-'
+            print(f"  {entry.interface:<10} {entry.with_prefix:<45} {entry.scope_name:<8} {flags}")
+
+    with InterfaceMonitor(use_netlink=not args.no_netlink, fallback_interval=args.watch or 0) as monitor:
+        snapshot = monitor.snapshot()
+        show(snapshot)
+        if not args.watch:
+            return
+        mode = "netlink通知" if monitor.event_driven else "定时刷新"
+        print(f"监视中（{mode}），Ctrl+C 退出")
+        try:
+            while True:
+                time.sleep(args.watch)
+                latest = monitor.snapshot()
+                if latest.generation != snapshot.generation:
+                    snapshot = latest
+                    show(snapshot)
+        except KeyboardInterrupt:
+            pass
+        print(f"共读取 {monitor.reads} 次")
+
+
+if __name__ == '__main__':
+    main()
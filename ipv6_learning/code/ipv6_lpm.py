@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+IPv6最长前缀匹配索引
+
+PrefixTrie 是以128位整数为键的路径压缩（Patricia）前缀树，用于批量插入前缀；
+compile() 把它编译成扁平的 LPMTable：每个节点是一条32字节的定长记录，
+可以直接保存到文件，加载时用mmap映射，无需重建，启动几乎不花时间。
+LPMTable 支持单个地址查询，也支持在NumPy数组上按层向量化地批量查询。
+"""
+import json
+import mmap
+import socket
+import struct
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ipv6_columnar import address_columns
+
+ADDRESS_BITS = 128
+NONE = 0xFFFFFFFF  # 没有子节点 / 节点上没有前缀
+
+MAGIC = b'LPM6'
+VERSION = 1
+# 文件头：魔数、版本、节点数、标签数、标签表偏移量，补齐到32字节
+_FILE_HEADER = struct.Struct('<4sHxxIIQ8x')
+# 节点记录：前缀高64位、低64位、左子节点、右子节点、标签编号、前缀长度
+_NODE_STRUCT = struct.Struct('<QQIIIB3x')
+
+NODE_DTYPE = np.dtype([
+    ('hi', '<u8'),
+    ('lo', '<u8'),
+    ('left', '<u4'),
+    ('right', '<u4'),
+    ('value', '<u4'),
+    ('length', 'u1'),
+    ('pad', 'u1', 3),
+])
+
+_MASK64 = (1 << 64) - 1
+_JUMP_BITS = 16  # 批量查询时第一步直接按地址最高16位跳转
+
+Prefix = Union[str, Tuple[int, int]]  # "2001:db8::/32" 或 (整数前缀, 长度)
+
+
+def address_to_int(address: str) -> int:
+    return int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big')
+
+
+def int_to_address(value: int) -> str:
+    return socket.inet_ntop(socket.AF_INET6, value.to_bytes(16, 'big'))
+
+
+def parse_prefix(prefix: Prefix) -> Tuple[int, int]:
+    """把 "地址/长度" 解析为 (整数前缀, 长度)，主机位清零"""
+    if isinstance(prefix, tuple):
+        value, length = prefix
+    else:
+        address, _, length_text = prefix.partition('/')
+        value = address_to_int(address)
+        length = int(length_text) if length_text else ADDRESS_BITS
+    if not 0 <= length <= ADDRESS_BITS:
+        raise ValueError(f"前缀长度必须在0到128之间: {prefix}")
+    return value & _prefix_mask(length), length
+
+
+def _prefix_mask(length: int) -> int:
+    return ((1 << length) - 1) << (ADDRESS_BITS - length)
+
+
+def _bit(value: int, index: int) -> int:
+    """从最高位起第index位"""
+    return (value >> (ADDRESS_BITS - 1 - index)) & 1
+
+
+class _Node:
+    __slots__ = ('prefix', 'length', 'value', 'children')
+
+    def __init__(self, prefix: int, length: int, value: Optional[int] = None):
+        self.prefix = prefix
+        self.length = length
+        self.value = value
+        self.children = [None, None]
+
+
+class PrefixTrie:
+    """
+    可修改的Patricia前缀树，只在分叉处和带前缀的位置有节点
+
+    值统一存成标签表中的编号，相同标签只存一份；重复插入同一前缀会覆盖原来的标签。
+    """
+
+    def __init__(self):
+        self._root = _Node(0, 0)
+        self._labels: List[str] = []
+        self._label_ids = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _label_id(self, label: str) -> int:
+        index = self._label_ids.get(label)
+        if index is None:
+            index = self._label_ids[label] = len(self._labels)
+            self._labels.append(label)
+        return index
+
+    def insert(self, prefix: Prefix, label: str):
+        value, length = parse_prefix(prefix)
+        self._insert(value, length, self._label_id(label))
+
+    def insert_many(self, entries: Iterable[Tuple[Prefix, str]]) -> 'PrefixTrie':
+        for prefix, label in entries:
+            self.insert(prefix, label)
+        return self
+
+    def _insert(self, prefix: int, length: int, value: int):
+        node = self._root
+        while True:
+            if length == node.length:
+                if node.value is None:
+                    self._count += 1
+                node.value = value
+                return
+
+            side = _bit(prefix, node.length)
+            child = node.children[side]
+            if child is None:
+                node.children[side] = _Node(prefix, length, value)
+                self._count += 1
+                return
+
+            # 新前缀与子节点前缀的公共长度
+            diff = prefix ^ child.prefix
+            common = min(length, child.length, ADDRESS_BITS - diff.bit_length())
+            if common == child.length:
+                node = child
+                continue
+
+            self._count += 1
+            if common == length:
+                # 新前缀是子节点的上级：插在两者之间
+                inserted = _Node(prefix, length, value)
+                inserted.children[_bit(child.prefix, length)] = child
+                node.children[side] = inserted
+            else:
+                # 在公共长度处分叉
+                fork = _Node(prefix & _prefix_mask(common), common)
+                fork.children[_bit(child.prefix, common)] = child
+                fork.children[_bit(prefix, common)] = _Node(prefix, length, value)
+                node.children[side] = fork
+            return
+
+    def lookup(self, address: Union[str, int]) -> Optional[str]:
+        """最长匹配的前缀的标签，没有匹配时返回None"""
+        if isinstance(address, str):
+            address = address_to_int(address)
+        node = self._root
+        best = None
+        while node is not None:
+            if (address ^ node.prefix) >> (ADDRESS_BITS - node.length):
+                break
+            if node.value is not None:
+                best = node.value
+            if node.length == ADDRESS_BITS:
+                break
+            node = node.children[_bit(address, node.length)]
+        return None if best is None else self._labels[best]
+
+    def compile(self) -> 'LPMTable':
+        """按先序编号把树编译成扁平表，子树在表中是连续的"""
+        order = []
+        index = {}
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            index[id(node)] = len(order)
+            order.append(node)
+            for child in reversed(node.children):
+                if child is not None:
+                    stack.append(child)
+
+        buffer = bytearray(_FILE_HEADER.size + _NODE_STRUCT.size * len(order))
+        offset = _FILE_HEADER.size
+        for node in order:
+            left, right = node.children
+            _NODE_STRUCT.pack_into(
+                buffer, offset, node.prefix >> 64, node.prefix & _MASK64,
+                NONE if left is None else index[id(left)],
+                NONE if right is None else index[id(right)],
+                NONE if node.value is None else node.value,
+                node.length)
+            offset += _NODE_STRUCT.size
+
+        labels = json.dumps(self._labels, ensure_ascii=False).encode('utf-8')
+        _FILE_HEADER.pack_into(buffer, 0, MAGIC, VERSION, len(order), len(self._labels), len(buffer))
+        buffer += labels
+        return LPMTable(buffer)
+
+
+# 各前缀长度在高、低64位上的掩码，供批量查询按长度取用
+_MASK_HI = np.array([_prefix_mask(n) >> 64 for n in range(ADDRESS_BITS + 1)], dtype=np.uint64)
+_MASK_LO = np.array([_prefix_mask(n) & _MASK64 for n in range(ADDRESS_BITS + 1)], dtype=np.uint64)
+
+
+class LPMTable:
+    """
+    编译后的只读最长前缀匹配表
+
+    底层是一块连续缓冲区（bytes/bytearray，或文件的mmap映射）：32字节的文件头、
+    每个节点32字节的定长记录、最后是JSON编码的标签表。节点数组通过NumPy直接在缓冲区上取视图。
+    """
+
+    def __init__(self, buffer, file=None):
+        self._buffer = buffer
+        self._file = file
+        magic, version, node_count, label_count, labels_offset = _FILE_HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("不是LPM索引文件")
+        if version != VERSION:
+            raise ValueError(f"不支持的LPM索引版本: {version}")
+        if labels_offset != _FILE_HEADER.size + _NODE_STRUCT.size * node_count:
+            raise ValueError("LPM索引文件已损坏")
+        self.node_count = node_count
+        self.labels: List[str] = json.loads(bytes(buffer[labels_offset:]).decode('utf-8'))
+        if len(self.labels) != label_count:
+            raise ValueError("LPM索引标签表已损坏")
+        self.nodes = np.frombuffer(buffer, dtype=NODE_DTYPE, count=node_count,
+                                   offset=_FILE_HEADER.size)
+        self._columns = None
+
+    def __len__(self) -> int:
+        """带前缀的节点数"""
+        return int(np.count_nonzero(self.nodes['value'] != NONE))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buffer)
+
+    def lookup_index(self, address: int) -> int:
+        """单个地址最长匹配的标签编号，没有匹配时返回-1"""
+        buffer = self._buffer
+        unpack = _NODE_STRUCT.unpack_from
+        base = _FILE_HEADER.size
+        size = _NODE_STRUCT.size
+        node = 0
+        best = -1
+        while node != NONE:
+            hi, lo, left, right, value, length = unpack(buffer, base + node * size)
+            if (address ^ ((hi << 64) | lo)) >> (ADDRESS_BITS - length):
+                break
+            if value != NONE:
+                best = value
+            if length == ADDRESS_BITS:
+                break
+            node = right if _bit(address, length) else left
+        return best
+
+    def lookup(self, address: Union[str, int]) -> Optional[str]:
+        """最长匹配的前缀的标签，没有匹配时返回None"""
+        if isinstance(address, str):
+            address = address_to_int(address)
+        index = self.lookup_index(address)
+        return None if index < 0 else self.labels[index]
+
+    def _node_columns(self):
+        """
+        批量查询用的逐节点列，首次使用时从节点数组展开：
+        掩码后的前缀和掩码、下一层要检查的位（所在的64位字和移位量）、
+        按 节点*2+位 排列的子节点表。末尾追加一个哨兵节点，
+        已经退出的地址停在哨兵上，不必每一层都压缩数组
+        """
+        if self._columns is None:
+            nodes = self.nodes
+            count = len(nodes)
+            length = np.append(nodes['length'].astype(np.int64), 0)
+            mask_hi = _MASK_HI[length]
+            mask_lo = _MASK_LO[length]
+            mask_hi[count] = mask_lo[count] = 0
+            prefix_hi = np.append(nodes['hi'], np.uint64(0)) & mask_hi
+            prefix_lo = np.append(nodes['lo'], np.uint64(0)) & mask_lo
+            in_hi = length < 64
+            shift = np.where(in_hi, 63 - length, 127 - length).clip(0, 63).astype(np.uint64)
+            children = np.full(2 * (count + 1), count, dtype=np.int64)
+            for side, column in enumerate(('left', 'right')):
+                child = nodes[column].astype(np.int64)
+                # 长度为128的节点没有下一位可看，视为叶子
+                child[(child == NONE) | (length[:count] == ADDRESS_BITS)] = count
+                children[side:2 * count:2] = child
+            value = np.append(nodes['value'].astype(np.int64), NONE)
+            value[value == NONE] = -1
+            start, label = self._jump_table(length, prefix_hi, children, value, count)
+            self._columns = (prefix_hi, prefix_lo, mask_hi, mask_lo, in_hi, shift, children, value, count,
+                             start, label)
+        return self._columns
+
+    @staticmethod
+    def _jump_table(length, prefix_hi, children, value, sentinel):
+        """
+        按地址最高16位直接跳过树的上层：对每个16位取值，记下向下走到的第一个长度不小于16的节点
+        以及途中已经匹配到的最长前缀标签。长度小于16的节点只看最高16位就能判定，
+        经过这些节点的地址落在一段连续的取值区间内，按区间赋值即可
+        """
+        size = 1 << _JUMP_BITS
+        start = np.full(size, sentinel, dtype=np.int64)
+        label = np.full(size, -1, dtype=np.int64)
+        stack = [(0, 0, size, -1)]
+        while stack:
+            node, low, high, best = stack.pop()
+            bits = int(length[node])
+            if bits >= _JUMP_BITS:
+                start[low:high] = node
+                label[low:high] = best
+                continue
+            # 区间内与节点前缀不一致的取值保持初始的哨兵，只处理一致的子区间
+            width = 1 << (_JUMP_BITS - bits)
+            first = int(prefix_hi[node] >> np.uint64(64 - _JUMP_BITS))
+            low, high = max(low, first), min(high, first + width)
+            if low >= high:
+                continue
+            if value[node] >= 0:
+                best = int(value[node])
+            label[low:high] = best
+            middle = first + width // 2
+            for side, (a, b) in enumerate(((first, middle), (middle, first + width))):
+                child = int(children[2 * node + side])
+                if child != sentinel:
+                    stack.append((child, max(low, a), min(high, b), best))
+        return start, label
+
+    def lookup_columns(self, hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+        """
+        批量查询，hi、lo为地址的高、低64位（uint64数组）
+        返回每个地址的标签编号（int64），没有匹配为-1。
+        所有地址同时从根节点出发，每轮向下走一层，循环次数等于树的深度而不是地址数；
+        第一步按最高16位查跳转表越过树的上层；
+        不再匹配或走到叶子的地址转到哨兵节点，存活的不到一半时才压缩数组
+        """
+        hi = np.asarray(hi, dtype=np.uint64)
+        lo = np.asarray(lo, dtype=np.uint64)
+        if not len(hi) or not self.node_count:
+            return np.full(len(hi), -1, dtype=np.int64)
+        (prefix_hi, prefix_lo, mask_hi, mask_lo, in_hi, shift, children, value, sentinel,
+         start, label) = self._node_columns()
+
+        top = (hi >> np.uint64(64 - _JUMP_BITS)).astype(np.intp)
+        result = label[top]
+        node = start[top]
+        live = node != sentinel
+        position = np.flatnonzero(live)
+        hi, lo, node = hi[live], lo[live], node[live]
+        alive = len(node)
+        while alive:
+            match = ((hi & mask_hi[node]) == prefix_hi[node]) & ((lo & mask_lo[node]) == prefix_lo[node])
+            node[~match] = sentinel
+            values = value[node]
+            found = values >= 0
+            result[position[found]] = values[found]
+
+            # 下一层按前缀之后的第一位选择子节点
+            word = np.where(in_hi[node], hi, lo)
+            bit = ((word >> shift[node]) & np.uint64(1)).astype(np.int64)
+            node = children[2 * node + bit]
+
+            live = node != sentinel
+            alive = int(np.count_nonzero(live))
+            if alive * 2 < len(node):
+                hi, lo, position, node = hi[live], lo[live], position[live], node[live]
+        return result
+
+    def lookup_many(self, addresses: Iterable[str]) -> List[Optional[str]]:
+        """批量查询地址字符串，返回各自的标签"""
+        labels = self.labels
+        return [None if i < 0 else labels[i]
+                for i in self.lookup_columns(*address_columns(addresses)).tolist()]
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self._buffer)
+
+    @classmethod
+    def load(cls, path: str) -> 'LPMTable':
+        """以只读mmap方式加载，节点数组直接引用映射内存"""
+        f = open(path, 'rb')
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            f.close()
+            raise
+        try:
+            return cls(mapped, f)
+        except BaseException:
+            mapped.close()
+            f.close()
+            raise
+
+    def close(self):
+        """关闭映射；仍有NumPy视图引用映射内存时，映射交给垃圾回收释放"""
+        self.nodes = None
+        self._columns = None
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                pass
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_prefixes(path: str) -> Iterable[Tuple[str, str]]:
+    """读取前缀列表，每行 "前缀 标签"，#开头为注释；没有标签时以前缀本身为标签"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.split(None, 1)
+            if not fields or fields[0].startswith('#'):
+                continue
+            yield fields[0], fields[1].strip() if len(fields) > 1 else fields[0]
+
+
+def main():
+    """编译前缀列表，或用编译好的索引对地址分类"""
+    import argparse
+    import time
+    from collections import Counter
+
+    parser = argparse.ArgumentParser(description="IPv6最长前缀匹配索引")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="把前缀列表编译成索引文件")
+    build.add_argument("prefixes", help="前缀列表，每行 \"前缀 标签\"")
+    build.add_argument("output", help="索引文件路径")
+    classify = commands.add_parser("classify", help="对地址列表分类")
+    classify.add_argument("index", help="索引文件路径")
+    classify.add_argument("addresses", help="每行一个地址的文件")
+    classify.add_argument("--summary", action="store_true", help="只输出各标签的地址数")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        trie = PrefixTrie().insert_many(load_prefixes(args.prefixes))
+        table = trie.compile()
+        table.save(args.output)
+        print(f"{len(trie)} 个前缀，{table.node_count} 个节点，{table.nbytes / 1024:.1f} KiB，"
+              f"用时 {time.perf_counter() - start:.2f} 秒")
+        return
+
+    with LPMTable.load(args.index) as table, open(args.addresses, encoding='utf-8') as f:
+        addresses = [line.strip() for line in f if line.strip()]
+        start = time.perf_counter()
+        labels = table.lookup_many(addresses)
+        elapsed = time.perf_counter() - start
+        if args.summary:
+            for label, count in Counter(labels).most_common():
+                print(f"{count:>10}  {label if label is not None else '(无匹配)'}")
+        else:
+            for address, label in zip(addresses, labels):
+                print(f"{address}\t{label if label is not None else '-'}")
+        print(f"\n{len(addresses)} 个地址，用时 {elapsed:.3f} 秒"
+              f"（{len(addresses) / max(elapsed, 1e-9):.0f} 个/秒）")
+
+
+if __name__ == '__main__':
+    main()
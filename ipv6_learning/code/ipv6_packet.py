@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+IPv6报文解析
+
+在 memoryview 上解析40字节的IPv6基本头部，沿"下一个头部"字段遍历扩展头部链
+（逐跳选项、路由、分片、目的选项、认证头部），直到上层协议负载。
+地址、扩展头部和负载都是原始缓冲区上的视图，不复制数据。
+IPv6CaptureReader 批量解析整个抓包文件，UDP负载可以直接交给 DNSParser。
+"""
+import socket
+import struct
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from dns_parser import DNSMessage, DNSParser
+from pcap_reader import MALFORMED_ERRORS, CaptureFile, CaptureShard, network_offset
+
+# 下一个头部的取值
+NEXT_HEADER_HOP_BY_HOP = 0
+NEXT_HEADER_TCP = 6
+NEXT_HEADER_UDP = 17
+NEXT_HEADER_ROUTING = 43
+NEXT_HEADER_FRAGMENT = 44
+NEXT_HEADER_ESP = 50
+NEXT_HEADER_AH = 51
+NEXT_HEADER_ICMPV6 = 58
+NEXT_HEADER_NONE = 59
+NEXT_HEADER_DESTINATION_OPTIONS = 60
+
+NEXT_HEADER_NAMES = {
+    NEXT_HEADER_HOP_BY_HOP: 'Hop-by-Hop',
+    NEXT_HEADER_TCP: 'TCP',
+    NEXT_HEADER_UDP: 'UDP',
+    NEXT_HEADER_ROUTING: 'Routing',
+    NEXT_HEADER_FRAGMENT: 'Fragment',
+    NEXT_HEADER_ESP: 'ESP',
+    NEXT_HEADER_AH: 'AH',
+    NEXT_HEADER_ICMPV6: 'ICMPv6',
+    NEXT_HEADER_NONE: 'No Next Header',
+    NEXT_HEADER_DESTINATION_OPTIONS: 'Destination Options',
+}
+
+# 长度字段以8字节为单位（不含前8字节）的扩展头部
+_OPTION_HEADERS = (NEXT_HEADER_HOP_BY_HOP, NEXT_HEADER_ROUTING, NEXT_HEADER_DESTINATION_OPTIONS)
+
+IPV6_HEADER_LENGTH = 40
+FRAGMENT_HEADER_LENGTH = 8
+# 扩展头部个数上限，防止构造的报文让遍历做无用功
+MAX_EXTENSION_HEADERS = 16
+
+_FIXED_STRUCT = struct.Struct('!IHBB')       # 版本/流量类别/流标签、负载长度、下一个头部、跳数限制
+_FRAGMENT_STRUCT = struct.Struct('!BxHI')    # 下一个头部、保留、偏移量/标志、标识
+_UDP_STRUCT = struct.Struct('!HHHH')
+
+
+@dataclass
+class IPv6Header:
+    """IPv6基本头部，src、dst是原始缓冲区上的16字节视图"""
+    __slots__ = ('traffic_class', 'flow_label', 'payload_length', 'next_header', 'hop_limit', 'src', 'dst')
+    traffic_class: int
+    flow_label: int
+    payload_length: int
+    next_header: int
+    hop_limit: int
+    src: memoryview
+    dst: memoryview
+
+    @property
+    def dscp(self) -> int:
+        return self.traffic_class >> 2
+
+    @property
+    def ecn(self) -> int:
+        return self.traffic_class & 0x03
+
+    @property
+    def src_address(self) -> str:
+        return socket.inet_ntop(socket.AF_INET6, self.src)
+
+    @property
+    def dst_address(self) -> str:
+        return socket.inet_ntop(socket.AF_INET6, self.dst)
+
+
+@dataclass
+class ExtensionHeader:
+    """一个扩展头部，data是包括前两个字节在内的整个头部"""
+    __slots__ = ('type_', 'next_header', 'data')
+    type_: int
+    next_header: int
+    data: memoryview
+
+    @property
+    def name(self) -> str:
+        return NEXT_HEADER_NAMES.get(self.type_, str(self.type_))
+
+    @property
+    def routing_type(self) -> Optional[int]:
+        return self.data[2] if self.type_ == NEXT_HEADER_ROUTING else None
+
+    @property
+    def segments_left(self) -> Optional[int]:
+        return self.data[3] if self.type_ == NEXT_HEADER_ROUTING else None
+
+
+@dataclass
+class FragmentInfo:
+    """分片头部的内容，offset以字节为单位"""
+    __slots__ = ('next_header', 'offset', 'more', 'identification')
+    next_header: int
+    offset: int
+    more: bool
+    identification: int
+
+
+@dataclass
+class IPv6Packet:
+    """
+    解析后的IPv6报文
+
+    protocol 是扩展头部链之后的上层协议号，payload 是上层协议的数据
+    （受负载长度字段限制，不含链路层填充）。
+    非首片分片的 payload 只是分片数据，需要重组后才能按上层协议解析。
+    """
+    __slots__ = ('header', 'extensions', 'protocol', 'payload', 'fragment')
+    header: IPv6Header
+    extensions: List[ExtensionHeader]
+    protocol: int
+    payload: memoryview
+    fragment: Optional[FragmentInfo]
+
+    @property
+    def is_fragment(self) -> bool:
+        """是否是分片（包括只有一片的原子分片）"""
+        return self.fragment is not None
+
+    @property
+    def needs_reassembly(self) -> bool:
+        """是否是多片中的一片（原子分片本身就是完整的报文）"""
+        fragment = self.fragment
+        return fragment is not None and (fragment.offset != 0 or fragment.more)
+
+    @property
+    def has_upper_layer_header(self) -> bool:
+        """payload 是否以上层协议头部开头"""
+        return self.fragment is None or self.fragment.offset == 0
+
+    def udp(self) -> Optional[Tuple[int, int, memoryview]]:
+        """UDP报文返回 (源端口, 目的端口, 负载视图)，其他情况返回None"""
+        if self.protocol != NEXT_HEADER_UDP or not self.has_upper_layer_header:
+            return None
+        payload = self.payload
+        if len(payload) < 8:
+            return None
+        sport, dport, length, _ = _UDP_STRUCT.unpack_from(payload, 0)
+        # 分片报文的首片里只有UDP负载的开头
+        end = len(payload) if self.fragment is not None else min(max(length, 8), len(payload))
+        return sport, dport, payload[8:end]
+
+
+def parse_ipv6(data) -> IPv6Packet:
+    """
+    解析一个IPv6报文（从IPv6头部开始），所有视图都指向data本身
+    头部不完整、版本号不是6或扩展头部越界时抛出ValueError；
+    扩展头部完整但上层数据被截断时照常返回，payload 只包含实际抓到的部分
+    """
+    view = memoryview(data)
+    size = len(view)
+    if size < IPV6_HEADER_LENGTH:
+        raise ValueError(f"IPv6头部不完整: {size} 字节")
+    first_word, payload_length, next_header, hop_limit = _FIXED_STRUCT.unpack_from(view, 0)
+    if first_word >> 28 != 6:
+        raise ValueError(f"不是IPv6报文: 版本号 {first_word >> 28}")
+    header = IPv6Header((first_word >> 20) & 0xFF, first_word & 0xFFFFF, payload_length,
+                        next_header, hop_limit, view[8:24], view[24:40])
+
+    # 抓包长度限制可能截掉报文尾部，负载取到缓冲区末尾为止；
+    # 负载长度为0且带逐跳选项时是超大报文（RFC 2675），负载同样延伸到缓冲区末尾
+    if payload_length == 0 and next_header == NEXT_HEADER_HOP_BY_HOP:
+        end = size
+    else:
+        end = min(IPV6_HEADER_LENGTH + payload_length, size)
+
+    extensions: List[ExtensionHeader] = []
+    fragment = None
+    offset = IPV6_HEADER_LENGTH
+    while True:
+        if next_header in _OPTION_HEADERS:
+            if offset + 2 > end:
+                raise ValueError(f"扩展头部 {next_header} 不完整")
+            length = (view[offset + 1] + 1) * 8
+        elif next_header == NEXT_HEADER_FRAGMENT:
+            length = FRAGMENT_HEADER_LENGTH
+        elif next_header == NEXT_HEADER_AH:
+            if offset + 2 > end:
+                raise ValueError("认证头部不完整")
+            length = (view[offset + 1] + 2) * 4
+        else:
+            break
+        if offset + length > end:
+            raise ValueError(f"扩展头部 {next_header} 超出报文: 偏移 {offset} 长度 {length}")
+        if len(extensions) >= MAX_EXTENSION_HEADERS:
+            raise ValueError(f"扩展头部超过 {MAX_EXTENSION_HEADERS} 个")
+        extension = ExtensionHeader(next_header, view[offset], view[offset:offset + length])
+        extensions.append(extension)
+        offset += length
+        next_header = extension.next_header
+        if extension.type_ == NEXT_HEADER_FRAGMENT:
+            _, offset_flags, identification = _FRAGMENT_STRUCT.unpack_from(extension.data, 0)
+            fragment = FragmentInfo(next_header, offset_flags & 0xFFF8, bool(offset_flags & 1), identification)
+            if fragment.offset:
+                # 非首片：后面是分片数据，不再有扩展头部
+                break
+
+    return IPv6Packet(header, extensions, next_header, view[offset:end], fragment)
+
+
+@dataclass
+class PacketStats:
+    """批量解析的计数"""
+    frames: int = 0                  # 遍历到的链路层帧
+    packets: int = 0                 # 成功解析的IPv6报文
+    malformed: int = 0               # 版本号为6但解析失败的报文
+    skipped: int = 0                 # 非IPv6的帧
+    fragments: int = 0               # 带分片头部的报文
+    dns_packets: int = 0             # 交给DNS解析器且成功的报文
+    dns_malformed: int = 0           # DNS解析失败的报文
+    protocols: Counter = field(default_factory=Counter)  # 按上层协议计数
+
+
+class IPv6CaptureReader:
+    """
+    批量解析抓包文件中的IPv6报文
+
+    帧来自 pcap_reader.CaptureFile 的mmap，解析结果中的视图都指向映射内存，
+    需要在关闭文件前用完或复制出来。
+    """
+
+    def __init__(self, path: str, ports: Tuple[int, ...] = (53,), zero_copy: bool = False):
+        self.capture = CaptureFile(path)
+        self.ports = frozenset(ports)
+        self.zero_copy = zero_copy
+        self.stats = PacketStats()
+
+    def packets(self, shard: Optional[CaptureShard] = None) -> Iterator[Tuple[float, IPv6Packet]]:
+        """产生 (时间戳, IPv6Packet)，非IPv6帧和格式错误的报文计数后跳过"""
+        stats = self.stats
+        protocols = stats.protocols
+        for ts, linktype, frame in self.capture.frames(shard):
+            stats.frames += 1
+            offset = network_offset(linktype, frame)
+            if offset is None or frame[offset] >> 4 != 6:
+                stats.skipped += 1
+                continue
+            try:
+                packet = parse_ipv6(frame[offset:])
+            except MALFORMED_ERRORS:
+                stats.malformed += 1
+                continue
+            stats.packets += 1
+            protocols[packet.protocol] += 1
+            if packet.fragment is not None:
+                stats.fragments += 1
+            yield ts, packet
+
+    def dns_messages(self, shard: Optional[CaptureShard] = None, reassembler=None
+                     ) -> Iterator[Tuple[float, IPv6Packet, DNSMessage]]:
+        """
+        产生端口匹配的UDP报文解析出的 (时间戳, IPv6Packet, DNSMessage)
+        给出 reassembler（如 ipv6_reassembly.FragmentReassembler）时先重组分片
+        """
+        packets = self.packets(shard)
+        if reassembler is not None:
+            packets = reassembler.reassemble(packets)
+        return dns_messages(packets, self.ports, self.stats, self.zero_copy)
+
+    def close(self):
+        self.capture.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def dns_messages(packets: Iterable[Tuple[float, IPv6Packet]], ports: Iterable[int] = (53,),
+                 stats: Optional[PacketStats] = None, zero_copy: bool = False
+                 ) -> Iterator[Tuple[float, IPv6Packet, DNSMessage]]:
+    """
+    把端口匹配的UDP负载交给DNSParser，只解析头部，其余部分按需解码；
+    需要重组的分片跳过。默认把负载复制成bytes，得到的DNSMessage不依赖原始缓冲区；
+    zero_copy=True时直接在负载视图上解析
+    """
+    ports = frozenset(ports)
+    stats = stats if stats is not None else PacketStats()
+    for ts, packet in packets:
+        if packet.needs_reassembly:
+            continue
+        datagram = packet.udp()
+        if datagram is None:
+            continue
+        sport, dport, payload = datagram
+        if sport not in ports and dport not in ports:
+            continue
+        try:
+            data = payload if zero_copy else payload.tobytes()
+            message = DNSParser(data, zero_copy=zero_copy).parse_message()
+        except MALFORMED_ERRORS:
+            stats.dns_malformed += 1
+            continue
+        stats.dns_packets += 1
+        yield ts, packet, message
+
+
+def main():
+    """统计抓包文件中IPv6报文的扩展头部和上层协议"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="解析抓包文件中的IPv6报文")
+    parser.add_argument("capture", help="抓包文件路径")
+    parser.add_argument("--port", type=int, action="append", help="DNS端口，可重复指定（默认53）")
+    parser.add_argument("--show", type=int, default=10, help="显示前N个报文（默认10）")
+    parser.add_argument("--dns", action="store_true", help="同时解析DNS报文")
+    args = parser.parse_args()
+
+    chains = Counter()
+    with IPv6CaptureReader(args.capture, ports=tuple(args.port or (53,))) as reader:
+        def observed():
+            for ts, packet in reader.packets():
+                chain = ' -> '.join(extension.name for extension in packet.extensions)
+                chains[chain or '(无)'] += 1
+                if reader.stats.packets <= args.show:
+                    header = packet.header
+                    protocol = NEXT_HEADER_NAMES.get(packet.protocol, str(packet.protocol))
+                    print(f"{ts:.6f} {header.src_address} -> {header.dst_address} "
+                          f"流标签=0x{header.flow_label:05x} 流量类别=0x{header.traffic_class:02x} "
+                          f"扩展头部=[{chain}] {protocol} {len(packet.payload)}字节")
+                yield ts, packet
+
+        stream = observed()
+        if args.dns:
+            stream = dns_messages(stream, reader.ports, reader.stats)
+        for _ in stream:
+            pass
+
+        stats = reader.stats
+        print(f"\n帧总数: {stats.frames}")
+        print(f"IPv6报文: {stats.packets}（分片 {stats.fragments}）")
+        print(f"格式错误: {stats.malformed}")
+        print(f"非IPv6: {stats.skipped}")
+        print("上层协议:")
+        for protocol, count in stats.protocols.most_common():
+            print(f"  {NEXT_HEADER_NAMES.get(protocol, str(protocol)):<20}{count}")
+        print("扩展头部链:")
+        for chain, count in chains.most_common():
+            print(f"  {chain:<40}{count}")
+        if args.dns:
+            print(f"DNS报文: {stats.dns_packets}（格式错误 {stats.dns_malformed}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+并发的Happy Eyeballs连通性探测
+
+对大量 主机:端口 同时发起TCP连接探测，并发数有上限；每个目标按 RFC 8305 让IPv6和IPv4赛跑：
+解析出的地址按地址族交替排列（IPv6在前），每隔一个连接尝试延迟（默认250毫秒）
+或上一次尝试失败后就启动下一次尝试，最先建立的连接获胜，其余的取消。
+每个目标的连接时延记入直方图，可以多轮探测，结果导出为JSON。
+"""
+import asyncio
+import bisect
+import errno
+import socket
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 连接尝试延迟（RFC 8305 第5节建议250毫秒）
+CONNECTION_ATTEMPT_DELAY = 0.25
+
+# 时延直方图各桶的上界（毫秒），最后一个桶收纳更大的值
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+FAMILY_NAMES = {socket.AF_INET6: "IPv6", socket.AF_INET: "IPv4"}
+
+Target = Tuple[str, int]
+AddrInfo = Tuple[int, int, int, str, tuple]
+
+
+class LatencyHistogram:
+    """固定分桶的时延直方图，可合并；分位数按桶上界近似"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """落入第fraction分位的桶的上界，最后一个桶返回实际最大值"""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(LATENCY_BUCKETS_MS[i], self.max) if i < len(LATENCY_BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        def rounded(value):
+            return None if value is None else round(value, 3)
+
+        return {
+            "count": self.count,
+            "mean_ms": rounded(self.total / self.count) if self.count else None,
+            "min_ms": rounded(self.min),
+            "p50_ms": rounded(self.quantile(0.5)),
+            "p99_ms": rounded(self.quantile(0.99)),
+            "max_ms": rounded(self.max),
+            "buckets_ms": list(LATENCY_BUCKETS_MS) + ["inf"],
+            "counts": list(self.counts)
+        }
+
+
+@dataclass
+class ProbeResult:
+    """一次探测的结果"""
+    host: str
+    port: int
+    ok: bool
+    connect_ms: Optional[float] = None   # 从第一次连接尝试到连接建立
+    resolve_ms: Optional[float] = None
+    family: Optional[int] = None         # 获胜连接的地址族
+    address: Optional[str] = None
+    attempts: int = 0                    # 启动的连接尝试数
+    error: Optional[str] = None
+
+
+@dataclass
+class TargetStats:
+    """一个目标多轮探测的汇总"""
+    host: str
+    port: int
+    successes: int = 0
+    failures: Counter = field(default_factory=Counter)   # 错误描述 -> 次数
+    winners: Counter = field(default_factory=Counter)    # 获胜的地址族名称 -> 次数
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    by_family: Dict[str, LatencyHistogram] = field(default_factory=dict)  # 按获胜地址族分开的时延
+    addresses: set = field(default_factory=set)
+
+    def add(self, result: ProbeResult):
+        if result.ok:
+            family = FAMILY_NAMES.get(result.family, str(result.family))
+            self.successes += 1
+            self.winners[family] += 1
+            self.latency.add(result.connect_ms)
+            self.by_family.setdefault(family, LatencyHistogram()).add(result.connect_ms)
+            self.addresses.add(result.address)
+        else:
+            self.failures[result.error] += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "host": self.host,
+            "port": self.port,
+            "attempts": self.successes + sum(self.failures.values()),
+            "successes": self.successes,
+            "failures": dict(self.failures),
+            "winners": dict(self.winners),
+            "addresses": sorted(self.addresses),
+            "latency": self.latency.to_dict()
+        }
+
+
+def interleave_families(infos: List[AddrInfo]) -> List[AddrInfo]:
+    """RFC 8305 第4节：按地址族交替排列，第一个地址族（通常是IPv6）优先"""
+    by_family: Dict[int, List[AddrInfo]] = {}
+    for info in infos:
+        by_family.setdefault(info[0], []).append(info)
+    queues = sorted(by_family.values(), key=lambda q: q[0][0] != socket.AF_INET6)
+    ordered = []
+    while any(queues):
+        for queue in queues:
+            if queue:
+                ordered.append(queue.pop(0))
+    return ordered
+
+
+def parse_target(text: str, default_port: int) -> Target:
+    """解析 主机、主机:端口、[IPv6地址]:端口 或不带方括号的IPv6地址"""
+    text = text.strip()
+    if text.startswith('['):
+        host, _, rest = text[1:].partition(']')
+        return host, int(rest[1:]) if rest.startswith(':') else default_port
+    if text.count(':') == 1:
+        host, port = text.split(':')
+        return host, int(port)
+    return text, default_port
+
+
+class ConnectivityProber:
+    """
+    有并发上限的TCP连通性探测器
+
+    每个目标先异步解析，再按Happy Eyeballs方式在各地址间赛跑；
+    整个探测（含解析）超过timeout秒算失败。
+    """
+
+    def __init__(self, concurrency: int = 256, timeout: float = 3.0,
+                 attempt_delay: float = CONNECTION_ATTEMPT_DELAY,
+                 family: int = socket.AF_UNSPEC):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.attempt_delay = attempt_delay
+        self.family = family
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _attempt(self, info: AddrInfo) -> Tuple[socket.socket, AddrInfo]:
+        family, type_, proto, _, address = info
+        sock = socket.socket(family, type_, proto)
+        try:
+            sock.setblocking(False)
+            await asyncio.get_running_loop().sock_connect(sock, address)
+        except BaseException:
+            sock.close()
+            raise
+        return sock, info
+
+    async def _race(self, infos: List[AddrInfo]) -> Tuple[socket.socket, AddrInfo, int]:
+        """依次错开启动连接尝试，返回 (获胜的套接字, 地址信息, 启动的尝试数)"""
+        pending = set()
+        errors = []
+        started = 0
+        try:
+            while True:
+                if started < len(infos):
+                    pending.add(asyncio.ensure_future(self._attempt(infos[started])))
+                    started += 1
+                if not pending:
+                    raise errors[-1] if errors else OSError("没有可用的地址")
+
+                # 还有未启动的地址时最多等一个尝试延迟；有尝试失败也立即启动下一个
+                delay = self.attempt_delay if started < len(infos) else None
+                done, pending = await asyncio.wait(pending, timeout=delay,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        task.result()[0].close()
+                if winner is not None:
+                    return winner[0], winner[1], started
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+                # 取消前刚好连上的尝试也要关闭
+                for task in pending:
+                    if not task.cancelled() and task.exception() is None:
+                        task.result()[0].close()
+
+    async def probe(self, host: str, port: int) -> ProbeResult:
+        """探测一个目标，结果中不抛出异常"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        result = ProbeResult(host, port, ok=False)
+        loop = asyncio.get_running_loop()
+
+        async def run():
+            start = time.perf_counter()
+            infos = await loop.getaddrinfo(host, port, family=self.family, type=socket.SOCK_STREAM)
+            resolved = time.perf_counter()
+            result.resolve_ms = (resolved - start) * 1000
+            sock, info, result.attempts = await self._race(interleave_families(infos))
+            result.connect_ms = (time.perf_counter() - resolved) * 1000
+            sock.close()
+            result.family = info[0]
+            result.address = info[4][0]
+            result.ok = True
+
+        async with self._semaphore:
+            try:
+                await asyncio.wait_for(run(), self.timeout)
+            except asyncio.TimeoutError:
+                result.error = "超时"
+            except socket.gaierror as exc:
+                result.error = f"解析失败: {exc.strerror}"
+            except OSError as exc:
+                # 按错误码汇总（如ECONNREFUSED），不带具体地址
+                result.error = errno.errorcode.get(exc.errno, str(exc)) if exc.errno else str(exc)
+        return result
+
+    async def probe_all(self, targets: Iterable[Target], rounds: int = 1,
+                        interval: float = 0.0) -> Dict[Target, TargetStats]:
+        """对全部目标探测rounds轮，每轮之间间隔interval秒"""
+        targets = list(dict.fromkeys(targets))
+        stats = {target: TargetStats(*target) for target in targets}
+        for round_ in range(rounds):
+            if round_ and interval:
+                await asyncio.sleep(interval)
+            for result in await asyncio.gather(*(self.probe(host, port) for host, port in targets)):
+                stats[(result.host, result.port)].add(result)
+        return stats
+
+
+def summarize(stats: Dict[Target, TargetStats]) -> Dict:
+    """可序列化的报告：每个目标的汇总，以及按获胜地址族合并的时延直方图"""
+    by_family: Dict[str, LatencyHistogram] = {}
+    overall = LatencyHistogram()
+    for target in stats.values():
+        overall.merge(target.latency)
+        for family, histogram in target.by_family.items():
+            by_family.setdefault(family, LatencyHistogram()).merge(histogram)
+    return {
+        "targets": [target.to_dict() for target in stats.values()],
+        "reachable": sum(1 for target in stats.values() if target.successes),
+        "unreachable": sum(1 for target in stats.values() if not target.successes),
+        "latency": overall.to_dict(),
+        "latency_by_family": {family: h.to_dict() for family, h in sorted(by_family.items())}
+    }
+
+
+def main():
+    """并发探测目标列表并输出汇总"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="并发的Happy Eyeballs TCP连通性探测")
+    parser.add_argument("targets", nargs="*", help="主机、主机:端口 或 [IPv6地址]:端口")
+    parser.add_argument("--file", help="目标列表文件，每行一个目标")
+    parser.add_argument("--port", type=int, default=443, help="目标未写端口时使用的端口（默认443）")
+    parser.add_argument("--concurrency", type=int, default=256, help="同时进行的探测数上限")
+    parser.add_argument("--timeout", type=float, default=3.0, help="单次探测的超时秒数（含解析）")
+    parser.add_argument("--delay", type=float, default=CONNECTION_ATTEMPT_DELAY,
+                        help="连接尝试延迟秒数（默认0.25）")
+    parser.add_argument("--family", choices=("any", "6", "4"), default="any", help="只使用某个地址族")
+    parser.add_argument("--rounds", type=int, default=1, help="探测轮数")
+    parser.add_argument("--interval", type=float, default=0.0, help="两轮之间的间隔秒数")
+    parser.add_argument("--json", help="把报告写入JSON文件")
+    args = parser.parse_args()
+
+    lines = list(args.targets)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            lines.extend(line for line in f if line.strip() and not line.startswith('#'))
+    if not lines:
+        parser.error("没有指定探测目标")
+    targets = [parse_target(line, args.port) for line in lines]
+
+    family = {"any": socket.AF_UNSPEC, "6": socket.AF_INET6, "4": socket.AF_INET}[args.family]
+    prober = ConnectivityProber(concurrency=args.concurrency, timeout=args.timeout,
+                                attempt_delay=args.delay, family=family)
+    start = time.perf_counter()
+    stats = asyncio.run(prober.probe_all(targets, rounds=args.rounds, interval=args.interval))
+    elapsed = time.perf_counter() - start
+    report = summarize(stats)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for target in report["targets"]:
+        latency = target["latency"]
+        name = f"[{target['host']}]:{target['port']}" if ':' in target['host'] else \
+            f"{target['host']}:{target['port']}"
+        if target["successes"]:
+            winners = ' '.join(f"{family}×{n}" for family, n in target["winners"].items())
+            print(f"{name:<40} 成功 {target['successes']}/{target['attempts']}  {winners}  "
+                  f"p50 {latency['p50_ms']}ms  最大 {latency['max_ms']}ms")
+        else:
+            print(f"{name:<40} 失败 {dict(target['failures'])}")
+    print(f"\n{len(targets)} 个目标，可达 {report['reachable']}，不可达 {report['unreachable']}，"
+          f"用时 {elapsed:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+IPv6分片重组
+
+按 (源地址, 目的地址, 分片标识) 归并分片，用RFC 815的空洞描述符记录还缺哪些字节。
+重组完成后拼回一个不带分片头部的完整报文，再用 parse_ipv6 解析，可以直接交给DNS解析。
+
+内存和时间都有上限，参数与Linux的 ip6frag_* 设置对应：
+- 单个报文的分片数和总长度受限，超出的报文整体丢弃
+- 所有未完成报文占用的内存超过高水位时，从最早的开始淘汰，直到降到低水位
+- 超过超时时间（按抓包时间戳计算）仍未收齐的报文被丢弃
+分片重叠按RFC 5722处理：丢弃整个报文，超时之前同一报文的后续分片也一并丢弃；
+内容相同的重复分片只计数。
+"""
+import struct
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ipv6_packet import (IPV6_HEADER_LENGTH, NEXT_HEADER_FRAGMENT, NEXT_HEADER_HOP_BY_HOP, NEXT_HEADER_UDP,
+                         IPv6Packet, parse_ipv6)
+
+DEFAULT_TIMEOUT = 60.0                 # net.ipv6.ip6frag_time
+DEFAULT_HIGH_THRESHOLD = 4 * 1024 * 1024  # net.ipv6.ip6frag_high_thresh
+DEFAULT_LOW_THRESHOLD = 3 * 1024 * 1024   # net.ipv6.ip6frag_low_thresh
+DEFAULT_MAX_FRAGMENTS = 64
+MAX_PAYLOAD_LENGTH = 65535
+# 每个未完成报文除数据缓冲区外按固定开销计入内存，丢弃状态的报文也占这么多
+ENTRY_OVERHEAD = 256
+
+_OPEN = MAX_PAYLOAD_LENGTH + 1  # 最后一片到达之前，末尾空洞延伸到这里
+
+ReassemblyKey = Tuple[bytes, bytes, int]
+
+
+@dataclass
+class ReassemblyStats:
+    """重组过程中的计数"""
+    fragments: int = 0      # 收到的分片
+    reassembled: int = 0    # 重组完成的报文
+    duplicates: int = 0     # 内容相同的重复分片
+    overlaps: int = 0       # 因分片重叠或前后矛盾丢弃的报文
+    oversized: int = 0      # 因分片过多或超过最大长度丢弃的报文
+    malformed: int = 0      # 长度不是8的倍数、首片缺少上层头部等不合规的分片
+    timeouts: int = 0       # 超时丢弃的报文
+    evicted: int = 0        # 因内存超限淘汰的报文
+    memory: int = 0         # 当前占用的内存
+    peak_memory: int = 0
+
+
+class _Datagram:
+    """一个正在重组的报文"""
+    __slots__ = ('created', 'data', 'holes', 'total', 'header', 'fragments', 'failed')
+
+    def __init__(self, created: float):
+        self.created = created
+        self.data = bytearray()
+        # 空洞描述符 [起, 止)，按偏移量排序
+        self.holes: List[List[int]] = [[0, _OPEN]]
+        self.total: Optional[int] = None
+        self.header: Optional[bytearray] = None  # 首片中分片头部之前的部分，下一个头部已改写
+        self.fragments = 0
+        self.failed = False
+
+    @property
+    def memory(self) -> int:
+        return ENTRY_OVERHEAD + len(self.data) + (len(self.header) if self.header else 0)
+
+
+class FragmentReassembler:
+    """
+    IPv6分片重组器
+
+    reassemble() 接收 (时间戳, IPv6Packet) 流：不需要重组的报文原样产出，
+    分片被吸收，收齐后产出重组好的报文（视图指向新分配的缓冲区，与抓包文件无关）。
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, high_threshold: int = DEFAULT_HIGH_THRESHOLD,
+                 low_threshold: int = DEFAULT_LOW_THRESHOLD, max_fragments: int = DEFAULT_MAX_FRAGMENTS,
+                 stats: Optional[ReassemblyStats] = None):
+        if low_threshold > high_threshold:
+            raise ValueError("低水位不能高于高水位")
+        self.timeout = timeout
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.max_fragments = max_fragments
+        self.stats = stats or ReassemblyStats()
+        # 按创建时间排序，超时和淘汰都从头部开始
+        self._pending: 'OrderedDict[ReassemblyKey, _Datagram]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def reassemble(self, packets: Iterable[Tuple[float, IPv6Packet]]) -> Iterator[Tuple[float, IPv6Packet]]:
+        for ts, packet in packets:
+            if not packet.needs_reassembly:
+                yield ts, packet
+                continue
+            complete = self.add(packet, ts)
+            if complete is not None:
+                yield ts, complete
+
+    def add(self, packet: IPv6Packet, now: float) -> Optional[IPv6Packet]:
+        """加入一个分片，报文收齐时返回重组后的 IPv6Packet"""
+        stats = self.stats
+        stats.fragments += 1
+        self.expire(now)
+
+        fragment = packet.fragment
+        header = packet.header
+        key = (header.src.tobytes(), header.dst.tobytes(), fragment.identification)
+        datagram = self._pending.get(key)
+        if datagram is None:
+            datagram = self._pending[key] = _Datagram(now)
+            self._account(datagram.memory)
+            # 大量不同标识的分片（包括随后就被判为不合规的）本身就会占满内存，新建时立即检查
+            self._limit_memory(keep=key)
+        if datagram.failed:
+            return None
+
+        start = fragment.offset
+        payload = packet.payload
+        end = start + len(payload)
+        if fragment.more and len(payload) % 8:
+            # 除最后一片外，分片长度必须是8的倍数（RFC 8200）
+            return self._fail(key, datagram, 'malformed')
+        if not payload and fragment.more:
+            return self._fail(key, datagram, 'malformed')
+        if start == 0 and fragment.next_header == NEXT_HEADER_UDP and len(payload) < 8:
+            # 首片必须带完整的上层头部（RFC 7112），微小分片常用来绕过过滤
+            return self._fail(key, datagram, 'malformed')
+        datagram.fragments += 1
+        # 重组后的负载长度还包括分片头部之前的扩展头部，整体也不能超过65535
+        if datagram.fragments > self.max_fragments or end + _unfragmentable_length(packet) > MAX_PAYLOAD_LENGTH:
+            return self._fail(key, datagram, 'oversized')
+
+        outcome = self._fill(datagram, start, end, fragment.more, payload)
+        if outcome == 'duplicate':
+            stats.duplicates += 1
+            return None
+        if outcome is not None:
+            return self._fail(key, datagram, outcome)
+        if start == 0:
+            memory = datagram.memory
+            datagram.header = _unfragmentable_part(packet)
+            self._account(datagram.memory - memory)
+
+        if datagram.holes or datagram.header is None:
+            self._limit_memory(keep=key)
+            return None
+        if len(datagram.header) - IPV6_HEADER_LENGTH + datagram.total > MAX_PAYLOAD_LENGTH:
+            # 首片的扩展头部比其他分片的长，前面逐片的检查没有发现
+            return self._fail(key, datagram, 'oversized')
+
+        del self._pending[key]
+        self._account(-datagram.memory)
+        stats.reassembled += 1
+        return _rebuild(datagram)
+
+    def _fill(self, datagram: _Datagram, start: int, end: int, more: bool, payload) -> Optional[str]:
+        """把 [start, end) 填进空洞；返回None表示成功，否则返回失败原因或 'duplicate'"""
+        holes = datagram.holes
+        total = datagram.total
+        if total is not None and (end > total or (not more and end != total)):
+            return 'overlaps'
+        for index, hole in enumerate(holes):
+            hole_start, hole_end = hole
+            if hole_start <= start and end <= hole_end:
+                break
+        else:
+            # 不在任何一个空洞内：与已收到的数据相同时是重复分片，否则是重叠
+            if (not any(start < hole_end and hole_start < end for hole_start, hole_end in holes)
+                    and datagram.data[start:end] == payload and (more or end == total)):
+                return 'duplicate'
+            return 'overlaps'
+        if not more and hole_end != _OPEN:
+            # 最后一片之后已经有数据
+            return 'overlaps'
+
+        replacement = []
+        if hole_start < start:
+            replacement.append([hole_start, start])
+        if end < hole_end and more:
+            replacement.append([end, hole_end])
+        holes[index:index + 1] = replacement
+        if not more:
+            datagram.total = end
+
+        data = datagram.data
+        if len(data) < end:
+            growth = end - len(data)
+            data.extend(bytes(growth))
+            self._account(growth)
+        data[start:end] = payload
+        return None
+
+    def _fail(self, key: ReassemblyKey, datagram: _Datagram, reason: str) -> None:
+        """丢弃报文的数据，保留一个失败标记直到超时，同一报文的后续分片直接丢弃"""
+        setattr(self.stats, reason, getattr(self.stats, reason) + 1)
+        self._account(ENTRY_OVERHEAD - datagram.memory)
+        datagram.data = bytearray()
+        datagram.header = None
+        datagram.holes = []
+        datagram.failed = True
+        self._limit_memory(keep=key)
+        return None
+
+    def expire(self, now: float):
+        """丢弃超时的报文"""
+        pending = self._pending
+        deadline = now - self.timeout
+        while pending:
+            key, datagram = next(iter(pending.items()))
+            if datagram.created > deadline:
+                break
+            del pending[key]
+            self._account(-datagram.memory)
+            if not datagram.failed:
+                self.stats.timeouts += 1
+
+    def _limit_memory(self, keep: ReassemblyKey):
+        if self.stats.memory > self.high_threshold:
+            self._evict(keep)
+
+    def _evict(self, keep: ReassemblyKey):
+        """内存超过高水位时从最早的报文开始淘汰，直到低于低水位"""
+        pending = self._pending
+        stats = self.stats
+        for key in list(pending):
+            if stats.memory <= self.low_threshold:
+                break
+            if key == keep:
+                continue
+            datagram = pending.pop(key)
+            self._account(-datagram.memory)
+            if not datagram.failed:
+                stats.evicted += 1
+
+    def _account(self, delta: int):
+        stats = self.stats
+        stats.memory += delta
+        if stats.memory > stats.peak_memory:
+            stats.peak_memory = stats.memory
+
+
+def _unfragmentable_length(packet: IPv6Packet) -> int:
+    """分片头部之前的扩展头部的总长度"""
+    length = 0
+    for extension in packet.extensions:
+        if extension.type_ == NEXT_HEADER_FRAGMENT:
+            break
+        length += len(extension.data)
+    return length
+
+
+def _unfragmentable_part(packet: IPv6Packet) -> bytearray:
+    """
+    首片中分片头部之前的部分：基本头部按解析出的字段重新写出，扩展头部原样复制，
+    原来指向分片头部的"下一个头部"改成分片后面的协议；负载长度在重组完成时填写
+    """
+    header = packet.header
+    data = bytearray(IPV6_HEADER_LENGTH)
+    data[0:4] = ((6 << 28) | (header.traffic_class << 20) | header.flow_label).to_bytes(4, 'big')
+    data[6] = header.next_header
+    data[7] = header.hop_limit
+    data[8:24] = header.src
+    data[24:40] = header.dst
+    next_header_at = 6
+    for extension in packet.extensions:
+        if extension.type_ == NEXT_HEADER_FRAGMENT:
+            break
+        next_header_at = len(data)
+        data += extension.data
+    data[next_header_at] = packet.fragment.next_header
+    return data
+
+
+def _rebuild(datagram: _Datagram) -> IPv6Packet:
+    """拼出不带分片头部的完整报文并解析"""
+    header = datagram.header
+    packet = header + datagram.data
+    payload_length = len(packet) - IPV6_HEADER_LENGTH
+    if payload_length > MAX_PAYLOAD_LENGTH:
+        raise ValueError(f"重组后的负载长度 {payload_length} 超过 {MAX_PAYLOAD_LENGTH}")
+    packet[4:6] = payload_length.to_bytes(2, 'big')
+    return parse_ipv6(bytes(packet))
+
+
+def _fragment(offset: int, more: bool, payload: bytes, hop_by_hop: bool = False) -> IPv6Packet:
+    """构造一个 2001:db8::1 -> 2001:db8::2 的UDP分片，可以在分片头部之前带一个空的逐跳选项头部"""
+    body = struct.pack('!BxHI', NEXT_HEADER_UDP, offset | more, 0x1234) + payload
+    next_header = NEXT_HEADER_FRAGMENT
+    if hop_by_hop:
+        body = bytes([NEXT_HEADER_FRAGMENT, 0, 1, 4, 0, 0, 0, 0]) + body
+        next_header = NEXT_HEADER_HOP_BY_HOP
+    address = bytes.fromhex('20010db8000000000000000000000000')
+    return parse_ipv6(struct.pack('!IHBB', 6 << 28, len(body), next_header, 64)
+                      + address[:15] + b'\x01' + address[:15] + b'\x02' + body)
+
+
+def self_check() -> int:
+    """用构造的边界分片检查重组结果和计数，返回不符合预期的用例数"""
+    udp = struct.pack('!HHHH', 53, 53, 0, 0)
+    cases = [
+        # (说明, 分片, 预期重组出的报文数, 预期的计数)
+        ('刚好65535字节', [_fragment(0, True, udp + bytes(32760)), _fragment(32768, False, bytes(32767))],
+         1, {'reassembled': 1}),
+        ('逐跳选项头部使重组后超过65535字节',
+         [_fragment(0, True, udp + bytes(32760), True), _fragment(32768, False, bytes(32767), True)],
+         0, {'oversized': 1}),
+        ('只有首片带逐跳选项头部、且最后到达',
+         [_fragment(32768, False, bytes(32767)), _fragment(0, True, udp + bytes(32760), True)],
+         0, {'oversized': 1}),
+        ('首片缺少完整的UDP头部', [_fragment(0, True, bytes(0)), _fragment(8, False, udp)],
+         0, {'malformed': 1}),
+    ]
+    failures = 0
+    for description, fragments, expected_count, expected_stats in cases:
+        reassembler = FragmentReassembler()
+        try:
+            count = sum(1 for _ in reassembler.reassemble((0.0, fragment) for fragment in fragments))
+        except Exception as e:
+            failures += 1
+            print(f"失败 {description}: {type(e).__name__}: {e}")
+            continue
+        actual = {name: getattr(reassembler.stats, name) for name in expected_stats}
+        if count != expected_count or actual != expected_stats:
+            failures += 1
+            print(f"失败 {description}: 重组出 {count} 个（预期 {expected_count}），计数 {actual}（预期 {expected_stats}）")
+    print(f"检查了 {len(cases)} 个用例，失败 {failures} 个")
+    return failures
+
+
+def main():
+    """重组抓包文件中的IPv6分片并统计其中的DNS报文"""
+    import argparse
+    from ipv6_packet import IPv6CaptureReader
+
+    parser = argparse.ArgumentParser(description="IPv6分片重组")
+    parser.add_argument("capture", nargs="?", help="抓包文件路径")
+    parser.add_argument("--port", type=int, action="append", help="DNS端口，可重复指定（默认53）")
+    parser.add_argument("--self-check", action="store_true", help="用构造的边界分片检查重组器，然后退出")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="重组超时（秒）")
+    parser.add_argument("--high-threshold", type=int, default=DEFAULT_HIGH_THRESHOLD,
+                        help="未完成报文占用内存的高水位（字节）")
+    parser.add_argument("--low-threshold", type=int, default=DEFAULT_LOW_THRESHOLD,
+                        help="淘汰后降到的低水位（字节）")
+    args = parser.parse_args()
+
+    if args.self_check:
+        raise SystemExit(1 if self_check() else 0)
+    if args.capture is None:
+        parser.error("需要抓包文件路径")
+
+    reassembler = FragmentReassembler(args.timeout, args.high_threshold, args.low_threshold)
+    with IPv6CaptureReader(args.capture, ports=tuple(args.port or (53,))) as reader:
+        for _ in reader.dns_messages(reassembler=reassembler):
+            pass
+        packet_stats = reader.stats
+
+    stats = reassembler.stats
+    print(f"\nIPv6报文: {packet_stats.packets}（格式错误 {packet_stats.malformed}）")
+    print(f"分片: {stats.fragments}")
+    print(f"重组完成: {stats.reassembled}")
+    print(f"重复分片: {stats.duplicates}")
+    print(f"重叠丢弃: {stats.overlaps}")
+    print(f"超限丢弃: {stats.oversized}")
+    print(f"不合规分片: {stats.malformed}")
+    print(f"超时: {stats.timeouts}")
+    print(f"内存淘汰: {stats.evicted}")
+    print(f"内存峰值: {stats.peak_memory / 1024:.1f} KiB，结束时未完成 {len(reassembler)} 个")
+    print(f"DNS报文: {packet_stats.dns_packets}（格式错误 {packet_stats.dns_malformed}）")
+
+
+if __name__ == '__main__':
+    main()
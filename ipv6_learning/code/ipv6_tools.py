@@ -1,7 +1,14 @@
 import ipaddress
 import socket
 import sys
+from dns_builder import DEFAULT_EDNS_PAYLOAD_SIZE
 from dns_parser import DNSParser, create_dns_query
+from dns_resolver import TCPConnectionPool
+from ipv6_columnar import AddressArray
+from ipv6_interfaces import interface_addresses
+
+# 响应被截断时改用TCP重新查询，连接在多次检查之间复用
+_tcp_pool = TCPConnectionPool(timeout=5)
 
 def demonstrate_ipv6_address():
     """演示IPv6地址的基本操作和特性"""
@@ -30,22 +37,36 @@ def get_host_ipv6():
     print("\n=== 主机IPv6地址信息 ===")
     
     try:
-        # 获取所有网络接口的地址
-        hostname = socket.gethostname()
-        addrs = socket.getaddrinfo(hostname, None)
-        
-        # 过滤出IPv6地址
-        ipv6_addrs = [addr[4][0] for addr in addrs if addr[0] == socket.AF_INET6]
+        # 直接读取各网络接口的地址，不经过主机名解析
+        entries = interface_addresses()
+    except OSError:
+        # 没有 /proc/net/if_inet6（非Linux系统），退回到解析主机名
+        entries = None
+
+    try:
+        if entries is None:
+            hostname = socket.gethostname()
+            addrs = socket.getaddrinfo(hostname, None)
+            ipv6_addrs = [addr[4][0] for addr in addrs if addr[0] == socket.AF_INET6]
+            details = [None] * len(ipv6_addrs)
+        else:
+            ipv6_addrs = [entry.address for entry in entries]
+            details = list(entries)
         
         if ipv6_addrs:
             print("找到以下IPv6地址:")
-            for addr in ipv6_addrs:
-                ip = ipaddress.IPv6Address(addr)
-                print(f"地址: {ip}")
-                print(f"- 压缩形式: {ip.compressed}")
-                print(f"- 完整形式: {ip.exploded}")
-                print(f"- 是否是链路本地: {ip.is_link_local}")
-                print(f"- 是否是全局单播: {ip.is_global}")
+            addresses = AddressArray.parse(ipv6_addrs)
+            rows = zip(details, addresses.compressed, addresses.exploded,
+                       addresses.is_link_local.tolist(), addresses.is_global.tolist())
+            for entry, compressed, exploded, is_link_local, is_global in rows:
+                print(f"地址: {compressed}")
+                if entry is not None:
+                    print(f"- 接口: {entry.interface}，前缀长度: {entry.prefix_length}，"
+                          f"作用域: {entry.scope_name}，标志: {','.join(entry.flag_names) or '-'}")
+                print(f"- 压缩形式: {compressed}")
+                print(f"- 完整形式: {exploded}")
+                print(f"- 是否是链路本地: {is_link_local}")
+                print(f"- 是否是全局单播: {is_global}")
         else:
             print("未找到IPv6地址")
             
@@ -98,8 +119,8 @@ def check_ipv6_connectivity():
         sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
         sock.settimeout(5)
         
-        # 创建DNS查询
-        query = create_dns_query("google.com", 28)  # 28是AAAA记录类型
+        # 创建DNS查询，通过EDNS0通告更大的UDP缓冲区
+        query = create_dns_query("google.com", 28, edns_payload_size=DEFAULT_EDNS_PAYLOAD_SIZE)  # 28是AAAA记录类型
         
         # 发送查询
         print("   发送DNS查询...")
@@ -107,13 +128,21 @@ def check_ipv6_connectivity():
         
         # 接收响应
         print("   等待响应...")
-        response, addr = sock.recvfrom(512)
+        response, addr = sock.recvfrom(65535)
         print(f"   收到来自 {addr[0]} 的响应，长度: {len(response)} 字节")
         
         # 使用DNSParser解析响应
         parser = DNSParser(response)
         header, questions, answers = parser.parse_packet()
         
+        # 响应被截断时经TCP重新查询
+        if header.truncated:
+            print("   响应被截断，改用TCP重新查询...")
+            response = _tcp_pool.query(google_dns, 53, query)
+            print(f"   收到TCP响应，长度: {len(response)} 字节")
+            parser = DNSParser(response)
+            header, questions, answers = parser.parse_packet()
+        
         # 检查响应码
         if header.rcode == 0:
             print("   DNS响应正常")
@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+"""
+pcap/pcapng 抓包文件的流式DNS读取器
+
+文件通过mmap映射，逐条遍历记录，剥离 以太网/VLAN/Linux SLL -> IPv4/IPv6 -> UDP
+封装后把DNS负载交给DNSParser。所有结果都由生成器惰性产生，
+处理数GB的抓包文件时内存占用保持平稳。
+"""
+import mmap
+import struct
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from dns_parser import DNSHeader, DNSMessage, DNSParser, DNSQuestion, DNSResourceRecord
+
+# 链路层类型（LINKTYPE_*）
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+# 以太网类型
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+
+# IPv6中可以直接跳过的扩展头部：逐跳选项、路由、目的选项
+IPV6_SKIPPABLE_HEADERS = (0, 43, 60)
+IPPROTO_FRAGMENT = 44
+IPPROTO_AH = 51
+IPPROTO_UDP = 17
+
+# pcap魔数
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+# pcapng块类型
+PCAPNG_IDB = 0x00000001
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+# 各类块在块头之后的固定字段长度，块体比这短就无法解析
+_PCAPNG_FIXED_LENGTHS = {PCAPNG_EPB: 20, PCAPNG_IDB: 8, PCAPNG_SPB: 4}
+
+_UDP_STRUCT = struct.Struct('!HHH')
+
+# 分片时重新同步记录边界：连续多少条记录头合法才认为找到了边界
+RESYNC_CHAIN = 8
+# 重新同步时对记录长度的上限（snaplen为0时使用）
+MAX_RECORD_LENGTH = 262144
+# pcap切分点之前多远开始同步：从这里沿记录链逐条校验走到切分点
+RESYNC_LOOKBEHIND = 65536
+# 相邻记录的时间戳最多相差多少秒
+MAX_RECORD_GAP = 86400
+
+# DNS解析失败时可能抛出的异常（截断、越界、非法标签编码、指针环等）
+MALFORMED_ERRORS = (ValueError, struct.error, IndexError, UnicodeDecodeError, RecursionError)
+
+DNSRecordTuple = Tuple[DNSHeader, List[DNSQuestion], List[DNSResourceRecord]]
+
+
+@dataclass
+class CaptureStats:
+    """读取过程中的计数"""
+    frames: int = 0          # 遍历到的链路层帧
+    dns_packets: int = 0     # 成功解析的DNS报文
+    malformed: int = 0       # 端口匹配但解析失败的报文
+    skipped: int = 0         # 非UDP/非DNS端口/分片等被跳过的帧
+    truncated: bool = False  # 文件末尾的记录不完整
+    malformed_blocks: int = 0  # 长度不够放下固定字段的pcapng块，计数后跳过
+
+
+@dataclass
+class CaptureShard:
+    """
+    抓包文件的一个字节区间，起止位置都落在记录边界上
+
+    pcapng文件附带区间开始处生效的字节序和接口表（取自文件开头的节），
+    可以直接序列化后发给子进程
+    """
+    start: int
+    end: int
+    endian: str = '<'
+    interfaces: Tuple['PcapngInterface', ...] = ()
+
+
+@dataclass
+class PcapngInterface:
+    """pcapng接口描述块中用到的信息"""
+    linktype: int
+    snaplen: int
+    ts_resolution: float = 1e-6
+
+
+def network_offset(linktype: int, frame) -> Optional[int]:
+    """剥离链路层封装，返回网络层头部在frame中的偏移量；不是IP报文或帧不完整时返回None"""
+    size = len(frame)
+
+    if linktype == LINKTYPE_ETHERNET:
+        if size < 14:
+            return None
+        offset = 12
+        ethertype = (frame[12] << 8) | frame[13]
+        while ethertype in ETHERTYPE_VLAN:
+            offset += 4
+            if offset + 2 > size:
+                return None
+            ethertype = (frame[offset] << 8) | frame[offset + 1]
+        offset += 2
+        if ethertype not in (ETHERTYPE_IPV4, ETHERTYPE_IPV6):
+            return None
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        offset = 0
+    elif linktype == LINKTYPE_NULL:
+        offset = 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        offset = 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        offset = 20
+    else:
+        return None
+
+    if offset >= size:
+        return None
+    return offset
+
+
+def udp_payload(linktype: int, frame) -> Optional[Tuple[memoryview, memoryview, int, int, memoryview]]:
+    """
+    剥离链路层和IP层封装，返回 (源地址, 目的地址, 源端口, 目的端口, UDP负载)
+    地址和负载都是frame上的视图；非UDP、IP分片或格式不完整时返回None
+    """
+    frame = memoryview(frame)
+    size = len(frame)
+    offset = network_offset(linktype, frame)
+    if offset is None:
+        return None
+
+    # 按版本号判断网络层协议，可同时覆盖RAW/NULL等不带以太网类型的链路
+    version = frame[offset] >> 4
+    if version == 4:
+        if offset + 20 > size:
+            return None
+        ihl = (frame[offset] & 0x0F) * 4
+        total_length = (frame[offset + 2] << 8) | frame[offset + 3]
+        fragment = ((frame[offset + 6] << 8) | frame[offset + 7]) & 0x3FFF
+        if fragment or frame[offset + 9] != IPPROTO_UDP or ihl < 20:
+            return None
+        src = frame[offset + 12:offset + 16]
+        dst = frame[offset + 16:offset + 20]
+        end = min(offset + total_length, size)
+        offset += ihl
+    elif version == 6:
+        if offset + 40 > size:
+            return None
+        payload_length = (frame[offset + 4] << 8) | frame[offset + 5]
+        next_header = frame[offset + 6]
+        src = frame[offset + 8:offset + 24]
+        dst = frame[offset + 24:offset + 40]
+        end = min(offset + 40 + payload_length, size)
+        offset += 40
+        while next_header != IPPROTO_UDP:
+            if offset + 8 > end:
+                return None
+            if next_header in IPV6_SKIPPABLE_HEADERS:
+                header_length = (frame[offset + 1] + 1) * 8
+            elif next_header == IPPROTO_AH:
+                header_length = (frame[offset + 1] + 2) * 4
+            else:
+                # 分片需要重组，其他上层协议与DNS无关
+                return None
+            next_header = frame[offset]
+            offset += header_length
+    else:
+        return None
+
+    if offset + 8 > end:
+        return None
+    sport, dport, length = _UDP_STRUCT.unpack_from(frame, offset)
+    payload_end = min(offset + max(length, 8), end)
+    return src, dst, sport, dport, frame[offset + 8:payload_end]
+
+
+class CaptureFile:
+    """内存映射的pcap/pcapng文件，按记录产生 (时间戳, 链路层类型, 帧视图)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = None
+        self._view = memoryview(b'')
+        self.format = None
+        self.truncated = False
+        self.malformed_blocks = 0
+
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self.close()
+            raise ValueError(f"抓包文件为空: {path}")
+        self._view = memoryview(self._mmap)
+        self._detect_format()
+
+    def _detect_format(self):
+        """根据文件头的魔数识别格式和字节序"""
+        if len(self._view) < 4:
+            raise ValueError("抓包文件头不完整")
+        magic_le = struct.unpack_from('<I', self._view, 0)[0]
+        magic_be = struct.unpack_from('>I', self._view, 0)[0]
+
+        if magic_le == PCAPNG_SHB:
+            self.format = 'pcapng'
+            return
+
+        for endian, magic in (('<', magic_le), ('>', magic_be)):
+            if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+                if len(self._view) < 24:
+                    raise ValueError("pcap全局头部不完整")
+                self.format = 'pcap'
+                self._endian = endian
+                self._ts_resolution = 1e-9 if magic == PCAP_MAGIC_NSEC else 1e-6
+                self._record_struct = struct.Struct(endian + 'IIII')
+                self.snaplen, self.linktype = struct.unpack_from(endian + 'II', self._view, 16)
+                self._frac_limit = 10 ** 9 if magic == PCAP_MAGIC_NSEC else 10 ** 6
+                self._record_limit = self.snaplen or MAX_RECORD_LENGTH
+                # 第一条记录的时间作为合理时间戳的下限
+                self._min_sec = 1
+                if len(self._view) >= 40:
+                    self._min_sec = max(1, self._record_struct.unpack_from(self._view, 24)[0] - MAX_RECORD_GAP)
+                return
+
+        raise ValueError(f"无法识别的抓包文件格式，魔数: 0x{magic_be:08x}")
+
+    def frames(self, shard: Optional[CaptureShard] = None) -> Iterator[Tuple[float, int, memoryview]]:
+        """逐条产生记录；帧是映射内存的视图，不会复制数据。指定shard时只遍历该区间"""
+        if shard is None:
+            if self.format == 'pcap':
+                return self._pcap_frames(24, len(self._view))
+            return self._pcapng_frames(0, len(self._view))
+        if self.format == 'pcap':
+            return self._pcap_frames(shard.start, shard.end)
+        return self._pcapng_frames(shard.start, shard.end, shard.endian, list(shard.interfaces))
+
+    def shards(self, count: int) -> List[CaptureShard]:
+        """
+        把文件按字节均分成count个区间，每个切分点向后对齐到下一条合法记录
+
+        对齐只读取切分点附近的少量记录头，不需要顺序扫描整个文件。
+        pcapng只支持单节文件（tcpdump/dumpcap的默认输出），接口表取自文件开头
+        """
+        size = len(self._view)
+        if self.format == 'pcap':
+            first, endian, interfaces = 24, '<', ()
+            resync = self._pcap_boundary
+        else:
+            first, endian, interfaces = self._pcapng_preamble()
+            resync = lambda offset: self._pcapng_resync(offset, endian)
+
+        bounds = [first]
+        for i in range(1, max(count, 1)):
+            target = first + (size - first) * i // count
+            if target <= bounds[-1]:
+                continue
+            bound = resync(target)
+            if bound > bounds[-1]:
+                bounds.append(bound)
+        if bounds[-1] < size:
+            bounds.append(size)
+
+        return [
+            CaptureShard(start=start, end=end, endian=endian, interfaces=interfaces)
+            for start, end in zip(bounds, bounds[1:])
+        ]
+
+    def _pcap_header(self, offset: int, prev_sec: Optional[int]) -> Optional[Tuple[int, int]]:
+        """
+        严格校验offset处的pcap记录头，合法时返回 (秒级时间戳, 记录总长度)
+
+        零长度、零时间戳、超过snaplen或orig_len的记录头都不接受，全零填充
+        因此不会被当成记录；prev_sec是链上前一条记录的时间，时间戳不能倒退，
+        也不能跳过MAX_RECORD_GAP秒以上
+        """
+        view = self._view
+        if offset + 16 > len(view):
+            return None
+        ts_sec, ts_frac, incl_len, orig_len = self._record_struct.unpack_from(view, offset)
+        if ts_sec < self._min_sec or ts_frac >= self._frac_limit \
+                or incl_len == 0 or incl_len > orig_len or incl_len > self._record_limit \
+                or offset + 16 + incl_len > len(view):
+            return None
+        if prev_sec is not None and not prev_sec <= ts_sec <= prev_sec + MAX_RECORD_GAP:
+            return None
+        return ts_sec, 16 + incl_len
+
+    def _pcap_chain_ok(self, offset: int) -> bool:
+        """判断offset处能否连续解析出RESYNC_CHAIN条首尾相接的合法记录头（恰好到达文件末尾也算）"""
+        size = len(self._view)
+        prev_sec = None
+        for _ in range(RESYNC_CHAIN):
+            if offset == size:
+                return True
+            header = self._pcap_header(offset, prev_sec)
+            if header is None:
+                return False
+            prev_sec, length = header
+            offset += length
+        return True
+
+    def _pcap_resync(self, offset: int) -> int:
+        """从offset开始向后寻找第一个记录链成立的位置，找不到时返回文件末尾"""
+        size = len(self._view)
+        while offset < size:
+            if self._pcap_chain_ok(offset):
+                return offset
+            offset += 1
+        return size
+
+    def _pcap_boundary(self, target: int) -> int:
+        """
+        返回target处或之后的第一条记录边界
+
+        不在target处猜测边界：先在target之前RESYNC_LOOKBEHIND字节处（前一个区间内）
+        同步，再沿记录链逐条校验走到target，链上任何一条记录头不合法
+        都从这次同步点之后重新同步。相邻区间对同一切分点得到同一个边界，
+        每条记录只属于起点所在的区间。
+        """
+        size = len(self._view)
+        origin = max(24, target - RESYNC_LOOKBEHIND)
+        while origin < size:
+            # 文件头之后的第一条记录本身就是边界
+            start = origin if origin == 24 else self._pcap_resync(origin)
+            offset = start
+            prev_sec = None
+            while offset < target:
+                header = self._pcap_header(offset, prev_sec)
+                if header is None:
+                    break
+                prev_sec, length = header
+                offset += length
+            else:
+                if self._pcap_chain_ok(offset):
+                    return offset
+            origin = start + 1
+        return size
+
+    def _pcapng_preamble(self) -> Tuple[int, str, Tuple[PcapngInterface, ...]]:
+        """读取文件开头的节头块和接口描述块，返回第一个数据块的位置、字节序和接口表"""
+        view = self._view
+        offset = 0
+        endian = '<'
+        interfaces = []
+
+        while offset + 12 <= len(view):
+            block_type = struct.unpack_from(endian + 'I', view, offset)[0]
+            if block_type == PCAPNG_SHB:
+                bom = struct.unpack_from('<I', view, offset + 8)[0]
+                endian = '<' if bom == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            elif block_type in (PCAPNG_EPB, PCAPNG_SPB):
+                break
+            block_length = struct.unpack_from(endian + 'I', view, offset + 4)[0]
+            if block_length < 12 or offset + block_length > len(view):
+                break
+            if block_type == PCAPNG_IDB and block_length - 12 >= _PCAPNG_FIXED_LENGTHS[PCAPNG_IDB]:
+                linktype, _, snaplen = struct.unpack_from(endian + 'HHI', view, offset + 8)
+                interfaces.append(PcapngInterface(
+                    linktype=linktype,
+                    snaplen=snaplen,
+                    ts_resolution=self._parse_tsresol(offset + 16, offset + block_length - 4, endian)
+                ))
+            offset += block_length
+
+        return offset, endian, tuple(interfaces)
+
+    def _pcapng_resync(self, offset: int, endian: str) -> int:
+        """pcapng块按4字节对齐，且首尾各有一份块长度，据此寻找下一个块边界"""
+        view = self._view
+        size = len(view)
+        offset = (offset + 3) & ~3
+        block = struct.Struct(endian + 'II')
+        trailer = struct.Struct(endian + 'I')
+
+        while offset + 12 <= size:
+            start = offset
+            for _ in range(RESYNC_CHAIN):
+                if start == size:
+                    return offset
+                if start + 12 > size:
+                    break
+                block_type, block_length = block.unpack_from(view, start)
+                if (block_type not in (PCAPNG_EPB, PCAPNG_SPB, PCAPNG_IDB) and block_type > 0x0F) \
+                        or block_length < 12 or block_length % 4 or start + block_length > size \
+                        or trailer.unpack_from(view, start + block_length - 4)[0] != block_length:
+                    break
+                start += block_length
+            else:
+                return offset
+            offset += 4
+        return size
+
+    def _pcap_frames(self, start: int, end: int) -> Iterator[Tuple[float, int, memoryview]]:
+        view = self._view
+        record = self._record_struct
+        resolution = self._ts_resolution
+        linktype = self.linktype
+        offset = start
+
+        while offset < end:
+            if offset + 16 > len(view):
+                self.truncated = True
+                return
+            ts_sec, ts_frac, incl_len, _ = record.unpack_from(view, offset)
+            offset += 16
+            if offset + incl_len > len(view):
+                self.truncated = True
+                return
+            yield ts_sec + ts_frac * resolution, linktype, view[offset:offset + incl_len]
+            offset += incl_len
+
+    def _pcapng_frames(self, start: int, end: int, endian: str = '<',
+                       interfaces: Optional[List[PcapngInterface]] = None
+                       ) -> Iterator[Tuple[float, int, memoryview]]:
+        view = self._view
+        interfaces = [] if interfaces is None else interfaces
+        offset = start
+
+        while offset < end:
+            if offset + 12 > len(view):
+                self.truncated = True
+                return
+            block_type = struct.unpack_from(endian + 'I', view, offset)[0]
+
+            # 节头块决定其后所有块的字节序
+            if block_type == PCAPNG_SHB:
+                bom = struct.unpack_from('<I', view, offset + 8)[0]
+                endian = '<' if bom == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                interfaces = []
+
+            block_length = struct.unpack_from(endian + 'I', view, offset + 4)[0]
+            if block_length < 12 or block_length % 4 or offset + block_length > len(view):
+                self.truncated = True
+                return
+            body = offset + 8
+            body_end = offset + block_length - 4
+            if body + _PCAPNG_FIXED_LENGTHS.get(block_type, 0) > body_end:
+                # 块长度放不下该类块的固定字段：在文件末尾时按截断处理，否则跳过这个块
+                if offset + block_length >= len(view):
+                    self.truncated = True
+                    return
+                self.malformed_blocks += 1
+                offset += block_length
+                continue
+
+            if block_type == PCAPNG_EPB:
+                interface_id, ts_high, ts_low, captured_len = struct.unpack_from(
+                    endian + 'IIII', view, body)
+                data = body + 20
+                if interface_id < len(interfaces) and data + captured_len <= body_end:
+                    iface = interfaces[interface_id]
+                    ts = ((ts_high << 32) | ts_low) * iface.ts_resolution
+                    yield ts, iface.linktype, view[data:data + captured_len]
+            elif block_type == PCAPNG_SPB:
+                if interfaces:
+                    iface = interfaces[0]
+                    orig_len = struct.unpack_from(endian + 'I', view, body)[0]
+                    captured_len = min(orig_len, body_end - body - 4)
+                    if iface.snaplen:
+                        captured_len = min(captured_len, iface.snaplen)
+                    yield 0.0, iface.linktype, view[body + 4:body + 4 + captured_len]
+            elif block_type == PCAPNG_IDB:
+                linktype, _, snaplen = struct.unpack_from(endian + 'HHI', view, body)
+                interfaces.append(PcapngInterface(
+                    linktype=linktype,
+                    snaplen=snaplen,
+                    ts_resolution=self._parse_tsresol(body + 8, body_end, endian)
+                ))
+
+            offset += block_length
+
+    def _parse_tsresol(self, offset: int, end: int, endian: str) -> float:
+        """从接口描述块的选项中读取 if_tsresol，默认微秒"""
+        view = self._view
+        while offset + 4 <= end:
+            code, length = struct.unpack_from(endian + 'HH', view, offset)
+            if code == 0:
+                break
+            if code == 9 and length >= 1:
+                value = view[offset + 4]
+                if value & 0x80:
+                    return 2.0 ** -(value & 0x7F)
+                return 10.0 ** -value
+            offset += 4 + ((length + 3) & ~3)
+        return 1e-6
+
+    def close(self):
+        """关闭映射；仍有外部视图引用映射内存时，映射交给垃圾回收释放"""
+        self._view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DNSCaptureReader:
+    """
+    从抓包文件中惰性解析DNS报文
+
+    默认把每个DNS负载复制成独立的bytes再解析（单个报文只有几百字节），
+    结果与映射内存无关；zero_copy=True时直接在映射内存上解析，
+    资源记录的data是映射内存的视图，关闭文件前需要先释放这些记录。
+    """
+
+    def __init__(self, path: str, ports: Tuple[int, ...] = (53,), zero_copy: bool = False):
+        self.capture = CaptureFile(path)
+        self.ports = frozenset(ports)
+        self.zero_copy = zero_copy
+        self.stats = CaptureStats()
+
+    def payloads(self, shard: Optional[CaptureShard] = None
+                 ) -> Iterator[Tuple[float, memoryview, memoryview, int, int, memoryview]]:
+        """产生 (时间戳, 源地址, 目的地址, 源端口, 目的端口, DNS负载)，只包含端口匹配的UDP报文"""
+        ports = self.ports
+        stats = self.stats
+
+        for ts, linktype, frame in self.capture.frames(shard):
+            stats.frames += 1
+            try:
+                located = udp_payload(linktype, frame)
+            except MALFORMED_ERRORS:
+                located = None
+            if located is None:
+                stats.skipped += 1
+                continue
+            src, dst, sport, dport, payload = located
+            if sport not in ports and dport not in ports:
+                stats.skipped += 1
+                continue
+            yield ts, src, dst, sport, dport, payload
+
+        stats.truncated = self.capture.truncated
+        stats.malformed_blocks = self.capture.malformed_blocks
+
+    def __iter__(self) -> Iterator[DNSRecordTuple]:
+        """产生 (DNSHeader, questions, answers)，格式错误的报文计数后跳过"""
+        stats = self.stats
+        zero_copy = self.zero_copy
+
+        for _, _, _, _, _, payload in self.payloads():
+            data = payload if zero_copy else payload.tobytes()
+            try:
+                parsed = DNSParser(data, zero_copy=zero_copy).parse_packet()
+            except MALFORMED_ERRORS:
+                stats.malformed += 1
+                continue
+            stats.dns_packets += 1
+            yield parsed
+
+    def messages(self, shard: Optional[CaptureShard] = None) -> Iterator[DNSMessage]:
+        """
+        产生各部分按需解码的DNSMessage，只在这里解析头部
+
+        头部不完整的报文计数后跳过；后续部分的格式错误在访问时才会抛出，
+        这类报文不计入统计
+        """
+        stats = self.stats
+        zero_copy = self.zero_copy
+
+        for _, _, _, _, _, payload in self.payloads(shard):
+            data = payload if zero_copy else payload.tobytes()
+            try:
+                message = DNSParser(data, zero_copy=zero_copy).parse_message()
+            except MALFORMED_ERRORS:
+                stats.malformed += 1
+                continue
+            stats.dns_packets += 1
+            yield message
+
+    def close(self):
+        self.capture.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def verify_shards(path: str, max_count: int = 500) -> List[int]:
+    """
+    检查把文件切成1..max_count个区间时，各区间的记录合起来与一次完整遍历完全一致
+
+    返回不一致的区间数列表（为空表示全部一致）
+    """
+    failures = []
+    with CaptureFile(path) as capture:
+        full = [(ts, linktype, bytes(frame)) for ts, linktype, frame in capture.frames()]
+        for count in range(1, max_count + 1):
+            sharded = [(ts, linktype, bytes(frame))
+                       for shard in capture.shards(count)
+                       for ts, linktype, frame in capture.frames(shard)]
+            if sharded != full:
+                failures.append(count)
+    return failures
+
+
+def main():
+    """统计抓包文件中的DNS报文"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="从pcap/pcapng文件中读取DNS报文")
+    parser.add_argument("capture", help="抓包文件路径")
+    parser.add_argument("--port", type=int, action="append",
+                        help="DNS端口，可重复指定（默认53）")
+    parser.add_argument("--show", type=int, default=10, help="显示前N个问题（默认10）")
+    parser.add_argument("--verify-shards", type=int, metavar="N",
+                        help="检查切成1..N个区间时的记录与完整遍历一致，然后退出")
+    args = parser.parse_args()
+
+    if args.verify_shards:
+        failures = verify_shards(args.capture, args.verify_shards)
+        if failures:
+            print(f"不一致的区间数: {failures[:20]}{' ...' if len(failures) > 20 else ''}")
+            raise SystemExit(1)
+        print(f"1..{args.verify_shards} 个区间的记录均与完整遍历一致")
+        return
+
+    with DNSCaptureReader(args.capture, ports=tuple(args.port or (53,))) as reader:
+        for header, questions, answers in reader:
+            if reader.stats.dns_packets <= args.show:
+                kind = "响应" if header.is_response else "查询"
+                for q in questions:
+                    type_name = DNSParser.RECORD_TYPES.get(q.type_, f"TYPE{q.type_}")
+                    print(f"{kind} id=0x{header.id:04x} {q.name} {type_name} 答案数={len(answers)}")
+
+        stats = reader.stats
+        print(f"\n帧总数: {stats.frames}")
+        print(f"DNS报文: {stats.dns_packets}")
+        print(f"格式错误: {stats.malformed}")
+        print(f"跳过: {stats.skipped}")
+        if stats.malformed_blocks:
+            print(f"跳过的损坏块: {stats.malformed_blocks}")
+        if stats.truncated:
+            print("警告: 文件末尾记录不完整")
+
+
+if __name__ == '__main__':
+    main()